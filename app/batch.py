@@ -0,0 +1,73 @@
+import os
+from bson import ObjectId
+from .database import db
+from .cache import cache, document_key
+from .slowlog import track
+
+# Nombre maximal d'identifiants acceptés par une lecture groupée
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 100))
+
+
+def parse_ids(raw: str, max_ids: int = BATCH_MAX_IDS) -> list:
+    """
+    Cette fonction découpe une liste d'identifiants séparés par des virgules (par exemple `?ids=a,b,c`).
+    Les doublons sont retirés en conservant l'ordre de la requête.
+    Une `ValueError` est levée si la liste dépasse `max_ids` identifiants.
+    """
+    ids = list(dict.fromkeys(part.strip() for part in raw.split(",") if part.strip()))
+    if len(ids) > max_ids:
+        raise ValueError("Too many ids (maximum {})".format(max_ids))
+    return ids
+
+
+async def fetch_by_ids(collection: str, ids: list, projection: dict = None):
+    """
+    Cette fonction récupère plusieurs documents d'une collection à partir de leurs identifiants.
+
+    - `collection` : Le nom de la collection ("students" ou "projects").
+    - `ids` : Les identifiants demandés, sous forme de chaînes.
+    - `projection` : Les champs à lire (voir `app/fields.py`), ou `None` pour les documents complets.
+
+    Les documents présents dans le cache de lecture sont servis directement ; les autres sont lus
+    en une seule requête `$in`, puis mis en cache, sauf s'ils ont été modifiés pendant la lecture. Les documents partiels (lus avec une projection)
+    ne sont pas mis en cache : le cache ne contient que des documents complets.
+    Retourne un tuple `(documents, missing)` : les documents trouvés dans l'ordre de la requête,
+    et les identifiants introuvables (ou invalides).
+    """
+    found = {}  # ObjectId -> document
+    to_fetch = []
+    generations = {}  # ObjectId -> génération de la clé, lue avant la requête
+
+    for document_id in ids:
+        if not ObjectId.is_valid(document_id):
+            continue
+        object_id = ObjectId(document_id)
+        key = document_key(collection, object_id)
+        # La génération est lue avant la requête : si une écriture invalide la clé pendant la lecture,
+        # le document lu (peut-être antérieur à l'écriture) n'est pas mis en cache (voir `app/cache.py`)
+        generation = await cache.generation(key)
+        cached = await cache.get(key)
+        if cached is not None:
+            found[object_id] = cached
+        else:
+            to_fetch.append(object_id)
+            generations[object_id] = generation
+
+    # Une seule requête pour tous les documents absents du cache
+    if to_fetch:
+        query = {"_id": {"$in": to_fetch}}
+        async with track(collection, "find", filter=query, projection=projection):
+            async for document in db[collection].find(query, projection):
+                found[document["_id"]] = document
+                if projection is None:
+                    await cache.set(document_key(collection, document["_id"]), document, generations[document["_id"]])
+
+    documents = []
+    missing = []
+    for document_id in ids:
+        document = found.get(ObjectId(document_id)) if ObjectId.is_valid(document_id) else None
+        if document is None:
+            missing.append(document_id)
+        else:
+            documents.append(document)
+    return documents, missing
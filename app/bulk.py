@@ -0,0 +1,101 @@
+import json
+import os
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from .database import db
+from .slowlog import track
+
+# Nombre de documents envoyés à MongoDB par appel `insert_many`
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+
+# Nombre maximal de lignes acceptées par une importation
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", 10000))
+
+
+def parse_rows(body: bytes, content_type: str = "") -> list:
+    """
+    Cette fonction découpe le corps d'une importation en lignes.
+
+    - `body` : Le corps brut de la requête.
+    - `content_type` : L'en-tête `Content-Type` de la requête.
+
+    Deux formats sont acceptés : un tableau JSON, ou du NDJSON (un objet JSON par ligne, avec le type
+    `application/x-ndjson` ou tout corps ne commençant pas par `[`).
+    Retourne une liste de valeurs ; une ligne NDJSON illisible est remplacée par l'exception de décodage,
+    afin d'être signalée comme erreur de ligne sans interrompre l'importation.
+    Une `ValueError` est levée si le corps est vide, n'est pas un tableau JSON valide ou dépasse `BULK_MAX_ROWS` lignes.
+    """
+    text = body.decode("utf-8").strip()
+    if not text:
+        raise ValueError("Empty body")
+
+    if "ndjson" not in content_type and text.startswith("["):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError("Invalid JSON array: {}".format(e))
+    else:
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                rows.append(e)
+
+    if len(rows) > BULK_MAX_ROWS:
+        raise ValueError("Too many rows (maximum {})".format(BULK_MAX_ROWS))
+    return rows
+
+
+async def bulk_insert(collection: str, model, rows: list, prepare, on_inserted=None) -> dict:
+    """
+    Cette fonction valide et insère un lot de documents, en signalant les erreurs ligne par ligne.
+
+    - `collection` : Le nom de la collection ("students" ou "projects").
+    - `model` : Le schéma Pydantic de création (par exemple `StudentCreate`).
+    - `rows` : Les lignes renvoyées par `parse_rows`.
+    - `prepare` : Une fonction qui complète le dictionnaire validé avant l'insertion (nom normalisé...).
+    - `on_inserted` : Une fonction optionnelle appelée avec les documents insérés de chaque paquet.
+
+    Les documents valides sont insérés par paquets de `BULK_CHUNK_SIZE` avec `insert_many(ordered=False)` :
+    un aller-retour par paquet au lieu d'un par document, et une erreur d'écriture (doublon...) n'arrête
+    pas le reste du paquet.
+    Retourne le nombre de documents insérés, leurs identifiants et la liste des erreurs `{index, errors}`,
+    où `index` est la position de la ligne dans le corps de la requête.
+    """
+    errors = []
+    valid = []  # (index de la ligne, document)
+
+    for index, row in enumerate(rows):
+        if isinstance(row, Exception):
+            errors.append({"index": index, "errors": [{"msg": "Invalid JSON: {}".format(row)}]})
+            continue
+        try:
+            document = model.parse_obj(row).dict()
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors()})
+            continue
+        valid.append((index, prepare(document)))
+
+    inserted_ids = []
+    for start in range(0, len(valid), BULK_CHUNK_SIZE):
+        chunk = valid[start:start + BULK_CHUNK_SIZE]
+        failed = set()
+        try:
+            async with track(collection, "insert"):
+                await db[collection].insert_many([document for _, document in chunk], ordered=False)
+        except BulkWriteError as e:
+            # `index` désigne la position dans le paquet : on la ramène à la ligne de la requête
+            for write_error in e.details.get("writeErrors", []):
+                failed.add(write_error["index"])
+                errors.append({"index": chunk[write_error["index"]][0], "errors": [{"msg": write_error["errmsg"]}]})
+        # `insert_many` ajoute l'`_id` généré à chaque dictionnaire
+        inserted = [document for position, (_, document) in enumerate(chunk) if position not in failed]
+        inserted_ids.extend(str(document["_id"]) for document in inserted)
+        if on_inserted is not None and inserted:
+            on_inserted(inserted)
+
+    errors.sort(key=lambda error: error["index"])
+    return {"inserted": len(inserted_ids), "inserted_ids": inserted_ids, "errors": errors}
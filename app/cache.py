@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# Cache LRU en mémoire, avec expiration (TTL) et taille bornée
+class LRUCache:
+    """
+    Cette structure conserve au plus `max_entries` valeurs ; la moins récemment utilisée est évincée
+    lorsqu'une nouvelle entrée dépasse la capacité. Chaque entrée expire après `ttl` secondes
+    (durée par défaut, ou durée propre passée à `set`).
+    Les opérations sont protégées par un verrou : la structure peut être partagée entre threads.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # clé -> (date d'expiration, valeur)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Retourne la valeur associée à `key`, ou `None` si elle est absente ou expirée.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Enregistre `value` pour `key`, avec une durée de vie de `ttl` secondes (par défaut celle du cache).
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """
+        Supprime l'entrée associée à `key`, si elle existe.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Vide entièrement le cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Retourne les compteurs du cache.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Interface des backends de cache
+class CacheBackend:
+    """
+    Interface commune aux backends du cache de lecture. Les méthodes sont asynchrones afin qu'un cache
+    partagé entre workers (Redis, Memcached...) puisse être ajouté sans modifier les contrôleurs.
+
+    Chaque clé a une génération, incrémentée par `delete`. Une lecture relève la génération avant d'interroger
+    MongoDB et la passe à `set` : si une écriture a invalidé la clé entre-temps, le document lu (peut-être
+    antérieur à l'écriture) n'est pas mis en cache.
+    """
+
+    async def get(self, key):
+        raise NotImplementedError
+
+    async def generation(self, key):
+        raise NotImplementedError
+
+    async def set(self, key, value, generation=None):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Backend en mémoire du processus (un cache par worker), reposant sur `LRUCache`.
+
+    Les générations sont les valeurs d'un compteur global, conservées pour au plus `max_entries` clés
+    invalidées récemment. Une clé oubliée prend la plus grande génération oubliée (`_generation_floor`) :
+    une lecture commencée avant l'oubli ne met alors pas son résultat en cache, ce qui est sans risque.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = LRUCache(max_entries, ttl)
+        self._generations = OrderedDict()  # clé -> génération de la dernière invalidation
+        self._generation_counter = 0
+        self._generation_floor = 0
+        self._lock = threading.Lock()
+
+    async def get(self, key):
+        return self._cache.get(key)
+
+    async def generation(self, key):
+        with self._lock:
+            return self._generations.get(key, self._generation_floor)
+
+    async def set(self, key, value, generation=None):
+        with self._lock:
+            # La clé a été invalidée depuis le début de la lecture : le document est peut-être périmé
+            if generation is not None and self._generations.get(key, self._generation_floor) != generation:
+                return
+            self._cache.set(key, value)
+
+    async def delete(self, key):
+        with self._lock:
+            self._generation_counter += 1
+            self._generations[key] = self._generation_counter
+            self._generations.move_to_end(key)
+            while len(self._generations) > self._cache.max_entries:
+                _, forgotten = self._generations.popitem(last=False)
+                self._generation_floor = max(self._generation_floor, forgotten)
+            self._cache.delete(key)
+
+    async def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class NullCacheBackend(CacheBackend):
+    """
+    Backend qui ne conserve rien : toutes les lectures vont à MongoDB (cache désactivé).
+    """
+
+    async def get(self, key):
+        return None
+
+    async def generation(self, key):
+        return 0
+
+    async def set(self, key, value, generation=None):
+        pass
+
+    async def delete(self, key):
+        pass
+
+    async def clear(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+def create_cache() -> CacheBackend:
+    """
+    Cette fonction crée le backend de cache choisi par les variables d'environnement :
+    - `CACHE_BACKEND` : "memory" (par défaut) ou "none" ;
+    - `CACHE_MAX_ENTRIES` : nombre maximal de documents en cache (par défaut 10000) ;
+    - `CACHE_TTL_SECONDS` : durée de vie d'une entrée (par défaut 30 secondes).
+    """
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    if backend == "none":
+        return NullCacheBackend()
+    if backend == "memory":
+        return MemoryCacheBackend(
+            max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+            ttl=float(os.getenv("CACHE_TTL_SECONDS", 30)),
+        )
+    raise ValueError("Invalid CACHE_BACKEND: {}".format(backend))
+
+
+def document_key(collection: str, document_id) -> str:
+    """
+    Cette fonction construit la clé de cache d'un document, par exemple "students:65f0c...".
+    """
+    return "{}:{}".format(collection, document_id)
+
+
+# Cache partagé par les contrôleurs (un par worker)
+cache = create_cache()
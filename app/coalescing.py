@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+
+# Regroupement des lectures identiques simultanées (« single-flight »)
+class SingleFlight:
+    """
+    Lorsque plusieurs requêtes demandent au même moment exactement la même lecture, une seule requête
+    MongoDB est exécutée ; tous les appelants attendent son résultat.
+
+    Le résultat est partagé entre les appelants : il ne doit pas être modifié sur place.
+    Les compteurs `calls`, `executed` et `deduplicated` mesurent l'effet du regroupement.
+    """
+
+    def __init__(self):
+        self._inflight = {}  # clé -> tâche en cours
+        self.calls = 0
+        self.executed = 0
+        self.deduplicated = 0
+
+    async def do(self, key: str, fn):
+        """
+        Exécute `fn()` (une fonction renvoyant une coroutine) pour la clé `key`, ou rejoint l'exécution
+        déjà en cours pour cette clé.
+
+        L'exécution partagée tourne dans sa propre tâche : l'annulation d'un appelant (client déconnecté)
+        n'interrompt pas la lecture attendue par les autres.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.deduplicated += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task):
+        """
+        Retire la tâche terminée : les appels suivants relanceront une nouvelle lecture.
+        """
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marque l'éventuelle exception comme consultée si tous les appelants ont été annulés entre-temps
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """
+        Retourne les compteurs du regroupement.
+        """
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+        }
+
+
+def query_key(collection: str, operation: str, query: dict, **params) -> str:
+    """
+    Cette fonction construit la clé normalisée d'une lecture : collection, opération, filtre et paramètres
+    (page, curseur, taille, tri...). Les clés des dictionnaires sont triées pour que deux filtres équivalents
+    produisent la même clé ; les `ObjectId` sont convertis en chaînes.
+    """
+    return json.dumps([collection, operation, query, params], sort_keys=True, default=str, separators=(",", ":"))
+
+
+# Instance partagée par les contrôleurs (une par worker)
+single_flight = SingleFlight()
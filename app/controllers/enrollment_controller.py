@@ -0,0 +1,163 @@
+import os
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from .. import database
+from ..database import db
+from ..cache import cache, document_key
+from ..slowlog import track
+from ..stats import mark_stale
+from ..versioning import VERSION_FIELD
+
+# Nombre d'étudiants traités par opération lors d'une inscription groupée
+ENROLL_CHUNK_SIZE = int(os.getenv("ENROLL_CHUNK_SIZE", 500))
+
+# Nombre maximal d'étudiants acceptés par une inscription groupée
+BULK_ENROLL_MAX = int(os.getenv("BULK_ENROLL_MAX", 5000))
+
+# Code d'erreur MongoDB renvoyé lorsque les transactions ne sont pas disponibles (serveur autonome)
+ILLEGAL_OPERATION = 20
+
+# La relation m:n est stockée des deux côtés : `Project.student_ids` et `Student.project_ids`.
+# Les deux côtés sont mis à jour ensemble, avec `$addToSet` / `$pull`, dans une transaction lorsque
+# le serveur le permet (replica set ou cluster shardé). Sur un serveur autonome, les deux écritures sont
+# exécutées l'une après l'autre : elles sont idempotentes et peuvent être rejouées sans risque.
+# Les identifiants sont stockés sous forme d'ObjectId.
+# Chaque écriture incrémente la version (`_v`) des documents modifiés, et seulement d'eux : une inscription
+# déjà effectuée ne change pas l'ETag.
+
+
+def _chunks(items: list, size: int = ENROLL_CHUNK_SIZE):
+    """
+    Découpe une liste en paquets de `size` éléments.
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _write_both_sides(write):
+    """
+    Exécute `write(session)` dans une transaction si possible, sinon sans transaction.
+
+    - `write` : Une fonction asynchrone qui reçoit la session (ou `None`) et effectue les écritures des deux côtés.
+
+    `with_transaction` rejoue automatiquement la transaction en cas d'erreur transitoire (conflit d'écriture).
+    """
+    async with await database.client.start_session() as session:
+        try:
+            await session.with_transaction(write)
+            return
+        except OperationFailure as e:
+            # Transactions indisponibles : la première écriture a échoué, rien n'a été modifié
+            if e.code != ILLEGAL_OPERATION:
+                raise
+
+    await write(None)
+
+
+async def _invalidate(project_id: ObjectId, student_ids: list):
+    """
+    Retire du cache de lecture le projet et les étudiants modifiés.
+    """
+    await cache.delete(document_key("projects", project_id))
+    for student_id in student_ids:
+        await cache.delete(document_key("students", student_id))
+
+
+# Logique pour inscrire un ou plusieurs étudiants à un projet
+async def enroll_students(project_id: str, student_ids: list):
+    """
+    Cette fonction inscrit des étudiants à un projet, en mettant à jour les deux côtés de la relation.
+
+    - `project_id` : L'identifiant du projet.
+    - `student_ids` : Les identifiants des étudiants à inscrire.
+
+    Le coût reste borné quel que soit le nombre de membres : les étudiants sont traités par paquets de
+    `ENROLL_CHUNK_SIZE`, avec une seule écriture par paquet et par collection.
+    Retourne `None` si le projet n'existe pas, sinon un dictionnaire contenant les étudiants inscrits
+    (`enrolled`) et les identifiants introuvables (`missing`).
+    Une `ValueError` est levée si plus de `BULK_ENROLL_MAX` étudiants sont demandés.
+    """
+    if len(student_ids) > BULK_ENROLL_MAX:
+        raise ValueError("Too many students (maximum {})".format(BULK_ENROLL_MAX))
+
+    project_oid = ObjectId(project_id)
+    async with track("projects", "find", filter={"_id": project_oid}, limit=1):
+        project = await db["projects"].find_one({"_id": project_oid}, {"_id": 1})
+    if project is None:
+        return None
+
+    # Ne garder que les étudiants existants (lecture de l'index `_id` uniquement)
+    requested = list(dict.fromkeys(ObjectId(s) for s in student_ids if ObjectId.is_valid(s)))
+    existing = set()
+    for chunk in _chunks(requested):
+        query = {"_id": {"$in": chunk}}
+        async with track("students", "find", filter=query, projection={"_id": 1}):
+            async for student in db["students"].find(query, {"_id": 1}):
+                existing.add(student["_id"])
+    enrolled = [student_id for student_id in requested if student_id in existing]
+
+    async def write(session):
+        for chunk in _chunks(enrolled):
+            # Le projet ne change de version que si au moins un étudiant du paquet n'était pas encore inscrit
+            query = {"_id": project_oid, "student_ids": {"$not": {"$all": chunk}}}
+            update = {"$addToSet": {"student_ids": {"$each": chunk}}, "$inc": {VERSION_FIELD: 1}}
+            async with track("projects", "update", updates=[{"q": query, "u": update}]):
+                await db["projects"].update_one(query, update, session=session)
+            # Seuls les étudiants qui n'étaient pas encore inscrits changent de version
+            query = {"_id": {"$in": chunk}, "project_ids": {"$ne": project_oid}}
+            update = {"$addToSet": {"project_ids": project_oid}, "$inc": {VERSION_FIELD: 1}}
+            async with track("students", "update", updates=[{"q": query, "u": update, "multi": True}]):
+                await db["students"].update_many(query, update, session=session)
+
+    if enrolled:
+        await _write_both_sides(write)
+        await _invalidate(project_oid, enrolled)
+        # Les étudiants sans projet et la taille des projets de `/stats` seront corrigés à la prochaine reconstruction
+        mark_stale("students")
+        mark_stale("projects")
+
+    return {
+        "project_id": str(project_oid),
+        "enrolled": [str(student_id) for student_id in enrolled],
+        "missing": [student_id for student_id in student_ids
+                    if not ObjectId.is_valid(student_id) or ObjectId(student_id) not in existing],
+    }
+
+
+# Logique pour désinscrire un étudiant d'un projet
+async def unenroll_student(project_id: str, student_id: str):
+    """
+    Cette fonction retire un étudiant d'un projet, des deux côtés de la relation.
+
+    - `project_id` : L'identifiant du projet.
+    - `student_id` : L'identifiant de l'étudiant.
+
+    Les identifiants stockés sous forme de chaîne (anciennes données) sont retirés eux aussi.
+    Retourne `True` si l'étudiant était inscrit au projet, `False` sinon.
+    """
+    project_oid = ObjectId(project_id)
+    student_oid = ObjectId(student_id)
+    removed = {}
+
+    async def write(session):
+        # Le filtre sur l'appartenance évite d'incrémenter la version si l'étudiant n'était pas inscrit
+        student_values = [student_oid, str(student_oid)]
+        query = {"_id": project_oid, "student_ids": {"$in": student_values}}
+        update = {"$pull": {"student_ids": {"$in": student_values}}, "$inc": {VERSION_FIELD: 1}}
+        async with track("projects", "update", updates=[{"q": query, "u": update}]):
+            result = await db["projects"].update_one(query, update, session=session)
+        removed["project"] = result.modified_count
+        project_values = [project_oid, str(project_oid)]
+        query = {"_id": student_oid, "project_ids": {"$in": project_values}}
+        update = {"$pull": {"project_ids": {"$in": project_values}}, "$inc": {VERSION_FIELD: 1}}
+        async with track("students", "update", updates=[{"q": query, "u": update}]):
+            result = await db["students"].update_one(query, update, session=session)
+        removed["student"] = result.modified_count
+
+    await _write_both_sides(write)
+    await _invalidate(project_oid, [student_oid])
+    if removed["project"] or removed["student"]:
+        mark_stale("students")
+        mark_stale("projects")
+
+    return bool(removed["project"] or removed["student"])
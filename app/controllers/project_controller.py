@@ -1,55 +1,193 @@
 from ..database import db
+from ..schemas import ProjectCreate
+from ..batch import fetch_by_ids
+from ..bulk import bulk_insert
+from ..cache import cache, document_key
+from ..coalescing import single_flight, query_key
+from ..counting import count_total
+from ..expand import lookup_stages, STUDENT_SUMMARY_PROJECTION
+from ..fields import build_projection
+from ..pagination import apply_cursor, sort_key, sort_spec
+from ..search import build_name_filter, with_normalized_name
+from ..slowlog import track
+from ..stats import COUNTED_FIELDS, record_documents
+from ..versioning import VERSION_FIELD, VersionConflict, version_filter
 from bson import ObjectId
+from pymongo import ReturnDocument
+
+# Champs autorisés pour le tri des listes (chacun doit être couvert par un index composé avec `_id`)
+SORT_FIELDS = ("_id", "name")
+
+
+def _build_query(name: str = None, p_id: str = None, search: str = "prefix") -> dict:
+    """
+    Construit le filtre MongoDB d'une liste de projets (sans la condition de curseur).
+    """
+    query = {}
+
+    # Recherche par nom de projet sur le nom normalisé et indexé (préfixe, texte ou sous-chaîne)
+    if name:
+        query.update(build_name_filter(name, search))
+
+    # Recherche par identifiant de projet (conversion en ObjectId)
+    if p_id:
+        query["_id"] = ObjectId(p_id)
+
+    return query
 
 
 # Logique pour récupérer tous les projets avec pagination et recherche optionnelle
-async def get_all_projects(page: int = 1, size: int = 10, name: str = None, p_id: str = None):
+async def get_all_projects(page: int = 1, size: int = 10, name: str = None, p_id: str = None,
+                           cursor: str = None, sort: str = "_id", search: str = "prefix",
+                           expand: tuple = None, fields: tuple = None, peek: bool = False):
     """
     Cette fonction récupère tous les projets depuis la base de données, avec des options
     de pagination et de recherche.
 
     - `page` : Numéro de la page pour la pagination (par défaut 1).
     - `size` : Nombre de projets à retourner par page (par défaut 10).
-    - `name` : Filtre optionnel pour rechercher un projet par nom (insensible à la casse).
+    - `name` : Filtre optionnel pour rechercher un projet par nom (insensible à la casse et aux accents).
     - `p_id` : Filtre optionnel pour rechercher un projet par son ID (MongoDB ObjectId).
+    - `cursor` : Curseur opaque renvoyé par la page précédente (pagination par curseur, optionnel).
+    - `sort` : Champ de tri, parmi `SORT_FIELDS` (par défaut `_id`).
+    - `search` : Mode de recherche sur le nom : `prefix` (par défaut), `text` ou `contains`.
+    - `expand` : Fenêtre `(offset, limit)` des étudiants à développer dans chaque document (voir `app/expand.py`).
+    - `fields` : Les champs à lire (voir `app/fields.py`) ; `None` pour les documents complets.
+    - `peek` : Lit un document de plus que `size`, pour savoir s'il existe une page suivante.
 
     La fonction construit une requête MongoDB dynamique selon les filtres fournis :
-    - Si `name` est fourni, on effectue une recherche par nom avec insensibilité à la casse (regex).
+    - Si `name` est fourni, la recherche s'appuie sur le champ normalisé et indexé (voir `app/search.py`).
     - Si `p_id` est fourni, on cherche par l'identifiant du projet (ObjectId).
-    La fonction applique ensuite la pagination avec `skip` et `limit`.
+    La fonction applique ensuite la pagination :
+    - avec `cursor`, on reprend après le dernier projet lu (coût constant, quelle que soit la page) ;
+    - sinon, on conserve la pagination historique avec `skip` et `limit`.
+    Une `ValueError` est levée si le champ de tri, le curseur ou le mode de recherche est invalide.
     """
-    query = {}
+    if sort not in SORT_FIELDS:
+        raise ValueError("Invalid sort field")
 
-    # Recherche par nom de projet avec une expression régulière (insensible à la casse)
-    if name:
-        query["name"] = {"$regex": name, "$options": "i"}
+    query = _build_query(name, p_id, search)
 
-    # Recherche par identifiant de projet (conversion en ObjectId)
-    if p_id:
-        query["_id"] = ObjectId(p_id)
+    # Pagination par curseur : la condition sur (champ de tri, _id) remplace le `skip`
+    if cursor:
+        query = apply_cursor(query, cursor, sort)
+        skip = 0
+    else:
+        skip = (page - 1) * size
+    limit = size + 1 if peek else size
 
-    # Exécution de la requête avec pagination
-    projects = await db["projects"].find(query).skip((page - 1) * size).limit(size).to_list(size)
+    # Exécution de la requête MongoDB avec pagination
+    # Les requêtes identiques simultanées (même filtre, tri, décalage et taille) partagent une seule lecture
+    if expand is None:
+        # Seuls les champs demandés sont lus (ainsi que le champ de tri, nécessaire au curseur)
+        projection = build_projection(fields, sort_key(sort))
+        key = query_key("projects", "find", query, projection=projection, sort=sort, skip=skip, size=limit)
+        # Une lecture plus lente que `SLOW_QUERY_MS` est journalisée avec son plan (voir `app/slowlog.py`)
+        async with track("projects", "find", filter=query, sort=dict(sort_spec(sort)), skip=skip, limit=limit):
+            projects = await single_flight.do(
+                key,
+                lambda: db["projects"].find(query, projection).sort(sort_spec(sort)).skip(skip).limit(limit)
+                .to_list(limit)
+            )
+    else:
+        # Vue développée : une seule agrégation, avec `$lookup` sur les étudiants de la page
+        pipeline = [
+            {"$match": query},
+            {"$sort": dict(sort_spec(sort))},
+            {"$skip": skip},
+            {"$limit": limit},
+        ] + lookup_stages("students", "student_ids", "students", STUDENT_SUMMARY_PROJECTION, expand)
+        if fields is not None:
+            pipeline.append({"$project": build_projection(fields, sort_key(sort), "students")})
+        key = query_key("projects", "aggregate", pipeline)
+        async with track("projects", "aggregate", pipeline=pipeline):
+            projects = await single_flight.do(key, lambda: db["projects"].aggregate(pipeline).to_list(limit))
 
     # Retourne la liste des projets récupérés
     return projects
 
 
+# Logique pour compter les projets d'une liste
+async def count_projects(name: str = None, p_id: str = None, search: str = "prefix"):
+    """
+    Cette fonction renvoie le nombre total de projets correspondant aux filtres d'une liste
+    (mêmes paramètres que `get_all_projects`), pour les métadonnées de pagination.
+    Le total est estimé ou mis en cache (voir `app/counting.py`).
+    """
+    return await count_total("projects", _build_query(name, p_id, search))
+
+
 # Logique pour récupérer un projet spécifique par son ID
-async def get_project_by_id(project_id: str):
+async def get_project_by_id(project_id: str, expand: tuple = None, fields: tuple = None):
     """
     Cette fonction récupère un projet spécifique en fonction de son identifiant `project_id`.
 
     - `project_id` : L'identifiant du projet (doit être converti en ObjectId).
+    - `expand` : Fenêtre `(offset, limit)` des étudiants à développer (optionnel).
+    - `fields` : Les champs à lire (voir `app/fields.py`) ; `None` pour le document complet.
 
-    La fonction utilise `find_one` pour rechercher un seul projet correspondant à l'ID.
+    La fonction consulte d'abord le cache de lecture ; en cas d'absence, elle utilise `find_one`
+    pour rechercher un seul projet correspondant à l'ID, puis le met en cache.
     """
-    project = await db["projects"].find_one({"_id": ObjectId(project_id)})
+    object_id = ObjectId(project_id)
+
+    # Vue développée : une seule agrégation avec `$lookup` (non mise en cache)
+    if expand is not None:
+        pipeline = [{"$match": {"_id": object_id}}] + lookup_stages(
+            "students", "student_ids", "students", STUDENT_SUMMARY_PROJECTION, expand
+        )
+        if fields is not None:
+            pipeline.append({"$project": build_projection(fields, "students")})
+        async with track("projects", "aggregate", pipeline=pipeline):
+            documents = await db["projects"].aggregate(pipeline).to_list(1)
+        return documents[0] if documents else None
+
+    key = document_key("projects", object_id)
+
+    # Génération de la clé, relevée avant toute lecture : si une écriture invalide le document pendant la lecture,
+    # le résultat n'est pas mis en cache (il pourrait être antérieur à l'écriture)
+    generation = await cache.generation(key)
+
+    # Lecture dans le cache (les projets absents de la base ne sont pas mis en cache)
+    project = await cache.get(key)
+    if project is not None:
+        return project
+
+    # Document partiel : lecture avec projection, sans mise en cache (le cache ne contient que des documents complets)
+    if fields is not None:
+        projection = build_projection(fields, VERSION_FIELD)  # la version sert à calculer l'ETag
+        async with track("projects", "find", filter={"_id": object_id}, projection=projection, limit=1):
+            return await single_flight.do(
+                query_key("projects", "find_one", {"_id": object_id}, projection=projection),
+                lambda: db["projects"].find_one({"_id": object_id}, projection),
+            )
+
+    # Les lectures simultanées du même document partagent une seule requête ; une lecture commencée
+    # après une écriture ne rejoint pas celle qui était en cours avant (la génération fait partie de la clé)
+    async with track("projects", "find", filter={"_id": object_id}, limit=1):
+        project = await single_flight.do("{}@{}".format(key, generation),
+                                         lambda: db["projects"].find_one({"_id": object_id}))
+    if project is not None:
+        await cache.set(key, project, generation)
 
     # Retourne le projet correspondant
     return project
 
 
+# Logique pour récupérer plusieurs projets en une seule requête
+async def get_projects_by_ids(ids: list, fields: tuple = None):
+    """
+    Cette fonction récupère plusieurs projets à partir d'une liste d'identifiants (lecture groupée).
+
+    - `ids` : La liste des identifiants demandés (chaînes).
+    - `fields` : Les champs à lire (voir `app/fields.py`) ; `None` pour les documents complets.
+
+    Les projets en cache sont servis directement, les autres sont lus avec une seule requête `$in`.
+    Retourne un tuple `(projects, missing)` : les projets trouvés dans l'ordre de la requête
+    et les identifiants introuvables.
+    """
+    return await fetch_by_ids("projects", ids, build_projection(fields))
+
 # Logique pour créer un nouveau projet
 async def create_project(project_data):
     """
@@ -59,18 +197,53 @@ async def create_project(project_data):
 
     La fonction insère les données dans la collection "projects" et renvoie le projet créé.
     """
+    # Ajoute le nom normalisé utilisé par la recherche indexée
+    with_normalized_name(project_data)
+    project_data[VERSION_FIELD] = 1
+
     # Insère le projet dans la collection "projects"
-    result = await db["projects"].insert_one(project_data)
+    # `insert_one` ajoute l'`_id` généré au dictionnaire : il suffit de le renvoyer, sans relire la base
+    async with track("projects", "insert"):
+        await db["projects"].insert_one(project_data)
+    project = project_data
 
-    # Récupère le projet fraîchement inséré en utilisant l'ID généré
-    project = await db["projects"].find_one({"_id": result.inserted_id})
+    # Met à jour les compteurs de `/stats`
+    record_documents("projects", [project])
 
     # Retourne le projet créé
     return project
 
 
+def _prepare_project(project_data: dict) -> dict:
+    """
+    Complète un projet validé avant son insertion groupée.
+    """
+    project_data[VERSION_FIELD] = 1
+    return with_normalized_name(project_data)
+
+
+# Logique pour importer des projets en masse
+async def import_projects(rows: list):
+    """
+    Cette fonction valide et insère un lot de projets (voir `app/bulk.py`).
+
+    - `rows` : Les lignes du corps de la requête (tableau JSON ou NDJSON).
+
+    Chaque ligne est validée par `ProjectCreate` ; les lignes invalides sont signalées sans interrompre l'importation.
+    """
+    return await bulk_insert("projects", ProjectCreate, rows, _prepare_project,
+                             on_inserted=lambda documents: record_documents("projects", documents))
+
+
+async def _exists(project_id: str) -> bool:
+    """
+    Indique si le projet existe (lecture de l'index `_id` uniquement).
+    """
+    return await db["projects"].find_one({"_id": ObjectId(project_id)}, {"_id": 1}) is not None
+
+
 # Logique pour mettre à jour un projet
-async def update_project(project_id: str, update_data: dict):
+async def update_project(project_id: str, update_data: dict, version: int = None):
     """
     Cette fonction met à jour un projet spécifique en fonction de son identifiant.
 
@@ -78,28 +251,65 @@ async def update_project(project_id: str, update_data: dict):
     - `update_data` : Un dictionnaire contenant les données à mettre à jour.
 
     La fonction met à jour les champs spécifiés dans `update_data` pour le projet donné.
+    Chaque modification incrémente la version du document (`_v`, voir `app/versioning.py`).
+    Si `version` est fourni et ne correspond plus à celle du document, une `VersionConflict` est levée.
     """
+    # Met à jour le nom normalisé si le nom change
+    with_normalized_name(update_data)
+
+    # Avec `version` (en-tête `If-Match`), la mise à jour n'est appliquée que si la version n'a pas changé
+    query = {"_id": ObjectId(project_id)}
+    if version is not None:
+        query.update(version_filter(version))
+
     # Mise à jour du projet dans la collection "projects"
-    await db["projects"].update_one({"_id": ObjectId(project_id)}, {"$set": update_data})
+    # `find_one_and_update` applique la modification et renvoie le document à jour en un seul aller-retour
+    if update_data:
+        update = {"$set": update_data, "$inc": {VERSION_FIELD: 1}}
+        async with track("projects", "findAndModify", query=query, update=update, new=True):
+            project = await db["projects"].find_one_and_update(query, update, return_document=ReturnDocument.AFTER)
+    else:
+        # Aucun champ à modifier : on renvoie simplement le document courant
+        async with track("projects", "find", filter=query, limit=1):
+            project = await db["projects"].find_one(query)
+
+    # Version différente de celle attendue : le document existe mais a été modifié entre-temps
+    if project is None and version is not None and await _exists(project_id):
+        raise VersionConflict()
 
-    # Récupère le projet mis à jour
-    project = await db["projects"].find_one({"_id": ObjectId(project_id)})
+    # Invalide l'entrée du cache : la prochaine lecture relira le projet à jour
+    await cache.delete(document_key("projects", ObjectId(project_id)))
 
     # Retourne le projet mis à jour
     return project
 
 
 # Logique pour supprimer un projet
-async def delete_project(project_id: str):
+async def delete_project(project_id: str, version: int = None):
     """
     Cette fonction supprime un projet spécifique en fonction de son identifiant `project_id`.
 
     - `project_id` : L'identifiant du projet (doit être converti en ObjectId).
 
     La fonction supprime le projet correspondant dans la base de données et retourne `True` si la suppression a réussi.
+    Si `version` est fourni (en-tête `If-Match`) et ne correspond plus à celle du document,
+    une `VersionConflict` est levée.
     """
     # Suppression du projet dans la collection "projects"
-    result = await db["projects"].delete_one({"_id": ObjectId(project_id)})
+    query = {"_id": ObjectId(project_id)}
+    if version is not None:
+        query.update(version_filter(version))
+    # `find_one_and_delete` renvoie les champs comptés par `/stats`, sans seconde lecture
+    projection = {field: 1 for field in COUNTED_FIELDS["projects"]}
+    async with track("projects", "findAndModify", query=query, remove=True, fields=projection):
+        deleted = await db["projects"].find_one_and_delete(query, projection=projection)
+    if deleted is None and version is not None and await _exists(project_id):
+        raise VersionConflict()
+    if deleted is not None:
+        record_documents("projects", [deleted], delta=-1)
+
+    # Retire le projet du cache de lecture
+    await cache.delete(document_key("projects", ObjectId(project_id)))
 
     # Retourne True si un document a été supprimé, False sinon
-    return result.deleted_count == 1
+    return deleted is not None
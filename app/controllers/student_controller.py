@@ -1,56 +1,194 @@
 from ..database import db
+from ..schemas import StudentCreate
+from ..batch import fetch_by_ids
+from ..bulk import bulk_insert
+from ..cache import cache, document_key
+from ..coalescing import single_flight, query_key
+from ..counting import count_total
+from ..expand import lookup_stages, PROJECT_SUMMARY_PROJECTION
+from ..fields import build_projection
+from ..pagination import apply_cursor, sort_key, sort_spec
+from ..search import build_name_filter, with_normalized_name
+from ..slowlog import track
+from ..stats import COUNTED_FIELDS, record_change, record_documents
+from ..versioning import VERSION_FIELD, VersionConflict, version_filter
 from bson import ObjectId
+from pymongo import ReturnDocument
+
+# Champs autorisés pour le tri des listes (chacun doit être couvert par un index composé avec `_id`)
+SORT_FIELDS = ("_id", "name")
+
+
+def _build_query(name: str = None, s_id: str = None, search: str = "prefix") -> dict:
+    """
+    Construit le filtre MongoDB d'une liste de étudiants (sans la condition de curseur).
+    """
+    query = {}
+
+    # Si un nom est fourni, on effectue une recherche indexée sur le nom normalisé (préfixe, texte ou sous-chaîne)
+    if name:
+        query.update(build_name_filter(name, search))
+
+    # Si un identifiant est fourni, on le recherche par ObjectId
+    if s_id:
+        query["_id"] = ObjectId(s_id)
+
+    return query
 
 
 # Logique pour récupérer tous les étudiants avec pagination et recherche optionnelle
-async def get_all_students(page: int = 1, size: int = 10, name: str = None, s_id: str = None):
+async def get_all_students(page: int = 1, size: int = 10, name: str = None, s_id: str = None,
+                           cursor: str = None, sort: str = "_id", search: str = "prefix",
+                           expand: tuple = None, fields: tuple = None, peek: bool = False):
     """
     Cette fonction récupère tous les étudiants avec la possibilité de paginer les résultats
     et de filtrer par nom ou identifiant.
 
     - `page` : Numéro de la page pour la pagination (par défaut 1).
     - `size` : Nombre d'étudiants par page (par défaut 10).
-    - `name` : Filtre optionnel pour rechercher un étudiant par nom (insensible à la casse).
+    - `name` : Filtre optionnel pour rechercher un étudiant par nom (insensible à la casse et aux accents).
     - `s_id` : Filtre optionnel pour rechercher un étudiant par son ID (ObjectId).
+    - `cursor` : Curseur opaque renvoyé par la page précédente (pagination par curseur, optionnel).
+    - `sort` : Champ de tri, parmi `SORT_FIELDS` (par défaut `_id`).
+    - `search` : Mode de recherche sur le nom : `prefix` (par défaut), `text` ou `contains`.
+    - `expand` : Fenêtre `(offset, limit)` des projets à développer dans chaque document (voir `app/expand.py`).
+    - `fields` : Les champs à lire (voir `app/fields.py`) ; `None` pour les documents complets.
+    - `peek` : Lit un document de plus que `size`, pour savoir s'il existe une page suivante.
 
     La fonction construit une requête MongoDB dynamique selon les filtres fournis :
-    - Si `name` est fourni, il effectue une recherche insensible à la casse via une regex.
+    - Si `name` est fourni, la recherche s'appuie sur le champ normalisé et indexé (voir `app/search.py`).
     - Si `s_id` est fourni, il cherche l'étudiant par son ID.
-    La fonction applique ensuite la pagination via `skip` et `limit`.
+    La fonction applique ensuite la pagination :
+    - avec `cursor`, on reprend après le dernier document lu (coût constant, quelle que soit la page) ;
+    - sinon, on conserve la pagination historique via `skip` et `limit`.
+    Une `ValueError` est levée si le champ de tri, le curseur ou le mode de recherche est invalide.
     """
-    query = {}
+    if sort not in SORT_FIELDS:
+        raise ValueError("Invalid sort field")
 
-    # Si un nom est fourni, on effectue une recherche par expression régulière (insensible à la casse)
-    if name:
-        query["name"] = {"$regex": name, "$options": "i"}
+    query = _build_query(name, s_id, search)
 
-    # Si un identifiant est fourni, on le recherche par ObjectId
-    if s_id:
-        query["_id"] = ObjectId(s_id)
+    # Pagination par curseur : la condition sur (champ de tri, _id) remplace le `skip`
+    if cursor:
+        query = apply_cursor(query, cursor, sort)
+        skip = 0
+    else:
+        skip = (page - 1) * size
+    limit = size + 1 if peek else size
 
     # Exécution de la requête MongoDB avec pagination
-    students = await db["students"].find(query).skip((page - 1) * size).limit(size).to_list(size)
+    # Les requêtes identiques simultanées (même filtre, tri, décalage et taille) partagent une seule lecture
+    if expand is None:
+        # Seuls les champs demandés sont lus (ainsi que le champ de tri, nécessaire au curseur)
+        projection = build_projection(fields, sort_key(sort))
+        key = query_key("students", "find", query, projection=projection, sort=sort, skip=skip, size=limit)
+        # Une lecture plus lente que `SLOW_QUERY_MS` est journalisée avec son plan (voir `app/slowlog.py`)
+        async with track("students", "find", filter=query, sort=dict(sort_spec(sort)), skip=skip, limit=limit):
+            students = await single_flight.do(
+                key,
+                lambda: db["students"].find(query, projection).sort(sort_spec(sort)).skip(skip).limit(limit)
+                .to_list(limit)
+            )
+    else:
+        # Vue développée : une seule agrégation, avec `$lookup` sur les projets de la page
+        pipeline = [
+            {"$match": query},
+            {"$sort": dict(sort_spec(sort))},
+            {"$skip": skip},
+            {"$limit": limit},
+        ] + lookup_stages("projects", "project_ids", "projects", PROJECT_SUMMARY_PROJECTION, expand)
+        if fields is not None:
+            pipeline.append({"$project": build_projection(fields, sort_key(sort), "projects")})
+        key = query_key("students", "aggregate", pipeline)
+        async with track("students", "aggregate", pipeline=pipeline):
+            students = await single_flight.do(key, lambda: db["students"].aggregate(pipeline).to_list(limit))
 
     # Retourner la liste des étudiants
     return students
 
 
+# Logique pour compter les étudiants d'une liste
+async def count_students(name: str = None, s_id: str = None, search: str = "prefix"):
+    """
+    Cette fonction renvoie le nombre total de étudiants correspondant aux filtres d'une liste
+    (mêmes paramètres que `get_all_students`), pour les métadonnées de pagination.
+    Le total est estimé ou mis en cache (voir `app/counting.py`).
+    """
+    return await count_total("students", _build_query(name, s_id, search))
+
+
 # Logique pour récupérer un étudiant spécifique par son ID
-async def get_student_by_id(student_id: str):
+async def get_student_by_id(student_id: str, expand: tuple = None, fields: tuple = None):
     """
     Cette fonction récupère un étudiant spécifique en fonction de son identifiant `student_id`.
 
     - `student_id` : L'identifiant de l'étudiant (ObjectId).
+    - `expand` : Fenêtre `(offset, limit)` des projets à développer (optionnel).
+    - `fields` : Les champs à lire (voir `app/fields.py`) ; `None` pour le document complet.
 
-    Elle utilise la méthode `find_one()` pour obtenir un seul document correspondant à l'ID fourni.
+    Elle consulte d'abord le cache de lecture, puis, en cas d'absence, utilise la méthode `find_one()`
+    pour obtenir un seul document correspondant à l'ID fourni, qui est ensuite mis en cache.
     """
+    object_id = ObjectId(student_id)
+
+    # Vue développée : une seule agrégation avec `$lookup` (non mise en cache)
+    if expand is not None:
+        pipeline = [{"$match": {"_id": object_id}}] + lookup_stages(
+            "projects", "project_ids", "projects", PROJECT_SUMMARY_PROJECTION, expand
+        )
+        if fields is not None:
+            pipeline.append({"$project": build_projection(fields, "projects")})
+        async with track("students", "aggregate", pipeline=pipeline):
+            documents = await db["students"].aggregate(pipeline).to_list(1)
+        return documents[0] if documents else None
+
+    key = document_key("students", object_id)
+
+    # Génération de la clé, relevée avant toute lecture : si une écriture invalide le document pendant la lecture,
+    # le résultat n'est pas mis en cache (il pourrait être antérieur à l'écriture)
+    generation = await cache.generation(key)
+
+    # Lecture dans le cache (les étudiants absents de la base ne sont pas mis en cache)
+    student = await cache.get(key)
+    if student is not None:
+        return student
+
+    # Document partiel : lecture avec projection, sans mise en cache (le cache ne contient que des documents complets)
+    if fields is not None:
+        projection = build_projection(fields, VERSION_FIELD)  # la version sert à calculer l'ETag
+        async with track("students", "find", filter={"_id": object_id}, projection=projection, limit=1):
+            return await single_flight.do(
+                query_key("students", "find_one", {"_id": object_id}, projection=projection),
+                lambda: db["students"].find_one({"_id": object_id}, projection),
+            )
+
     # Récupère un étudiant en cherchant par ObjectId
-    student = await db["students"].find_one({"_id": ObjectId(student_id)})
+    # Les lectures simultanées du même document partagent une seule requête ; une lecture commencée
+    # après une écriture ne rejoint pas celle qui était en cours avant (la génération fait partie de la clé)
+    async with track("students", "find", filter={"_id": object_id}, limit=1):
+        student = await single_flight.do("{}@{}".format(key, generation),
+                                         lambda: db["students"].find_one({"_id": object_id}))
+    if student is not None:
+        await cache.set(key, student, generation)
 
     # Retourne l'étudiant trouvé
     return student
 
 
+# Logique pour récupérer plusieurs étudiants en une seule requête
+async def get_students_by_ids(ids: list, fields: tuple = None):
+    """
+    Cette fonction récupère plusieurs étudiants à partir d'une liste d'identifiants (lecture groupée).
+
+    - `ids` : La liste des identifiants demandés (chaînes).
+    - `fields` : Les champs à lire (voir `app/fields.py`) ; `None` pour les documents complets.
+
+    Les étudiants en cache sont servis directement, les autres sont lus avec une seule requête `$in`.
+    Retourne un tuple `(students, missing)` : les étudiants trouvés dans l'ordre de la requête
+    et les identifiants introuvables.
+    """
+    return await fetch_by_ids("students", ids, build_projection(fields))
+
 # Logique pour créer un nouvel étudiant
 async def create_student(student_data):
     """
@@ -60,18 +198,55 @@ async def create_student(student_data):
 
     Elle insère les données dans la collection "students" et renvoie l'étudiant nouvellement créé.
     """
+    # Ajoute le nom normalisé utilisé par la recherche indexée
+    with_normalized_name(student_data)
+    student_data[VERSION_FIELD] = 1
+
     # Insère les données de l'étudiant dans la collection "students"
-    result = await db["students"].insert_one(student_data)
+    # `insert_one` ajoute l'`_id` généré au dictionnaire : il suffit de le renvoyer, sans relire la base
+    async with track("students", "insert"):
+        await db["students"].insert_one(student_data)
+    student = student_data
 
-    # Récupère l'étudiant fraîchement inséré en utilisant l'ID généré par MongoDB
-    student = await db["students"].find_one({"_id": result.inserted_id})
+    # Met à jour les compteurs de `/stats` (en mémoire, écrits plus tard : voir `app/stats.py`)
+    record_documents("students", [student])
 
     # Retourner l'étudiant créé
     return student
 
 
+def _prepare_student(student_data: dict) -> dict:
+    """
+    Complète un étudiant validé avant son insertion groupée.
+    """
+    # Comme pour `POST /students`, un étudiant est créé sans projet
+    student_data.setdefault("project_ids", [])
+    student_data[VERSION_FIELD] = 1
+    return with_normalized_name(student_data)
+
+
+# Logique pour importer des étudiants en masse
+async def import_students(rows: list):
+    """
+    Cette fonction valide et insère un lot d'étudiants (voir `app/bulk.py`).
+
+    - `rows` : Les lignes du corps de la requête (tableau JSON ou NDJSON).
+
+    Chaque ligne est validée par `StudentCreate` ; les lignes invalides sont signalées sans interrompre l'importation.
+    """
+    return await bulk_insert("students", StudentCreate, rows, _prepare_student,
+                             on_inserted=lambda documents: record_documents("students", documents))
+
+
+async def _exists(student_id: str) -> bool:
+    """
+    Indique si l'étudiant existe (lecture de l'index `_id` uniquement).
+    """
+    return await db["students"].find_one({"_id": ObjectId(student_id)}, {"_id": 1}) is not None
+
+
 # Logique pour mettre à jour un étudiant
-async def update_student(student_id: str, update_data: dict):
+async def update_student(student_id: str, update_data: dict, version: int = None):
     """
     Cette fonction met à jour un étudiant en fonction de son identifiant `student_id`.
 
@@ -79,19 +254,51 @@ async def update_student(student_id: str, update_data: dict):
     - `update_data` : Un dictionnaire contenant les champs à mettre à jour.
 
     Elle met à jour uniquement les champs fournis dans `update_data` pour l'étudiant donné.
+    Chaque modification incrémente la version du document (`_v`, voir `app/versioning.py`).
+    Si `version` est fourni et ne correspond plus à celle du document, une `VersionConflict` est levée.
     """
+    # Met à jour le nom normalisé si le nom change
+    with_normalized_name(update_data)
+
+    # Avec `version` (en-tête `If-Match`), la mise à jour n'est appliquée que si la version n'a pas changé
+    query = {"_id": ObjectId(student_id)}
+    if version is not None:
+        query.update(version_filter(version))
+
     # Met à jour les données de l'étudiant dans la collection "students"
-    await db["students"].update_one({"_id": ObjectId(student_id)}, {"$set": update_data})
+    # `find_one_and_update` applique la modification et renvoie le document à jour en un seul aller-retour
+    if update_data:
+        update = {"$set": update_data, "$inc": {VERSION_FIELD: 1}}
+        # Un changement de cours ou de filière déplace l'étudiant d'un compteur de `/stats` à l'autre : le document
+        # d'avant la modification est demandé à la place, et le document à jour reconstruit à partir de `update_data`
+        counted = any(field in update_data for field in COUNTED_FIELDS["students"])
+        async with track("students", "findAndModify", query=query, update=update, new=not counted):
+            student = await db["students"].find_one_and_update(
+                query, update, return_document=ReturnDocument.BEFORE if counted else ReturnDocument.AFTER
+            )
+        if counted and student is not None:
+            before = student
+            student = dict(before, **update_data)
+            student[VERSION_FIELD] = before.get(VERSION_FIELD, 0) + 1
+            record_change("students", before, student)
+    else:
+        # Aucun champ à modifier : on renvoie simplement le document courant
+        async with track("students", "find", filter=query, limit=1):
+            student = await db["students"].find_one(query)
+
+    # Version différente de celle attendue : le document existe mais a été modifié entre-temps
+    if student is None and version is not None and await _exists(student_id):
+        raise VersionConflict()
 
-    # Récupère l'étudiant mis à jour pour confirmer les changements
-    student = await db["students"].find_one({"_id": ObjectId(student_id)})
+    # Invalide l'entrée du cache : la prochaine lecture relira l'étudiant à jour
+    await cache.delete(document_key("students", ObjectId(student_id)))
 
     # Retourne l'étudiant mis à jour
     return student
 
 
 # Logique pour supprimer un étudiant
-async def delete_student(student_id: str):
+async def delete_student(student_id: str, version: int = None):
     """
     Cette fonction supprime un étudiant en fonction de son identifiant `student_id`.
 
@@ -99,9 +306,24 @@ async def delete_student(student_id: str):
 
     Elle supprime le document correspondant dans la base de données et retourne `True`
     si la suppression a réussi, ou `False` sinon.
+    Si `version` est fourni (en-tête `If-Match`) et ne correspond plus à celle du document,
+    une `VersionConflict` est levée.
     """
     # Supprime l'étudiant en fonction de son ObjectId
-    result = await db["students"].delete_one({"_id": ObjectId(student_id)})
+    query = {"_id": ObjectId(student_id)}
+    if version is not None:
+        query.update(version_filter(version))
+    # `find_one_and_delete` renvoie les champs comptés par `/stats`, sans seconde lecture
+    projection = {field: 1 for field in COUNTED_FIELDS["students"]}
+    async with track("students", "findAndModify", query=query, remove=True, fields=projection):
+        deleted = await db["students"].find_one_and_delete(query, projection=projection)
+    if deleted is None and version is not None and await _exists(student_id):
+        raise VersionConflict()
+    if deleted is not None:
+        record_documents("students", [deleted], delta=-1)
+
+    # Retire l'étudiant du cache de lecture
+    await cache.delete(document_key("students", ObjectId(student_id)))
 
     # Retourne True si un étudiant a été supprimé, False sinon
-    return result
+    return deleted is not None
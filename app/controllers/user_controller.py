@@ -1,3 +1,6 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from bson import ObjectId
 from ..database import db  # Assure-toi que cela pointe vers ton fichier de connexion MongoDB
@@ -10,6 +13,14 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # "bcrypt" est l'algorithme de hachage utilisé pour sécuriser les mots de passe.
 # `deprecated="auto"` permet de gérer automatiquement la compatibilité des anciens schémas de hachage.
 
+# Pool de threads dédié au hachage des mots de passe
+# bcrypt est volontairement lent (plusieurs dizaines de millisecondes par appel) : exécuté dans la boucle
+# d'événements, il bloquerait toutes les autres requêtes du worker. On l'exécute donc dans un pool de threads
+# borné (bcrypt libère le GIL), dont la taille fixe le nombre maximal de hachages simultanés.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", min(4, os.cpu_count() or 1)))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash")
+
+
 # Fonction pour hacher un mot de passe
 def hash_password(password: str) -> str:
     """
@@ -31,6 +42,23 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# Versions asynchrones, à utiliser depuis les routes et les contrôleurs
+async def hash_password_async(password: str) -> str:
+    """
+    Cette fonction hache un mot de passe dans le pool `password_executor`, sans bloquer la boucle d'événements.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Cette fonction vérifie un mot de passe dans le pool `password_executor`, sans bloquer la boucle d'événements.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+
 # Créer un nouvel utilisateur
 async def create_user(user_data):
     """
@@ -42,19 +70,26 @@ async def create_user(user_data):
     1. Hacher le mot de passe en clair.
     2. Supprimer le mot de passe en clair avant de stocker les données.
     3. Insérer les données de l'utilisateur dans MongoDB.
-    4. Récupérer et retourner l'utilisateur fraîchement créé.
+    4. Retourner l'utilisateur créé, construit à partir du document inséré (sans relecture).
+
+    L'unicité de l'email et du nom d'utilisateur est garantie par des index uniques (`app/indexes.py`) :
+    une `pymongo.errors.DuplicateKeyError` est levée si l'utilisateur existe déjà.
     """
     # Hacher le mot de passe et remplacer le mot de passe en clair par sa version hachée
-    user_data["hashed_password"] = hash_password(user_data["password"])
+    user_data["hashed_password"] = await hash_password_async(user_data["password"])
 
     # Supprimer le mot de passe en clair avant d'insérer dans la base de données
     del user_data["password"]
 
-    # Insérer l'utilisateur dans la collection "users" de MongoDB
-    result = await db["users"].insert_one(user_data)
+    # Valeurs par défaut du modèle `User`
+    user_data.setdefault("is_active", True)
+    user_data.setdefault("is_admin", False)
+
+    # Insérer l'utilisateur dans la collection "users" de MongoDB (`insert_one` ajoute l'`_id` au dictionnaire)
+    await db["users"].insert_one(user_data)
 
     # Retourner l'utilisateur fraîchement créé
-    return await db["users"].find_one({"_id": result.inserted_id})
+    return user_data
 
 
 # Récupérer un utilisateur par son email
@@ -68,6 +103,15 @@ async def get_user_by_email(email: str):
     """
     return await db["users"].find_one({"email": email})
 
-# Autres fonctions CRUD...
-# D'autres fonctions de gestion CRUD (Create, Read, Update, Delete) peuvent être ajoutées ici
-# pour gérer d'autres aspects du modèle utilisateur, comme la mise à jour ou la suppression des utilisateurs.
+
+# Récupérer un utilisateur par son nom d'utilisateur
+async def get_user_by_username(username: str):
+    """
+    Cette fonction récupère un utilisateur en fonction de son nom d'utilisateur.
+
+    - `username` : Le nom d'utilisateur à rechercher.
+
+    Retourne un document utilisateur s'il est trouvé, sinon None.
+    """
+    return await db["users"].find_one({"username": username})
+
@@ -0,0 +1,42 @@
+import os
+from .cache import LRUCache
+from .coalescing import single_flight, query_key
+from .database import db
+from .slowlog import track
+
+# Durée pendant laquelle un total est réutilisé (en secondes)
+COUNT_TTL_SECONDS = float(os.getenv("COUNT_TTL_SECONDS", 30))
+
+# Nombre maximal de filtres dont le total est conservé
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", 1000))
+
+# Totaux déjà calculés, par collection et filtre (un cache par worker)
+count_cache = LRUCache(max_entries=COUNT_CACHE_MAX_ENTRIES, ttl=COUNT_TTL_SECONDS)
+
+
+async def count_total(collection: str, query: dict) -> int:
+    """
+    Cette fonction renvoie le nombre total de documents correspondant à un filtre, pour les métadonnées
+    de pagination, sans doubler le coût de chaque page.
+
+    - `collection` : Le nom de la collection ("students" ou "projects").
+    - `query` : Le filtre de la liste, sans la condition de curseur.
+
+    Sans filtre, le total est lu dans les métadonnées de la collection (`estimated_document_count`, coût
+    constant). Avec un filtre, `count_documents` est exécuté puis conservé `COUNT_TTL_SECONDS` secondes :
+    le total peut donc être légèrement en retard sur les dernières écritures.
+    Les calculs simultanés du même total partagent une seule requête.
+    """
+    key = query_key(collection, "count", query)
+    total = count_cache.get(key)
+    if total is not None:
+        return total
+
+    if query:
+        async with track(collection, "count", query=query):
+            total = await single_flight.do(key, lambda: db[collection].count_documents(query))
+    else:
+        total = await single_flight.do(key, lambda: db[collection].estimated_document_count())
+
+    count_cache.set(key, total)
+    return total
@@ -1,6 +1,10 @@
+import os
+import threading
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from dotenv import load_dotenv
-import os
+from .metrics import METRICS_ENABLED, Gauge, Histogram
+from .profiling import add_database_time
 
 # Charger les variables d'environnement depuis le fichier .env
 load_dotenv()
@@ -13,13 +17,233 @@ MONGO_DB_URL = os.getenv("MONGO_DB_URL")
 # L'utilisation de dotenv permet de garder les informations sensibles, comme l'URL de la base de données,
 # hors du code source, ce qui est plus sécurisé (cela peut inclure des informations d'authentification).
 
-# Créer un client MongoDB asynchrone en utilisant l'URL récupérée
-client = AsyncIOMotorClient(MONGO_DB_URL)
+# Nom de la base de données utilisée par l'application
+DB_NAME = "db_EtudiantProject"
+
+# Réglages du pool de connexions, configurables par variables d'environnement
+# Chaque worker uvicorn/gunicorn possède son propre client, donc son propre pool : le nombre total de connexions
+# ouvertes vers MongoDB est d'environ `MONGO_MAX_POOL_SIZE` x nombre de workers.
+# Seules les variables définies sont transmises au driver : les options présentes dans l'URL restent valables.
+POOL_SETTINGS = {
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_TIME_MS", int),
+    "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+    # Compression réseau, par exemple "zstd,snappy" (nécessite les paquets `zstandard` / `python-snappy`)
+    "compressors": ("MONGO_COMPRESSORS", str),
+    # Préférence de lecture : primary, primaryPreferred, secondary, secondaryPreferred ou nearest
+    "readPreference": ("MONGO_READ_PREFERENCE", str),
+}
+
+
+def client_options() -> dict:
+    """
+    Cette fonction construit les options du client MongoDB à partir des variables d'environnement définies.
+    """
+    options = {}
+    for option, (variable, cast) in POOL_SETTINGS.items():
+        value = os.getenv(variable)
+        if value:
+            options[option] = cast(value)
+    return options
+
+
+# Statistiques du pool de connexions
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Ce listener pymongo compte les événements du pool de connexions de ce worker.
+    Les événements sont émis depuis les threads du driver : les compteurs sont protégés par un verrou.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.clears = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def snapshot(self) -> dict:
+        """
+        Retourne une copie cohérente des compteurs.
+        """
+        with self._lock:
+            return {
+                "connections_open": self.created - self.closed,
+                "connections_created": self.created,
+                "connections_closed": self.closed,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_cleared": self.clears,
+                "wait_time_avg_ms": 1000 * self.wait_time_total / self.checkouts if self.checkouts else 0.0,
+                "wait_time_max_ms": 1000 * self.wait_time_max,
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_checked_out(self, event):
+        # `duration` (temps d'attente pour obtenir la connexion) n'existe qu'à partir de pymongo 4.7
+        duration = getattr(event, "duration", None) or 0.0
+        pool_wait_duration.observe((), duration)
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_time_total += duration
+            self.wait_time_max = max(self.wait_time_max, duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.clears += 1
+
+    # Événements sans intérêt pour les statistiques
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+pool_stats = PoolStats()
+
+
+# Durée des commandes MongoDB
+class CommandStats(monitoring.CommandListener):
+    """
+    Ce listener pymongo mesure la durée de chaque commande MongoDB (find, aggregate, insert...)
+    et l'enregistre dans l'histogramme `mongodb_command_duration_seconds`, avec son résultat (succès ou échec),
+    ainsi que dans le profil de la requête en cours (voir `app/profiling.py`).
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        add_database_time(event.duration_micros / 1e6)
+        if METRICS_ENABLED:
+            mongodb_command_duration.observe((event.command_name, "ok"), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        add_database_time(event.duration_micros / 1e6)
+        if METRICS_ENABLED:
+            mongodb_command_duration.observe((event.command_name, "failed"), event.duration_micros / 1e6)
+
+
+command_stats = CommandStats()
+
+
+# Métriques MongoDB exposées par `GET /metrics` (voir `app/metrics.py`)
+mongodb_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "Durée des commandes MongoDB.", ("command", "outcome")
+)
+pool_wait_duration = Histogram(
+    "mongodb_pool_wait_seconds", "Temps d'attente pour obtenir une connexion du pool MongoDB."
+)
+
+
+def _pool_connections() -> dict:
+    """
+    Renvoie le nombre de connexions ouvertes et empruntées du pool, pour la jauge `mongodb_pool_connections`.
+    """
+    snapshot = pool_stats.snapshot()
+    return {("open",): snapshot["connections_open"], ("checked_out",): snapshot["checked_out"]}
+
+
+Gauge("mongodb_pool_connections", "Connexions du pool MongoDB (ouvertes / empruntées).", ("state",),
+      function=_pool_connections)
+
+# Client MongoDB asynchrone, créé au démarrage de l'application (voir `connect`) et fermé à l'arrêt
+client = None
 # `AsyncIOMotorClient` est le client MongoDB asynchrone fourni par `motor`, une extension asynchrone de `pymongo`.
 # Ce client est utilisé pour interagir avec MongoDB dans un environnement asynchrone (par exemple, dans FastAPI).
 
-# Accéder à une base de données spécifique "db_EtudiantProject"
 
-db = client["db_EtudiantProject"]
+def connect():
+    """
+    Cette fonction crée le client MongoDB avec les réglages du pool. Elle est appelée dans le `lifespan`
+    de l'application (ou au début d'un script), et non à l'import du module.
+    """
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(MONGO_DB_URL, event_listeners=[pool_stats, command_stats], **client_options())
+    return client
+
+
+def close():
+    """
+    Cette fonction ferme le client MongoDB et libère toutes les connexions du pool.
+    """
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+
+def get_database():
+    """
+    Cette fonction renvoie la base de données de l'application.
+    Une `RuntimeError` est levée si le client n'a pas encore été créé avec `connect()`.
+    """
+    if client is None:
+        raise RuntimeError("MongoDB client is not connected")
+    return client[DB_NAME]
+
+
+def get_pool_stats() -> dict:
+    """
+    Cette fonction renvoie les statistiques du pool de connexions de ce worker,
+    accompagnées des réglages utiles pour dimensionner le pool.
+    """
+    options = client_options()
+    stats = pool_stats.snapshot()
+    stats["pid"] = os.getpid()
+    stats["max_pool_size"] = client.options.pool_options.max_pool_size if client is not None else options.get("maxPoolSize")
+    stats["min_pool_size"] = client.options.pool_options.min_pool_size if client is not None else options.get("minPoolSize")
+    return stats
+
+
+# Accès à la base de données "db_EtudiantProject"
+class DatabaseProxy:
+    """
+    Cet objet remplace la base de données créée à l'import : il délègue chaque accès (par exemple
+    `db["students"]`) à la base du client courant. Les modules peuvent ainsi continuer à importer `db`
+    alors que le client n'est créé qu'au démarrage de l'application.
+    """
+
+    def __getitem__(self, name):
+        return get_database()[name]
+
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
+
+
+db = DatabaseProxy()
 # La variable `db` permet d'accéder à la base de données MongoDB appelée "db_EtudiantProject".
 # Toutes les opérations sur les collections de cette base de données passeront par cet objet.
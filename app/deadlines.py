@@ -0,0 +1,86 @@
+import asyncio
+import os
+import pymongo
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError, WaitQueueTimeoutError
+
+# Délais maximaux des routes (« deadlines »)
+# Chaque route dispose d'un budget de temps. Il est transmis au driver avec `pymongo.timeout` : chaque commande
+# reçoit un `maxTimeMS` égal au temps restant, et l'attente d'une connexion du pool, la sélection du serveur et
+# les lectures réseau sont bornées par ce même budget (Motor copie le contexte dans ses threads). Le traitement
+# complet de la route est en outre borné par `asyncio.wait_for`.
+# Une fois le budget épuisé, la connexion est rendue au pool et la route répond :
+# - 504 si la requête a dépassé son budget (`maxTimeMS` atteint, délai réseau ou `asyncio`) ;
+# - 503 si aucune connexion ou aucun serveur n'a pu être obtenu à temps (pool saturé, primaire indisponible).
+
+# Budget des lectures (GET), en secondes
+READ_DEADLINE_SECONDS = float(os.getenv("READ_DEADLINE_SECONDS", 5))
+
+# Budget des écritures (POST, PUT, DELETE), en secondes
+WRITE_DEADLINE_SECONDS = float(os.getenv("WRITE_DEADLINE_SECONDS", 10))
+
+# Budget des importations en masse, en secondes
+BULK_DEADLINE_SECONDS = float(os.getenv("BULK_DEADLINE_SECONDS", 60))
+
+# Délai suggéré au client (en-tête `Retry-After`) après une réponse 503, en secondes
+DEADLINE_RETRY_AFTER_SECONDS = os.getenv("DEADLINE_RETRY_AFTER_SECONDS", "1")
+
+
+def deadline(seconds: float):
+    """
+    Ce décorateur fixe le budget d'une route particulière, à la place du budget par défaut de sa méthode.
+    Il doit être placé sous le décorateur de la route, par exemple :
+
+        @router.post("/bulk")
+        @deadline(BULK_DEADLINE_SECONDS)
+        async def import_students(...): ...
+    """
+    def decorator(endpoint):
+        endpoint.deadline = seconds
+        return endpoint
+    return decorator
+
+
+def _unavailable(error: Exception) -> HTTPException:
+    """
+    Convertit une erreur de délai en réponse HTTP (503 ou 504).
+    """
+    if isinstance(error, (WaitQueueTimeoutError, ServerSelectionTimeoutError)):
+        return HTTPException(status_code=503, detail="Database unavailable",
+                             headers={"Retry-After": DEADLINE_RETRY_AFTER_SECONDS})
+    return HTTPException(status_code=504, detail="Request deadline exceeded")
+
+
+# Classe de route appliquant le budget
+class DeadlineRoute(APIRoute):
+    """
+    Classe de route FastAPI (`APIRouter(route_class=DeadlineRoute)`) qui exécute chaque requête dans son budget.
+
+    Le budget couvre la lecture du corps, les dépendances, la route et la sérialisation de la réponse.
+    Le corps d'une réponse en flux (`StreamingResponse`, par exemple l'export) est produit après la route :
+    il n'est pas borné.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        default = READ_DEADLINE_SECONDS if self.methods <= {"GET", "HEAD"} else WRITE_DEADLINE_SECONDS
+        self.deadline = getattr(endpoint, "deadline", default)
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def deadline_route_handler(request):
+            # `self.deadline` est lu à l'appel : `get_route_handler` est appelé avant la fin de `__init__`
+            budget = self.deadline
+            try:
+                with pymongo.timeout(budget):
+                    return await asyncio.wait_for(route_handler(request), budget)
+            except asyncio.TimeoutError as e:
+                raise _unavailable(e)
+            except PyMongoError as e:
+                if e.timeout:
+                    raise _unavailable(e)
+                raise
+
+        return deadline_route_handler
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+from collections import deque
+from pymongo.errors import OperationFailure, PyMongoError
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+# Collections suivies par le flux de changements
+EVENT_COLLECTIONS = ("students", "projects")
+
+# Nombre maximal d'événements en attente pour un client ; un client trop lent est déconnecté
+# (il se reconnecte avec `Last-Event-ID` et rattrape son retard depuis l'historique)
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+
+# Nombre d'événements récents conservés pour la reprise après une reconnexion
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", 1000))
+
+# Intervalle entre deux commentaires de maintien de connexion (en secondes)
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+
+# Délai avant de relancer la surveillance après une erreur (en secondes)
+EVENTS_RETRY_SECONDS = float(os.getenv("EVENTS_RETRY_SECONDS", 5))
+
+# Signaux d'arrêt qui ferment les flux ouverts (voir `install_shutdown_handlers`)
+SHUTDOWN_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+# Le flux ne transporte que la nature du changement et l'identifiant du document : les clients relisent
+# le document s'ils en ont besoin (avec `If-None-Match`). Le serveur n'a donc pas à lire les documents complets.
+CHANGE_PIPELINE = [
+    {"$match": {"ns.coll": {"$in": list(EVENT_COLLECTIONS)}}},
+    {"$project": {"operationType": 1, "ns": 1, "documentKey": 1}},
+]
+
+
+class Event:
+    """
+    Un changement diffusé aux clients.
+    - `seq` : Numéro d'ordre local au worker (sert à éviter les doublons lors d'une reprise).
+    - `id` : Le jeton de reprise MongoDB, envoyé comme identifiant SSE (`Last-Event-ID`).
+    - `data` : Le contenu JSON de l'événement.
+    """
+
+    __slots__ = ("seq", "id", "data")
+
+    def __init__(self, seq: int, event_id: str, data: str):
+        self.seq = seq
+        self.id = event_id
+        self.data = data
+
+
+# Flux de changements partagé par tous les clients du worker
+class ChangeFeed:
+    """
+    Un seul change stream MongoDB est ouvert par worker, quel que soit le nombre de clients connectés.
+    Chaque changement est placé dans un historique borné (reprise après reconnexion) puis dans la file
+    bornée de chaque client. Les change streams nécessitent un replica set : sur un serveur autonome,
+    le flux est marqué indisponible.
+
+    L'historique est en mémoire, propre au worker : la reprise avec `Last-Event-ID` ne fonctionne que si le
+    client se reconnecte au même worker, avant que l'événement ne sorte de l'historique. Une reconnexion
+    aboutissant sur un autre worker (ou après un redémarrage) reçoit un événement `reset`.
+    """
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE, buffer_size: int = EVENTS_BUFFER_SIZE):
+        self.queue_size = queue_size
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._task = None
+        self._seq = 0
+        self._resume_token = None
+        self.available = False
+        self.closing = False
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def start(self):
+        """
+        Lance la surveillance en tâche de fond (appelée au démarrage de l'application).
+        """
+        self.closing = False
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def close_streams(self):
+        """
+        Ferme les flux de tous les clients et refuse les nouveaux, sans arrêter la surveillance.
+        Appelée dès la réception d'un signal d'arrêt : le serveur (uvicorn) attend la fin des connexions ouvertes
+        avant d'exécuter l'arrêt de l'application, et un flux SSE ne se termine jamais de lui-même.
+        """
+        self.closing = True
+        for queue in list(self._subscribers):
+            self._disconnect(queue)
+
+    async def stop(self):
+        """
+        Arrête la surveillance et déconnecte les clients restants (appelée à l'arrêt de l'application).
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close_streams()
+        self.available = False
+
+    async def _run(self):
+        """
+        Lit le change stream et diffuse chaque changement. Après une erreur, la surveillance reprend
+        au dernier jeton lu : aucun changement n'est perdu tant que l'oplog le contient encore.
+        Une erreur inattendue (changement de forme imprévue...) suit le même chemin : elle est journalisée, et la
+        surveillance reprend après le changement fautif (son jeton est déjà lu), au lieu d'arrêter la tâche
+        en laissant `available` vrai pour des clients qui ne recevraient plus rien.
+        """
+        while True:
+            try:
+                async with db.watch(CHANGE_PIPELINE, start_after=self._resume_token) as stream:
+                    self.available = True
+                    async for change in stream:
+                        self._resume_token = change["_id"]
+                        self._publish(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                # Change streams non supportés (serveur autonome) : inutile de réessayer
+                if e.code in (40573, 20):
+                    logger.warning("Change streams are not available: %s", e)
+                    self.available = False
+                    return
+                logger.exception("Change stream failed")
+            except PyMongoError:
+                logger.exception("Change stream failed")
+            except Exception:
+                logger.exception("Change stream failed (unexpected error)")
+            self.available = False
+            await asyncio.sleep(EVENTS_RETRY_SECONDS)
+
+    def _publish(self, change: dict):
+        """
+        Enregistre un changement dans l'historique et le transmet à chaque client.
+        """
+        self._seq += 1
+        data = json.dumps({
+            "collection": change["ns"]["coll"],
+            "operation": change["operationType"],
+            "id": str(change.get("documentKey", {}).get("_id")),
+        })
+        event = Event(self._seq, change["_id"]["_data"], data)
+        self._buffer.append(event)
+        self.published += 1
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Client trop lent : il est déconnecté plutôt que de faire grossir la mémoire
+                self.dropped_subscribers += 1
+                self._disconnect(queue)
+
+    def _disconnect(self, queue: asyncio.Queue):
+        """
+        Retire un client et lui signale la fin du flux (`None`).
+        """
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Inscrit un client et renvoie sa file d'événements.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """
+        Désinscrit un client (connexion fermée).
+        """
+        self._subscribers.discard(queue)
+
+    def replay_after(self, event_id: str):
+        """
+        Renvoie les événements de l'historique postérieurs à `event_id`, ou `None` si cet événement n'est
+        plus (ou pas) dans l'historique : le client doit alors recharger ses données.
+        """
+        events = list(self._buffer)
+        for index, event in enumerate(events):
+            if event.id == event_id:
+                return events[index + 1:]
+        return None
+
+    def stats(self) -> dict:
+        """
+        Retourne les compteurs du flux de changements.
+        """
+        return {
+            "available": self.available,
+            "subscribers": len(self._subscribers),
+            "buffered": len(self._buffer),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+def format_event(event: Event) -> str:
+    """
+    Cette fonction formate un changement au format Server-Sent Events.
+    """
+    return "id: {}\nevent: change\ndata: {}\n\n".format(event.id, event.data)
+
+
+async def event_stream(feed: ChangeFeed, last_event_id: str = None):
+    """
+    Ce générateur asynchrone produit le flux SSE d'un client.
+
+    - `feed` : Le flux de changements du worker.
+    - `last_event_id` : L'en-tête `Last-Event-ID` envoyé par le navigateur lors d'une reconnexion.
+
+    Le client est inscrit avant la relecture de l'historique afin qu'aucun changement ne soit perdu ;
+    les doublons entre l'historique et la file sont écartés grâce au numéro d'ordre.
+    Si l'historique ne permet pas la reprise (événement trop ancien, ou émis par un autre worker), un événement
+    `reset` demande au client de recharger ses données.
+    Le générateur se termine lorsque le flux est fermé (`close_streams`, à l'arrêt du worker) : la connexion
+    ne retarde pas l'arrêt du serveur.
+    """
+    queue = feed.subscribe()
+    last_seq = 0
+    try:
+        # Délai de reconnexion conseillé au navigateur (en millisecondes)
+        yield "retry: 3000\n\n"
+
+        if last_event_id:
+            replay = feed.replay_after(last_event_id)
+            if replay is None:
+                yield "event: reset\ndata: {}\n\n"
+            else:
+                for event in replay:
+                    last_seq = event.seq
+                    yield format_event(event)
+
+        while not feed.closing:
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ": heartbeat\n\n"
+                continue
+            if event is None:
+                break
+            if event.seq <= last_seq:
+                continue
+            last_seq = event.seq
+            yield format_event(event)
+    finally:
+        feed.unsubscribe(queue)
+
+
+# Flux partagé par les clients de ce worker
+change_feed = ChangeFeed()
+
+
+def install_shutdown_handlers(feed: ChangeFeed = change_feed, signals: tuple = SHUTDOWN_SIGNALS) -> dict:
+    """
+    Cette fonction ferme les flux SSE dès la réception d'un signal d'arrêt (appelée au démarrage de l'application).
+
+    Le gestionnaire précédent (celui d'uvicorn, qui déclenche l'arrêt progressif) est conservé et appelé ensuite.
+    La fermeture est planifiée dans la boucle d'événements (`call_soon_threadsafe`) : les clients reçoivent la
+    fin de leur flux, leurs connexions se terminent et uvicorn peut achever l'arrêt sans attendre son délai maximal.
+    Sans effet hors du thread principal (les signaux n'y sont pas reçus).
+    Retourne les gestionnaires remplacés, par signal.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return {}
+    loop = asyncio.get_running_loop()
+
+    def chain(previous):
+        def handler(signum, frame):
+            loop.call_soon_threadsafe(feed.close_streams)
+            if callable(previous):
+                previous(signum, frame)
+            elif previous == signal.SIG_DFL:
+                # Comportement par défaut (fin du processus) : le gestionnaire par défaut est rétabli puis le signal renvoyé
+                signal.signal(signum, signal.SIG_DFL)
+                signal.raise_signal(signum)
+        return handler
+
+    replaced = {}
+    for signum in signals:
+        previous = signal.getsignal(signum)
+        signal.signal(signum, chain(previous))
+        replaced[signum] = previous
+    return replaced
@@ -0,0 +1,79 @@
+import os
+
+# Nombre maximal d'éléments développés par document (par exemple, les étudiants d'un projet)
+EXPAND_MAX_ITEMS = int(os.getenv("EXPAND_MAX_ITEMS", 50))
+
+# Champs renvoyés pour les éléments développés : on ne transfère que le résumé utile à l'affichage
+STUDENT_SUMMARY_PROJECTION = {"name": 1, "course": 1, "branch": 1}
+PROJECT_SUMMARY_PROJECTION = {"name": 1, "head": 1}
+
+
+def parse_expand(expand: str, allowed: str, page: int = 1, size: int = EXPAND_MAX_ITEMS):
+    """
+    Cette fonction valide les paramètres de développement d'une route.
+
+    - `expand` : La valeur du paramètre `expand` (par exemple "students"), ou `None`.
+    - `allowed` : La seule valeur acceptée pour cette route.
+    - `page` / `size` : La page demandée à l'intérieur de la liste développée.
+
+    Retourne `None` si aucun développement n'est demandé, sinon la fenêtre `(offset, limit)` à appliquer ;
+    `size` est plafonné à `EXPAND_MAX_ITEMS`. Une `ValueError` est levée si les paramètres sont invalides.
+    """
+    if expand is None:
+        return None
+    if expand != allowed:
+        raise ValueError("Invalid expand value (expected '{}')".format(allowed))
+    if page < 1 or size < 1:
+        raise ValueError("Invalid expand pagination")
+    size = min(size, EXPAND_MAX_ITEMS)
+    return (page - 1) * size, size
+
+
+# Champ temporaire qui porte les identifiants à joindre, retiré après la jointure
+LOOKUP_IDS_FIELD = "_expand_ids"
+
+
+def lookup_stages(from_collection: str, local_field: str, as_field: str, projection: dict, window: tuple) -> list:
+    """
+    Cette fonction construit les étapes `$lookup` qui remplacent les N requêtes de suivi du client.
+
+    - `from_collection` : La collection jointe ("students" ou "projects").
+    - `local_field` : Le tableau d'identifiants du document courant (par exemple "student_ids").
+    - `as_field` : Le champ dans lequel placer les documents joints.
+    - `projection` : Les champs à conserver sur les documents joints.
+    - `window` : La fenêtre `(offset, limit)` renvoyée par `parse_expand`.
+
+    Le tableau d'identifiants est découpé (`$slice`) avant la jointure : le coût reste borné par `limit`,
+    même pour un projet comptant des milliers de membres. Les identifiants, stockés sous forme de chaînes
+    ou d'ObjectId selon les documents, sont convertis en ObjectId dans un champ temporaire.
+    La jointure est une égalité `localField`/`foreignField` sur `_id` : chaque identifiant est cherché dans
+    l'index `_id` (une jointure `$expr`/`$in` parcourrait toute la collection pour chaque document).
+    La projection est appliquée ensuite avec `$map`.
+    """
+    offset, limit = window
+    return [
+        {
+            "$addFields": {
+                LOOKUP_IDS_FIELD: {
+                    "$map": {
+                        "input": {"$slice": [{"$ifNull": ["$" + local_field, []]}, offset, limit]},
+                        "as": "id",
+                        "in": {"$convert": {"input": "$$id", "to": "objectId", "onError": None, "onNull": None}},
+                    }
+                }
+            }
+        },
+        {"$lookup": {"from": from_collection, "localField": LOOKUP_IDS_FIELD, "foreignField": "_id", "as": as_field}},
+        {
+            "$addFields": {
+                as_field: {
+                    "$map": {
+                        "input": "$" + as_field,
+                        "as": "item",
+                        "in": {field: "$$item." + field for field in ["_id"] + list(projection)},
+                    }
+                }
+            }
+        },
+        {"$project": {LOOKUP_IDS_FIELD: 0}},
+    ]
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import os
+import zlib
+from bson import ObjectId
+from .database import db
+
+# Export complet des collections, diffusé au fil de l'eau
+# Les routes d'export sont protégées par JWT : elles renvoient toute la collection, adresses e-mail comprises.
+# Un export n'a volontairement pas de budget de temps (voir `app/deadlines.py`) : sa durée dépend de la taille
+# de la collection et du débit du client, et un export interrompu produirait un fichier tronqué sans erreur.
+# Il n'occupe qu'une connexion du pool pendant chaque lecture d'un paquet, et le curseur est fermé dès que
+# le client se déconnecte.
+
+# Nombre de documents lus par aller-retour MongoDB (et écrits par morceau de réponse) lors d'un export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+# Formats d'export acceptés, avec leur type de contenu
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Colonnes exportées pour chaque collection (les mêmes champs que les réponses de l'API)
+EXPORT_FIELDS = {
+    "students": ["id", "name", "email", "course", "branch", "project_ids"],
+    "projects": ["id", "name", "description", "head", "student_ids"],
+}
+
+
+def _to_record(document: dict, fields: list) -> dict:
+    """
+    Convertit un document MongoDB en enregistrement exportable : `_id` devient `id`,
+    les ObjectId (y compris dans les listes) deviennent des chaînes.
+    """
+    record = {}
+    for field in fields:
+        value = document.get("_id" if field == "id" else field)
+        if isinstance(value, list):
+            value = [str(item) if isinstance(item, ObjectId) else item for item in value]
+        elif isinstance(value, ObjectId):
+            value = str(value)
+        record[field] = value
+    return record
+
+
+async def _batches(collection: str, fields: list):
+    """
+    Parcourt toute la collection et produit les enregistrements par paquets de `EXPORT_BATCH_SIZE`.
+    Seuls les champs exportés sont lus (projection), dans l'ordre de l'index `_id`.
+    Le curseur est fermé même si le client se déconnecte en cours de route.
+    """
+    projection = {field: 1 for field in fields if field != "id"}
+    cursor = db[collection].find({}, projection, batch_size=EXPORT_BATCH_SIZE).sort("_id", 1)
+    batch = []
+    try:
+        async for document in cursor:
+            batch.append(_to_record(document, fields))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        await cursor.close()
+
+
+def _ndjson_chunk(batch: list) -> str:
+    """
+    Sérialise un paquet d'enregistrements en NDJSON (un objet JSON par ligne).
+    """
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+
+
+def _csv_chunk(batch: list, fields: list, header: bool) -> str:
+    """
+    Sérialise un paquet d'enregistrements en CSV ; les listes sont jointes par `;`.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    for record in batch:
+        writer.writerow(
+            ";".join(str(item) for item in value) if isinstance(value, list) else ("" if value is None else value)
+            for value in (record[field] for field in fields)
+        )
+    return buffer.getvalue()
+
+
+async def export_collection(collection: str, export_format: str = "ndjson", compress: bool = False):
+    """
+    Ce générateur asynchrone produit l'export complet d'une collection, morceau par morceau.
+
+    - `collection` : Le nom de la collection ("students" ou "projects").
+    - `export_format` : "ndjson" ou "csv" (voir `EXPORT_FORMATS`).
+    - `compress` : Compresse la sortie en gzip, au fil de l'eau.
+
+    La mémoire utilisée reste constante quelle que soit la taille de la collection : un seul paquet de
+    `EXPORT_BATCH_SIZE` documents est présent en mémoire à la fois. Il est destiné à `StreamingResponse`.
+    """
+    fields = EXPORT_FIELDS[collection]
+    # `wbits=31` : format gzip (en-tête et somme de contrôle) plutôt que zlib brut
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    header = True
+
+    async for batch in _batches(collection, fields):
+        if export_format == "csv":
+            chunk = _csv_chunk(batch, fields, header)
+            header = False
+        else:
+            chunk = _ndjson_chunk(batch)
+        data = chunk.encode("utf-8")
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            yield data
+
+    # Une collection vide produit tout de même l'en-tête CSV
+    if export_format == "csv" and header:
+        data = _csv_chunk([], fields, header).encode("utf-8")
+        yield compressor.compress(data) if compressor is not None else data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def export_headers(collection: str, export_format: str, compress: bool) -> dict:
+    """
+    Construit les en-têtes de la réponse d'export (nom de fichier et encodage).
+    """
+    headers = {"Content-Disposition": 'attachment; filename="{}.{}"'.format(collection, export_format)}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return headers
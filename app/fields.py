@@ -0,0 +1,43 @@
+# Sélection des champs renvoyés (`?fields=name,email`)
+# Les champs demandés deviennent une projection MongoDB : seuls ces champs sont lus, transférés et décodés.
+# `id` est toujours renvoyé et n'a pas besoin d'être demandé.
+
+# Champs sélectionnables pour chaque ressource (ceux des schémas de réponse)
+STUDENT_FIELDS = ("name", "email", "course", "branch", "project_ids")
+PROJECT_FIELDS = ("name", "description", "head", "student_ids")
+
+
+def parse_fields(fields: str, allowed: tuple):
+    """
+    Cette fonction valide le paramètre `fields` d'une route.
+
+    - `fields` : La liste des champs séparés par des virgules (par exemple "name,email"), ou `None`.
+    - `allowed` : Les champs sélectionnables pour la ressource.
+
+    Retourne `None` si aucun champ n'est demandé (document complet), sinon le tuple des champs demandés,
+    sans doublons. Une `ValueError` est levée si un champ est inconnu.
+    """
+    if fields is None:
+        return None
+    requested = tuple(dict.fromkeys(part.strip() for part in fields.split(",") if part.strip() and part.strip() != "id"))
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError("Invalid fields: {} (allowed: {})".format(", ".join(unknown), ", ".join(allowed)))
+    return requested
+
+
+def build_projection(fields: tuple, *required: str):
+    """
+    Cette fonction construit la projection MongoDB correspondant aux champs demandés.
+
+    - `fields` : Les champs renvoyés par `parse_fields`, ou `None`.
+    - `required` : Des champs nécessaires au traitement même s'ils ne sont pas renvoyés (champ de tri pour
+      le curseur, tableau d'identifiants pour `$lookup`...).
+
+    Retourne `None` (document complet) si aucun champ n'est demandé.
+    """
+    if fields is None:
+        return None
+    projection = {field: 1 for field in fields + tuple(field for field in required if field != "_id")}
+    # Une projection vide renverrait le document complet : seul `_id` est alors demandé
+    return projection or {"_id": 1}
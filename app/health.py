@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+from .coalescing import single_flight
+from .database import db, get_pool_stats
+
+# Sondes de vie et de disponibilité, appelées toutes les quelques secondes par l'orchestrateur
+# - `/healthz` (vie) : aucune entrée/sortie, répond tant que la boucle d'événements tourne.
+# - `/readyz` (disponibilité) : un `ping` MongoDB mis en cache quelques secondes et borné par un délai,
+#   plus un contrôle de saturation du pool. Un worker saturé est déclaré non disponible afin que
+#   le répartiteur de charge lui envoie moins de trafic le temps qu'il se vide.
+
+# Délai maximal accordé au `ping` (en secondes)
+READY_PING_TIMEOUT_SECONDS = float(os.getenv("READY_PING_TIMEOUT_SECONDS", 1))
+
+# Durée pendant laquelle le résultat du `ping` est réutilisé (en secondes)
+READY_PING_TTL_SECONDS = float(os.getenv("READY_PING_TTL_SECONDS", 2))
+
+# Taux d'occupation du pool (connexions empruntées / taille maximale) au-delà duquel le worker est saturé
+READY_POOL_SATURATION = float(os.getenv("READY_POOL_SATURATION", 0.9))
+
+# Dernier résultat du `ping` : (horodatage, erreur ou `None`)
+_last_ping = None
+
+
+async def _ping():
+    """
+    Envoie un `ping` à MongoDB, borné par `READY_PING_TIMEOUT_SECONDS`.
+    Retourne `None` en cas de succès, sinon le message d'erreur.
+    """
+    try:
+        await asyncio.wait_for(db.command("ping"), READY_PING_TIMEOUT_SECONDS)
+        return None
+    except asyncio.TimeoutError:
+        return "ping timed out after {}s".format(READY_PING_TIMEOUT_SECONDS)
+    except Exception as e:
+        return str(e)
+
+
+async def check_database() -> dict:
+    """
+    Cette fonction renvoie l'état de la connexion MongoDB, à partir d'un `ping` réutilisé pendant
+    `READY_PING_TTL_SECONDS` secondes. Les sondes simultanées partagent un seul `ping`.
+    """
+    global _last_ping
+    now = time.monotonic()
+    if _last_ping is None or now - _last_ping[0] >= READY_PING_TTL_SECONDS:
+        error = await single_flight.do("readyz:ping", _ping)
+        _last_ping = (time.monotonic(), error)
+    checked_at, error = _last_ping
+    status = {"ok": error is None, "age_seconds": round(time.monotonic() - checked_at, 3)}
+    if error is not None:
+        status["error"] = error
+    return status
+
+
+def check_pool() -> dict:
+    """
+    Cette fonction renvoie l'occupation du pool de connexions de ce worker.
+    Le pool est considéré saturé si la part de connexions empruntées atteint `READY_POOL_SATURATION`.
+    """
+    stats = get_pool_stats()
+    max_pool_size = stats["max_pool_size"] or 0
+    usage = stats["checked_out"] / max_pool_size if max_pool_size else 0.0
+    return {
+        "ok": usage < READY_POOL_SATURATION,
+        "checked_out": stats["checked_out"],
+        "max_pool_size": max_pool_size,
+        "usage": round(usage, 3),
+    }
+
+
+async def check_readiness() -> dict:
+    """
+    Cette fonction regroupe les contrôles de disponibilité : le worker est disponible si MongoDB répond
+    et si son pool de connexions n'est pas saturé.
+    """
+    pool = check_pool()
+    database = await check_database()
+    return {
+        "ready": bool(pool["ok"] and database["ok"]),
+        "database": database,
+        "pool": pool,
+    }
@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import logging
+import os
+from pymongo import ASCENDING, TEXT, IndexModel
+from .search import NAME_FIELD
+
+logger = logging.getLogger(__name__)
+
+# Registre déclaratif des index, par collection
+# C'est l'unique endroit où les index de l'application sont définis : ils sont appliqués au démarrage
+# (voir le `lifespan` de `main.py`) ou vérifiés avec `python -m app.indexes --check`.
+INDEXES = {
+    "students": [
+        # Recherche par préfixe sur le nom normalisé (voir `app/search.py`), tri et pagination par curseur
+        # sur (nom normalisé, _id) : un seul index sert les deux usages
+        IndexModel([(NAME_FIELD, ASCENDING), ("_id", ASCENDING)], name="name_normalized_id"),
+        # Recherche par mots
+        IndexModel([("name", TEXT)], name="name_text"),
+        # Requêtes d'appartenance : « quels étudiants participent à ce projet ? »
+        IndexModel([("project_ids", ASCENDING)], name="project_ids"),
+    ],
+    "projects": [
+        IndexModel([(NAME_FIELD, ASCENDING), ("_id", ASCENDING)], name="name_normalized_id"),
+        IndexModel([("name", TEXT)], name="name_text"),
+        # Requêtes d'appartenance : « dans quels projets se trouve cet étudiant ? »
+        IndexModel([("student_ids", ASCENDING)], name="student_ids"),
+    ],
+    "users": [
+        # Connexion par nom d'utilisateur ; l'unicité remplace la vérification préalable à l'inscription
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+}
+
+# Index dont dépend l'exactitude de l'application (et pas seulement ses performances) : l'inscription
+# n'effectue plus de vérification préalable, seul l'index unique empêche deux comptes avec le même email.
+# Quel que soit le mode, le démarrage échoue s'ils sont absents.
+REQUIRED_INDEXES = {"users": ("username_unique", "email_unique")}
+
+# Mode de gestion des index au démarrage :
+# - "apply" : crée les index manquants (par défaut) ;
+# - "check" : signale les index manquants ou en trop, sans rien modifier ; seuls les index de
+#   `REQUIRED_INDEXES` bloquent le démarrage ;
+# - "off" : ne crée ni ne signale rien, mais vérifie les index de `REQUIRED_INDEXES`.
+INDEX_MODE = os.getenv("INDEX_MODE", "apply")
+
+
+def _expected_key(model: IndexModel) -> list:
+    """
+    Cette fonction renvoie la clé d'un index déclaré, sous la même forme que `index_information()`.
+    """
+    return [(field, direction) for field, direction in model.document["key"].items()]
+
+
+def _actual_key(info: dict) -> list:
+    """
+    Cette fonction renvoie la clé d'un index existant. Pour un index texte, MongoDB stocke
+    les champs `_fts`/`_ftsx` : on reconstitue la clé déclarée à partir des poids.
+    """
+    key = list(info["key"])
+    if key and key[0][0] == "_fts":
+        return [(field, TEXT) for field in info.get("weights", {})]
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in key]
+
+
+async def apply_indexes(db):
+    """
+    Cette fonction crée les index du registre sur chaque collection.
+    `create_indexes` est idempotent : les index déjà présents avec la même définition sont ignorés.
+    """
+    for collection, models in INDEXES.items():
+        await db[collection].create_indexes(models)
+
+
+async def check_indexes(db) -> dict:
+    """
+    Cette fonction compare les index existants au registre, sans rien modifier.
+
+    Elle retourne, pour chaque collection, un dictionnaire contenant :
+    - `missing` : les index déclarés mais absents ;
+    - `extra` : les index présents mais non déclarés (l'index `_id_` est ignoré) ;
+    - `mismatched` : les index présents sous le même nom mais avec une autre définition.
+    """
+    report = {}
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        existing.pop("_id_", None)
+        expected = {model.document["name"]: model for model in models}
+
+        mismatched = []
+        for name, model in expected.items():
+            info = existing.get(name)
+            if info is None:
+                continue
+            same_key = _expected_key(model) == _actual_key(info)
+            same_unique = bool(model.document.get("unique")) == bool(info.get("unique"))
+            if not (same_key and same_unique):
+                mismatched.append(name)
+
+        report[collection] = {
+            "missing": sorted(name for name in expected if name not in existing),
+            "extra": sorted(name for name in existing if name not in expected),
+            "mismatched": sorted(mismatched),
+        }
+    return report
+
+
+def log_index_report(report: dict):
+    """
+    Cette fonction journalise les écarts trouvés par `check_indexes`.
+    """
+    for collection, differences in report.items():
+        for kind, names in differences.items():
+            if names:
+                logger.warning("Collection %s: %s indexes: %s", collection, kind, ", ".join(names))
+
+
+async def run_index_check(db):
+    """
+    Cette fonction vérifie les index et journalise le rapport. Toute erreur est journalisée
+    sans être propagée : la vérification ne doit jamais empêcher l'application de démarrer.
+    """
+    try:
+        log_index_report(await check_indexes(db))
+    except Exception:
+        logger.exception("Index check failed")
+
+
+async def ensure_required_indexes(db):
+    """
+    Cette fonction vérifie que les index de `REQUIRED_INDEXES` existent et sont uniques.
+    Une `RuntimeError` est levée dans le cas contraire, ce qui interrompt le démarrage : sans eux,
+    les doublons seraient acceptés sans erreur.
+    """
+    missing = []
+    for collection, names in REQUIRED_INDEXES.items():
+        existing = await db[collection].index_information()
+        missing.extend("{}.{}".format(collection, name) for name in names
+                       if not existing.get(name, {}).get("unique"))
+    if missing:
+        raise RuntimeError("Missing required unique indexes: {} (run `python -m app.indexes`)".format(", ".join(missing)))
+
+
+async def manage_indexes(db, mode: str = INDEX_MODE):
+    """
+    Cette fonction applique le mode de gestion des index choisi au démarrage.
+    En mode "check", la vérification est lancée en tâche de fond pour ne pas retarder le démarrage ;
+    la tâche est renvoyée pour que l'appelant puisse l'attendre ou l'annuler.
+    En modes "check" et "off", les index indispensables sont vérifiés avant de rendre la main (voir `REQUIRED_INDEXES`).
+    """
+    if mode == "apply":
+        await apply_indexes(db)
+        return None
+    if mode not in ("check", "off"):
+        raise ValueError("Invalid INDEX_MODE: {}".format(mode))
+
+    await ensure_required_indexes(db)
+    if mode == "check":
+        return asyncio.create_task(run_index_check(db))
+    return None
+
+
+async def _main(check: bool):
+    """
+    Point d'entrée de la ligne de commande : applique les index ou affiche le rapport de vérification.
+    """
+    from .database import db, connect, close
+
+    connect()
+    try:
+        if check:
+            report = await check_indexes(db)
+            for collection, differences in report.items():
+                print(collection, differences)
+            return 1 if any(names for differences in report.values() for names in differences.values()) else 0
+
+        await apply_indexes(db)
+        return 0
+    finally:
+        close()
+
+
+if __name__ == "__main__":
+    # Utilisation : `python -m app.indexes` pour appliquer les index, `python -m app.indexes --check`
+    # pour lister les écarts (code de sortie 1 si des index manquent ou sont en trop).
+    parser = argparse.ArgumentParser(description="Gestion des index MongoDB de l'application.")
+    parser.add_argument("--check", action="store_true", help="Vérifier les index sans les modifier (dry-run).")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.check)))
@@ -0,0 +1,171 @@
+import bisect
+import os
+import threading
+import time
+
+# Métriques au format texte de Prometheus, exposées par `GET /metrics`
+# L'implémentation est volontairement minimale (pas de dépendance à `prometheus_client`) : une observation
+# coûte une recherche dichotomique et une incrémentation sous verrou, ce qui permet de la laisser active
+# en production. Les métriques sont propres à chaque worker ; Prometheus les agrège à la lecture.
+
+# Active ou désactive la collecte (middleware HTTP et listener des commandes MongoDB)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Bornes des histogrammes de durée (en secondes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Métriques déclarées, dans l'ordre d'exposition
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    """
+    Échappe une valeur d'étiquette selon le format texte de Prometheus.
+    """
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    """
+    Formate les étiquettes d'une série, par exemple `{route="/students/",method="GET"}`.
+    """
+    parts = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """
+    Histogramme de durées, par combinaison d'étiquettes. Utilisable depuis plusieurs threads
+    (les événements du driver MongoDB sont émis depuis ses propres threads).
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # étiquettes -> [compteurs par borne (+Inf en dernier), somme, nombre]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, labels: tuple, value: float):
+        """
+        Enregistre une observation pour les étiquettes `labels` (dans l'ordre de `labelnames`).
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = ["# HELP {} {}".format(self.name, self.documentation), "# TYPE {} histogram".format(self.name)]
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _labels(self.labelnames, labels, 'le="{}"'.format(le))
+                lines.append("{}_bucket{} {}".format(self.name, bucket_labels, cumulative))
+            lines.append("{}_sum{} {}".format(self.name, _labels(self.labelnames, labels), total))
+            lines.append("{}_count{} {}".format(self.name, _labels(self.labelnames, labels), count))
+        return lines
+
+
+class Gauge:
+    """
+    Valeur instantanée, par combinaison d'étiquettes. Si `function` est fournie, elle est appelée
+    à chaque exposition et renvoie un dictionnaire `{étiquettes: valeur}` (valeurs calculées à la demande).
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def render(self) -> list:
+        lines = ["# HELP {} {}".format(self.name, self.documentation), "# TYPE {} gauge".format(self.name)]
+        if self.function is not None:
+            values = self.function()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for labels, value in values.items():
+            lines.append("{}{} {}".format(self.name, _labels(self.labelnames, labels), value))
+        return lines
+
+
+def render_metrics() -> str:
+    """
+    Cette fonction produit l'exposition texte de toutes les métriques déclarées.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Métriques HTTP
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP.", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requêtes HTTP en cours de traitement.", ("method",)
+)
+
+
+# Middleware de mesure des requêtes HTTP
+class MetricsMiddleware:
+    """
+    Middleware ASGI (sans `BaseHTTPMiddleware`, pour ne pas ajouter de tâche par requête) qui mesure la durée
+    de chaque requête par méthode, route et code de statut, et compte les requêtes en cours par méthode.
+
+    La route est le modèle de chemin (`/students/{student_id}`) et non le chemin réel, afin de borner
+    le nombre de séries ; les chemins inconnus sont regroupés sous `unmatched`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = [500]
+        started = time.perf_counter()
+        # La route n'est connue qu'après le routage : les requêtes en cours sont comptées par méthode
+        in_flight = (method,)
+        http_requests_in_flight.inc(in_flight)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec(in_flight)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe((method, route_path, str(status[0])), time.perf_counter() - started)
@@ -0,0 +1,130 @@
+import base64
+import json
+from bson import ObjectId
+from .search import NAME_FIELD
+
+
+# Pagination par curseur (keyset pagination)
+# Contrairement à `skip((page - 1) * size)`, qui oblige MongoDB à parcourir tous les documents ignorés,
+# un curseur mémorise la position du dernier document renvoyé (valeur du champ de tri + `_id`).
+# La page suivante est obtenue par une simple condition `$gt` sur un index : le coût est constant
+# quelle que soit la profondeur de la page.
+
+# Champ MongoDB utilisé pour chaque tri proposé par l'API : le tri par nom se fait sur le nom normalisé
+# (minuscules, sans accents, voir `app/search.py`), afin que "élodie", "Eliza" et "emma" se suivent.
+SORT_KEYS = {"_id": "_id", "name": NAME_FIELD}
+
+
+def sort_key(sort_field: str = "_id") -> str:
+    """
+    Cette fonction renvoie le champ MongoDB correspondant à un tri de l'API (par exemple `name_normalized` pour `name`).
+    """
+    return SORT_KEYS.get(sort_field, sort_field)
+
+
+def encode_cursor(document: dict, sort_field: str = "_id") -> str:
+    """
+    Cette fonction construit un curseur opaque à partir du dernier document d'une page.
+
+    - `document` : Le dernier document renvoyé dans la page courante.
+    - `sort_field` : Le tri de l'API (par défaut `_id`).
+
+    Le curseur contient le tri, la valeur du champ trié (`null` si elle est absente) et l'`_id` du document, encodés en JSON puis en base64
+    (URL-safe) afin que le client le manipule comme une chaîne opaque.
+    """
+    payload = {"f": sort_field, "id": str(document["_id"])}
+
+    # La valeur du champ de tri n'est utile que si le tri ne se fait pas sur `_id`
+    if sort_field != "_id":
+        payload["v"] = document.get(sort_key(sort_field))
+
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str = "_id") -> dict:
+    """
+    Cette fonction décode un curseur opaque et renvoie le filtre MongoDB correspondant à la page suivante.
+
+    - `cursor` : Le curseur renvoyé par la page précédente.
+    - `sort_field` : Le champ de tri attendu ; il doit correspondre à celui encodé dans le curseur.
+
+    Une `ValueError` est levée si le curseur est invalide ou s'il a été produit pour un autre tri.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = ObjectId(payload["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if payload.get("f") != sort_field:
+        raise ValueError("Cursor does not match the requested sort")
+
+    # Tri sur `_id` uniquement : une simple comparaison suffit
+    if sort_field == "_id":
+        return {"_id": {"$gt": last_id}}
+
+    # Tri composé (champ, `_id`) : on reprend après le couple (valeur, _id) du dernier document
+    field = sort_key(sort_field)
+    last_value = payload.get("v")
+
+    # Les valeurs nulles ou absentes sont triées en premier, mais `$gt: null` ne correspond à aucun document :
+    # après un document sans valeur, la suite comprend les autres documents sans valeur puis tous les autres
+    if last_value is None:
+        return {
+            "$or": [
+                {field: None, "_id": {"$gt": last_id}},
+                {field: {"$ne": None}},
+            ]
+        }
+    return {
+        "$or": [
+            {field: {"$gt": last_value}},
+            {field: last_value, "_id": {"$gt": last_id}},
+        ]
+    }
+
+
+def sort_spec(sort_field: str = "_id") -> list:
+    """
+    Cette fonction renvoie la spécification de tri MongoDB associée à un champ de tri.
+    `_id` est toujours ajouté en second critère pour garantir un ordre total (nécessaire au curseur).
+    """
+    if sort_field == "_id":
+        return [("_id", 1)]
+    return [(sort_key(sort_field), 1), ("_id", 1)]
+
+
+def apply_cursor(query: dict, cursor: str, sort_field: str = "_id") -> dict:
+    """
+    Cette fonction combine les filtres de recherche existants avec la condition issue du curseur.
+    L'opérateur `$and` évite toute collision entre les clés des deux filtres (par exemple `$or`).
+    """
+    keyset = decode_cursor(cursor, sort_field)
+    if not query:
+        return keyset
+    return {"$and": [query, keyset]}
+
+
+def next_cursor(documents: list, size: int, sort_field: str = "_id"):
+    """
+    Cette fonction renvoie le curseur de la page suivante, ou `None` si la page courante n'est pas pleine
+    (ce qui signifie qu'il n'y a plus de documents à lire).
+    """
+    if not documents or len(documents) < size:
+        return None
+    return encode_cursor(documents[-1], sort_field)
+
+
+def split_page(documents: list, size: int, sort_field: str = "_id"):
+    """
+    Cette fonction exploite le document supplémentaire lu au-delà de la page (`size + 1` documents demandés).
+
+    Retourne un tuple `(documents, has_next, cursor)` : la page limitée à `size` documents, l'existence d'une
+    page suivante et le curseur de cette page (`None` s'il n'y en a pas). Contrairement à `next_cursor`,
+    une page pleine qui se trouve être la dernière n'annonce pas de page suivante.
+    """
+    has_next = len(documents) > size
+    documents = documents[:size]
+    return documents, has_next, encode_cursor(documents[-1], sort_field) if has_next else None
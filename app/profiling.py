@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+# Profil d'une requête : temps passé dans MongoDB et temps passé dans le code de l'application
+# Un client envoie l'en-tête `X-Debug-Timing: 1` et reçoit en retour un en-tête `Server-Timing`, par exemple
+# `db;dur=12.4;desc="3 commands", app;dur=5.1, total;dur=17.5` (affiché par l'onglet Réseau des navigateurs).
+# Le temps MongoDB est mesuré par le listener de commandes du driver (voir `CommandStats` dans `app/database.py`) :
+# Motor exécute les commandes dans des threads en copiant le contexte, le profil de la requête y est donc visible.
+
+# Active ou désactive l'en-tête de profil. Désactivé par défaut : l'en-tête est accessible à tout client,
+# même anonyme, et révèle le temps passé dans MongoDB par chaque requête (à réserver au débogage)
+DEBUG_TIMING_ENABLED = os.getenv("DEBUG_TIMING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Nom de l'en-tête qui demande le profil (en minuscules, comme dans le `scope` ASGI)
+DEBUG_TIMING_HEADER = b"x-debug-timing"
+
+
+class RequestProfile:
+    """
+    Temps cumulé des commandes MongoDB d'une requête. Les commandes sont signalées depuis les threads
+    du driver : les compteurs sont protégés par un verrou.
+    """
+
+    def __init__(self):
+        self.database_time = 0.0
+        self.commands = 0
+        self._lock = threading.Lock()
+
+    def add(self, duration: float):
+        with self._lock:
+            self.database_time += duration
+            self.commands += 1
+
+
+# Profil de la requête en cours (`None` si le profil n'a pas été demandé)
+_current_profile = ContextVar("request_profile", default=None)
+
+
+def add_database_time(duration: float):
+    """
+    Cette fonction ajoute la durée d'une commande MongoDB (en secondes) au profil de la requête en cours.
+    Elle est appelée par le listener de commandes et ne fait rien hors d'une requête profilée.
+    """
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add(duration)
+
+
+def server_timing(profile: RequestProfile, total: float) -> bytes:
+    """
+    Cette fonction formate l'en-tête `Server-Timing` (durées en millisecondes).
+    """
+    database = 1000 * profile.database_time
+    total = 1000 * total
+    return 'db;dur={:.1f};desc="{} commands", app;dur={:.1f}, total;dur={:.1f}'.format(
+        database, profile.commands, max(total - database, 0.0), total
+    ).encode("latin-1")
+
+
+# Middleware de profil des requêtes
+class ProfilingMiddleware:
+    """
+    Middleware ASGI qui, pour les requêtes portant l'en-tête `X-Debug-Timing`, mesure le temps passé dans
+    MongoDB et ajoute l'en-tête `Server-Timing` à la réponse. Les autres requêtes ne sont pas mesurées.
+
+    Les durées sont arrêtées au début de la réponse : pour une réponse en flux (export, événements),
+    seul le temps avant le premier octet est compté.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(name == DEBUG_TIMING_HEADER for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        started = time.perf_counter()
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(profile, time.perf_counter() - started)))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
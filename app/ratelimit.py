@@ -0,0 +1,273 @@
+import asyncio
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+from starlette.responses import JSONResponse
+from .database import client_options
+from .tokens import CachedAuthJWT
+
+# Contrôle d'admission et limitation du débit par client
+# Deux protections s'appliquent à chaque requête, selon sa classe (`read`, `write` ou `login`) :
+# - un seau à jetons par client (sujet du JWT s'il est valide, sinon adresse IP) : un client qui envoie
+#   trop de requêtes reçoit 429 sans consommer de connexion MongoDB ;
+# - un nombre maximal de requêtes simultanées par classe, inférieur à la taille du pool : les requêtes
+#   en surnombre attendent une place au plus `ADMISSION_WAIT_SECONDS`, au lieu de s'accumuler dans la file
+#   d'attente du pool jusqu'à `waitQueueTimeoutMS`, puis reçoivent 503.
+# Les deux réponses portent un en-tête `Retry-After`.
+# Les seaux sont conservés par un backend interchangeable (en mémoire par défaut, un par worker).
+#
+# Derrière un proxy inverse (nginx, répartiteur de charge), toutes les requêtes arrivent de l'adresse du proxy :
+# sans `RATE_LIMIT_TRUSTED_PROXIES`, les clients anonymes partageraient un seul seau, et la limite par client
+# deviendrait une limite globale. Indiquer alors les adresses des proxys : l'adresse du client est lue dans
+# `X-Forwarded-For`, uniquement pour les requêtes reçues de ces proxys (l'en-tête d'un client direct est ignoré).
+
+# Active ou désactive le contrôle d'admission et la limitation du débit (désactivé par défaut : à activer
+# après avoir configuré `RATE_LIMIT_TRUSTED_PROXIES` si l'application est derrière un proxy)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Adresses ou réseaux des proxys de confiance, séparés par des virgules (par exemple "10.0.0.0/8,127.0.0.1")
+RATE_LIMIT_TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if network.strip()
+)
+
+# Débit autorisé par client et par classe : (jetons par seconde, taille du seau)
+RATE_LIMITS = {
+    "read": (float(os.getenv("RATE_LIMIT_READ_RATE", 20)), float(os.getenv("RATE_LIMIT_READ_BURST", 40))),
+    "write": (float(os.getenv("RATE_LIMIT_WRITE_RATE", 10)), float(os.getenv("RATE_LIMIT_WRITE_BURST", 20))),
+    "login": (float(os.getenv("RATE_LIMIT_LOGIN_RATE", 1)), float(os.getenv("RATE_LIMIT_LOGIN_BURST", 5))),
+}
+
+# Taille du pool de ce worker, qui borne le nombre de requêtes admises simultanément
+_POOL_SIZE = client_options().get("maxPoolSize", 100)
+
+# Nombre maximal de requêtes simultanées par classe (`login` est surtout du calcul : vérification bcrypt dans un thread)
+CONCURRENCY_LIMITS = {
+    "read": int(os.getenv("CONCURRENCY_READS", max(1, int(_POOL_SIZE * 0.7)))),
+    "write": int(os.getenv("CONCURRENCY_WRITES", max(1, int(_POOL_SIZE * 0.3)))),
+    "login": int(os.getenv("CONCURRENCY_LOGIN", 4)),
+}
+
+# Attente maximale d'une place (en secondes), par défaut celle de la file du pool (`waitQueueTimeoutMS`)
+ADMISSION_WAIT_SECONDS = float(os.getenv(
+    "ADMISSION_WAIT_SECONDS", client_options().get("waitQueueTimeoutMS", 1000) / 1000
+))
+
+# Nombre maximal de clients suivis par le backend en mémoire (les moins récents sont oubliés)
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", 10000))
+
+# Routes non limitées : sondes, métriques, statistiques, documentation et flux d'événements (connexions longues)
+EXEMPT_PREFIXES = ("/healthz", "/readyz", "/metrics", "/internal/", "/events", "/docs", "/redoc", "/openapi.json")
+
+
+# Interface des backends de limitation
+class RateLimitBackend:
+    """
+    Interface commune aux backends de limitation du débit. La méthode est asynchrone afin qu'un backend
+    partagé entre workers (Redis...) puisse être ajouté sans modifier le middleware.
+    """
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        """
+        Consomme un jeton du seau `key`. Retourne 0 si la requête est autorisée, sinon le délai
+        (en secondes) avant qu'un jeton soit disponible.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Backend en mémoire du processus : un seau à jetons par client, au plus `max_clients` seaux.
+    """
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # clé -> (jetons restants, date de la dernière mise à jour)
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = burst
+            else:
+                # Le seau se remplit de `rate` jetons par seconde depuis la dernière requête
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+            retry_after = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+            # Un client oublié retrouve un seau plein, ce qui ne fait que l'avantager brièvement
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "clients": len(self._buckets)}
+
+
+class NullRateLimitBackend(RateLimitBackend):
+    """
+    Backend qui autorise toutes les requêtes (limitation par client désactivée).
+    """
+
+    async def acquire(self, key: str, rate: float, burst: float) -> float:
+        return 0.0
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+def create_rate_limiter() -> RateLimitBackend:
+    """
+    Cette fonction crée le backend choisi par la variable d'environnement `RATE_LIMIT_BACKEND` :
+    "memory" (par défaut) ou "none".
+    """
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    if backend == "none":
+        return NullRateLimitBackend()
+    if backend == "memory":
+        return MemoryRateLimitBackend(max_clients=RATE_LIMIT_MAX_CLIENTS)
+    raise ValueError("Invalid RATE_LIMIT_BACKEND: {}".format(backend))
+
+
+def route_class(method: str, path: str) -> str:
+    """
+    Cette fonction renvoie la classe d'une requête : `login`, `read` (GET, HEAD) ou `write`.
+    """
+    if path == "/auth/login":
+        return "login"
+    return "read" if method in ("GET", "HEAD") else "write"
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    """
+    Indique si `address` appartient à l'un des réseaux de `RATE_LIMIT_TRUSTED_PROXIES`.
+    """
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def client_address(scope) -> str:
+    """
+    Cette fonction renvoie l'adresse IP du client d'une requête.
+    Si la requête vient d'un proxy de confiance, l'adresse est lue dans `X-Forwarded-For`, de droite à gauche :
+    la première adresse qui n'est pas un proxy de confiance est celle du client (les adresses plus à gauche
+    sont fournies par le client lui-même et ne sont pas fiables).
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if not RATE_LIMIT_TRUSTED_PROXIES or not _is_trusted_proxy(address):
+        return address
+
+    forwarded = []
+    for name, value in scope["headers"]:
+        if name == b"x-forwarded-for":
+            forwarded.extend(part.strip() for part in value.decode("latin-1").split(","))
+    for hop in reversed(forwarded):
+        if hop and not _is_trusted_proxy(hop):
+            return hop
+    return address
+
+
+def client_key(scope) -> str:
+    """
+    Cette fonction identifie le client d'une requête : le sujet de son JWT s'il est valide, sinon son adresse IP
+    (voir `client_address`).
+    Un jeton invalide n'est pas rejeté ici (la route s'en charge) : le client est alors compté par adresse.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    subject = CachedAuthJWT().get_raw_jwt(token).get("sub")
+                except Exception:
+                    subject = None
+                if subject is not None:
+                    return "sub:{}".format(subject)
+            break
+    return "ip:{}".format(client_address(scope))
+
+
+def _retry_response(status_code: int, retry_after: float, detail: str) -> JSONResponse:
+    """
+    Construit une réponse de refus (429 ou 503), avec le délai conseillé arrondi à la seconde supérieure.
+    """
+    return JSONResponse({"detail": detail}, status_code=status_code,
+                        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))})
+
+
+# Middleware de contrôle d'admission
+class AdmissionMiddleware:
+    """
+    Middleware ASGI qui applique la limitation par client puis la limite de requêtes simultanées
+    de la classe de la requête :
+    - 429 `Rate limit exceeded` : ce client a dépassé son débit ;
+    - 503 `Server busy` : le worker est saturé pour cette classe de requêtes, quel que soit le client.
+    """
+
+    def __init__(self, app, backend: RateLimitBackend = None):
+        self.app = app
+        self.backend = backend or rate_limiter
+        self.semaphores = {name: asyncio.Semaphore(limit) for name, limit in CONCURRENCY_LIMITS.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES) or scope["path"] == "/":
+            await self.app(scope, receive, send)
+            return
+
+        kind = route_class(scope["method"], scope["path"])
+
+        # Limitation par client : le seau est propre à la classe (les connexions ne consomment pas le débit des lectures)
+        rate, burst = RATE_LIMITS[kind]
+        retry_after = await self.backend.acquire("{}:{}".format(kind, client_key(scope)), rate, burst)
+        if retry_after > 0:
+            admission_stats["rate_limited"] += 1
+            await _retry_response(429, retry_after, "Rate limit exceeded")(scope, receive, send)
+            return
+
+        # Limite de requêtes simultanées : attente bornée d'une place, puis 503 (surcharge du serveur)
+        semaphore = self.semaphores[kind]
+        try:
+            await asyncio.wait_for(semaphore.acquire(), ADMISSION_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            admission_stats["rejected"] += 1
+            await _retry_response(503, ADMISSION_WAIT_SECONDS, "Server busy")(scope, receive, send)
+            return
+
+        admission_stats["admitted"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            semaphore.release()
+
+
+# Compteurs du contrôle d'admission de ce worker
+admission_stats = {"admitted": 0, "rate_limited": 0, "rejected": 0}
+
+# Backend partagé par le middleware (un par worker)
+rate_limiter = create_rate_limiter()
+
+
+def get_admission_stats() -> dict:
+    """
+    Cette fonction retourne les compteurs du contrôle d'admission, les limites configurées
+    et l'état du backend.
+    """
+    return {
+        **admission_stats,
+        "concurrency_limits": CONCURRENCY_LIMITS,
+        "admission_wait_seconds": ADMISSION_WAIT_SECONDS,
+        "trusted_proxies": [str(network) for network in RATE_LIMIT_TRUSTED_PROXIES],
+        "rate_limits": {name: {"rate": rate, "burst": burst} for name, (rate, burst) in RATE_LIMITS.items()},
+        **rate_limiter.stats(),
+    }
@@ -1,23 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi_jwt_auth import AuthJWT
 from pydantic import BaseModel
-from passlib.context import CryptContext
-from pymongo import MongoClient
+from ..controllers.user_controller import get_user_by_username, verify_password_async
+from ..deadlines import DeadlineRoute
+from ..tokens import CachedAuthJWT, denylist
 
-# Créer un contexte pour gérer le hachage des mots de passe
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-# Utilisation de passlib pour gérer le hachage des mots de passe avec bcrypt.
-# Cela permet de stocker les mots de passe sous forme hachée dans la base de données
-# et de vérifier le mot de passe lors de la connexion.
-
-# Connexion à MongoDB
-client = MongoClient("mongodb://localhost:27017")
-db = client["db_EtudiantProject"]  # Remplacez par le nom de votre base de données
-users_collection = db["users"]  # Collection MongoDB des utilisateurs
-
-
-# Connexion à une base de données MongoDB appelée "db_EtudiantProject".
-# Les utilisateurs sont stockés dans une collection appelée "users".
+# Les utilisateurs sont lus via le client Motor partagé (`app/database.py`), de façon asynchrone,
+# et la vérification bcrypt est exécutée dans le pool de threads borné du contrôleur des utilisateurs.
 
 # Modèle pour la requête de login
 class Login(BaseModel):
@@ -37,20 +26,12 @@ class TokenResponse(BaseModel):
 # Ce modèle Pydantic définit la réponse attendue après une connexion réussie.
 # La réponse contient un access_token (JWT) et le type de jeton (bearer).
 
-# Créer un routeur FastAPI pour l'authentification
-router = APIRouter()
+# Créer un routeur FastAPI pour l'authentification (routes bornées par un budget de temps, voir app/deadlines.py)
+router = APIRouter(route_class=DeadlineRoute)
 
 
 # Le routeur FastAPI permet de regrouper et gérer les routes liées à l'authentification.
 
-# Fonction pour récupérer l'utilisateur par nom d'utilisateur
-def get_user_by_username(username: str):
-    return users_collection.find_one({"username": username})
-
-
-# Cette fonction cherche un utilisateur dans la base de données MongoDB
-# en fonction du nom d'utilisateur. Elle retourne un document utilisateur s'il est trouvé.
-
 @router.post('/login', response_model=TokenResponse)
 async def login(user: Login, Authorize: AuthJWT = Depends()):
     """
@@ -63,14 +44,15 @@ async def login(user: Login, Authorize: AuthJWT = Depends()):
     """
 
     # Chercher l'utilisateur dans la base de données
-    user_in_db = get_user_by_username(user.username)
-    # Utilise la fonction pour chercher l'utilisateur en fonction du nom d'utilisateur.
+    user_in_db = await get_user_by_username(user.username)
+    # Utilise la fonction asynchrone du contrôleur pour chercher l'utilisateur en fonction du nom d'utilisateur.
 
     # Vérifier si l'utilisateur existe et si le mot de passe est correct
-    if not user_in_db or not pwd_context.verify(user.password, user_in_db["hashed_password"]):
+    if not user_in_db or not await verify_password_async(user.password, user_in_db["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid username or password")
     # Si l'utilisateur n'existe pas ou que le mot de passe fourni ne correspond pas
     # au mot de passe haché stocké dans la base de données, une exception HTTP 401 (Unauthorized) est levée.
+    # La vérification bcrypt s'exécute hors de la boucle d'événements : les autres requêtes ne sont pas bloquées.
 
     # Créer le token JWT
     access_token = Authorize.create_access_token(subject=user.username)
@@ -82,9 +64,28 @@ async def login(user: Login, Authorize: AuthJWT = Depends()):
     # La réponse contient le token JWT et le type de jeton "bearer" pour les futurs appels API.
 
 
+@router.post('/logout')
+async def logout(Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route révoque le jeton JWT utilisé pour l'appeler : il est refusé par les routes protégées
+    jusqu'à son expiration (voir `app/tokens.py`).
+
+    - `Authorize` : Dépendance FastAPI pour gérer l'authentification JWT.
+    """
+    Authorize.jwt_required()  # Un jeton déjà révoqué est refusé (401)
+
+    # Révoquer le jeton par son identifiant, jusqu'à sa date d'expiration
+    claims = Authorize.get_raw_jwt()
+    denylist.revoke(claims["jti"], claims.get("exp"))
+
+    return {"message": "Token revoked"}
+
+
 # Configurer le JWT
 class Settings(BaseModel):
     authjwt_secret_key: str = "secret"  # Utilisez une clé secrète plus sécurisée en production
+    authjwt_denylist_enabled: bool = True  # Les jetons révoqués par `/auth/logout` sont refusés
+    authjwt_denylist_token_checks: set = {"access"}
 
 
 # Ce modèle Pydantic contient la clé secrète utilisée pour signer et vérifier les tokens JWT.
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from ..events import change_feed, event_stream
+
+# Créer un routeur FastAPI pour le flux de changements
+router = APIRouter()
+
+
+# Route pour suivre en direct les changements des étudiants et des projets
+@router.get("")
+async def events(last_event_id: str = Header(None)):
+    """
+    Cette route diffuse les créations, modifications et suppressions d'étudiants et de projets
+    au format Server-Sent Events (`text/event-stream`), à la place d'une interrogation périodique des listes.
+
+    Chaque événement `change` contient la collection, l'opération et l'identifiant du document.
+    À la reconnexion, le navigateur renvoie `Last-Event-ID` : les changements manqués sont rejoués depuis
+    l'historique en mémoire du worker, ou un événement `reset` indique qu'il faut recharger les données.
+    L'historique n'est pas partagé : derrière un répartiteur de charge, une reconnexion traitée par un autre
+    worker reçoit `reset`.
+    Le flux est fermé dès que le worker reçoit un signal d'arrêt ; le navigateur se reconnecte alors à un autre worker.
+    La route répond 503 si les change streams ne sont pas disponibles (MongoDB sans replica set) ou si le worker s'arrête.
+    """
+    if not change_feed.available or change_feed.closing:
+        raise HTTPException(status_code=503, detail="Change feed is not available")
+
+    return StreamingResponse(
+        event_stream(change_feed, last_event_id),
+        media_type="text/event-stream",
+        # Pas de mise en cache ni de mise en mémoire tampon par un proxy (nginx)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
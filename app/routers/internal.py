@@ -0,0 +1,80 @@
+import os
+from fastapi import APIRouter
+from ..cache import cache
+from ..coalescing import single_flight
+from ..database import get_pool_stats
+from ..events import change_feed
+from ..ratelimit import get_admission_stats
+from ..tokens import denylist, verified_tokens
+
+# Routes d'observation d'un worker (`/internal/*`) : PID, compteurs du pool, tailles du cache et de la liste
+# des révocations, état du contrôle d'admission. Elles ne sont pas authentifiées (un outil de supervision doit
+# pouvoir les lire sans jeton) : elles ne sont donc montées que si `INTERNAL_ENDPOINTS_ENABLED` est activé,
+# à réserver à un réseau privé (règle du proxy inverse, port non exposé...).
+
+# Active ou désactive les routes `/internal/*` (désactivées par défaut)
+INTERNAL_ENDPOINTS_ENABLED = os.getenv("INTERNAL_ENDPOINTS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Créer un routeur FastAPI pour les routes d'observation
+router = APIRouter()
+
+
+# Route d'observation du pool de connexions MongoDB
+@router.get("/pool")
+async def pool_statistics():
+    """
+    Cette route retourne les statistiques du pool de connexions du worker qui traite la requête
+    (connexions ouvertes et empruntées, temps d'attente, échecs), ainsi que son PID.
+    Elle sert à dimensionner `MONGO_MAX_POOL_SIZE` lorsque plusieurs workers uvicorn/gunicorn sont lancés.
+    """
+    return get_pool_stats()
+
+
+# Route d'observation du cache de lecture
+@router.get("/cache")
+async def cache_statistics():
+    """
+    Cette route retourne les compteurs du cache de lecture de ce worker
+    (entrées, succès, absences, évictions et expirations).
+    """
+    return cache.stats()
+
+
+# Route d'observation du regroupement des lectures identiques
+@router.get("/coalescing")
+async def coalescing_statistics():
+    """
+    Cette route retourne le nombre de lectures demandées, exécutées et dédupliquées par ce worker
+    (voir `app/coalescing.py`).
+    """
+    return single_flight.stats()
+
+
+# Route d'observation du flux de changements
+@router.get("/events")
+async def events_statistics():
+    """
+    Cette route retourne l'état du flux de changements de ce worker
+    (disponibilité, clients connectés, événements diffusés, clients trop lents déconnectés).
+    """
+    return change_feed.stats()
+
+
+# Route d'observation de l'authentification
+@router.get("/auth")
+async def auth_statistics():
+    """
+    Cette route retourne les compteurs du cache de vérification des jetons JWT de ce worker
+    et le nombre de jetons révoqués conservés.
+    """
+    return {"verification_cache": verified_tokens.stats(), "denylist": denylist.stats()}
+
+
+# Route d'observation du contrôle d'admission
+@router.get("/admission")
+async def admission_statistics():
+    """
+    Cette route retourne les compteurs du contrôle d'admission de ce worker (requêtes admises,
+    limitées par client, refusées faute de place) ainsi que les limites configurées.
+    """
+    return get_admission_stats()
@@ -1,17 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Union
 from fastapi_jwt_auth import AuthJWT
-from ..schemas import ProjectCreate, ProjectResponse, ProjectUpdate
-from ..controllers import project_controller
+from ..tokens import CachedAuthJWT
+from ..schemas import (BulkImportResponse, ProjectCreate, ProjectResponse, ProjectUpdate, ProjectExpandedResponse,
+                       ProjectPartialResponse, ProjectPage, EnrollmentRequest, EnrollmentResponse)
+from ..controllers import project_controller, enrollment_controller
+from ..pagination import next_cursor, split_page
+from ..batch import parse_ids
+from ..bulk import parse_rows
+from ..export import EXPORT_FORMATS, export_collection, export_headers
+from ..expand import parse_expand, EXPAND_MAX_ITEMS
+from ..fields import parse_fields, PROJECT_FIELDS
+from ..serialization import item_model, list_response, project_to_response
+from ..versioning import VersionConflict, etag_matches, expected_version, make_etag
+from ..deadlines import BULK_DEADLINE_SECONDS, DeadlineRoute, deadline
 from bson import ObjectId
 
 # Initialisation du routeur FastAPI
-router = APIRouter()
+# Chaque route est exécutée dans un budget de temps transmis à MongoDB (voir app/deadlines.py)
+router = APIRouter(route_class=DeadlineRoute)
 
 
 # Route pour récupérer tous les projets avec pagination et recherche optionnelle
-@router.get("/", response_model=List[ProjectResponse])
-async def get_projects(page: int = 1, size: int = 10, name: Optional[str] = None, p_id: Optional[str] = None):
+@router.get("/", response_model=Union[List[Union[ProjectExpandedResponse, ProjectResponse, ProjectPartialResponse]], ProjectPage],
+            response_model_exclude_unset=True)
+async def get_projects(response: Response, page: int = 1, size: int = 10, name: Optional[str] = None,
+                       p_id: Optional[str] = None, cursor: Optional[str] = None, sort: str = "_id",
+                       search: str = "prefix", ids: Optional[str] = None, expand: Optional[str] = None,
+                       expand_page: int = 1, expand_size: int = EXPAND_MAX_ITEMS, fields: str = None,
+                       with_meta: bool = False):
     """
     Cette route permet de récupérer tous les projets, avec pagination et une
     possibilité de recherche par nom de projet ou par identifiant de projet.
@@ -20,59 +38,147 @@ async def get_projects(page: int = 1, size: int = 10, name: Optional[str] = None
     - `size` : Nombre de projets par page (par défaut 10).
     - `name` : Nom du projet pour effectuer une recherche (optionnel).
     - `p_id` : Identifiant du projet pour effectuer une recherche (optionnel).
+    - `cursor` : Curseur de pagination renvoyé dans l'en-tête `X-Next-Cursor` de la page précédente (optionnel).
+    - `sort` : Champ de tri (`_id` ou `name`, par défaut `_id`).
+    - `search` : Mode de recherche sur le nom : `prefix` (par défaut, indexé), `text` (par mots) ou `contains`.
+    - `ids` : Liste d'identifiants séparés par des virgules pour une lecture groupée (optionnel). Les projets
+      sont renvoyés dans l'ordre demandé et les identifiants introuvables sont listés dans l'en-tête `X-Missing-Ids`.
+    - `expand` : `students` pour inclure le résumé des étudiants de chaque projet, obtenu par une seule
+      agrégation `$lookup` (optionnel).
+    - `expand_page` / `expand_size` : Pagination de la liste développée (taille plafonnée à `EXPAND_MAX_ITEMS`).
+    - `fields` : Champs à renvoyer, séparés par des virgules (par exemple `name,head`) ; seuls `id` et ces champs
+      sont lus en base (optionnel).
+    - `with_meta` : Renvoie un objet `{items, total, has_next, next_cursor}` au lieu d'une liste ; une page vide
+      est alors renvoyée sans erreur 404. Le total est estimé ou mis en cache (optionnel).
     """
 
-    # Récupérer les projets depuis le contrôleur, avec pagination et filtres
-    projects = await project_controller.get_all_projects(page, size, name, p_id)
-
-    # Si aucun projet n'est trouvé, lever une exception 404
-    if not projects:
-        raise HTTPException(status_code=404, detail="No projects found")
+    # Vérifier les paramètres de développement
+    try:
+        window = parse_expand(expand, "students", expand_page, expand_size)
+        selected = parse_fields(fields, PROJECT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if ids is not None:
+        # Lecture groupée : une seule requête `$in` pour tous les identifiants demandés
+        if window is not None:
+            raise HTTPException(status_code=400, detail="expand is not supported with ids")
+        try:
+            projects, missing = await project_controller.get_projects_by_ids(parse_ids(ids), selected)
+        except ValueError as e:
+            # Trop d'identifiants demandés
+            raise HTTPException(status_code=400, detail=str(e))
+        headers = {"X-Missing-Ids": ",".join(missing)} if missing else {}
+
+        # Si aucun projet n'est trouvé, lever une exception 404
+        if not projects and not with_meta:
+            raise HTTPException(status_code=404, detail="No projects found", headers=headers)
+        response.headers.update(headers)
+        total, has_next, cursor_next = len(projects), False, None
+    else:
+        # Récupérer les projets depuis le contrôleur, avec pagination et filtres
+        try:
+            projects = await project_controller.get_all_projects(page, size, name, p_id, cursor, sort, search,
+                                                                 window, selected, with_meta)
+            # Total (estimé ou mis en cache) pour les métadonnées de pagination
+            total = await project_controller.count_projects(name, p_id, search) if with_meta else None
+        except ValueError as e:
+            # Curseur, champ de tri ou mode de recherche invalide
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Si aucun projet n'est trouvé, lever une exception 404
+        # (avec `with_meta`, une page vide est renvoyée telle quelle)
+        if not projects and not with_meta:
+            raise HTTPException(status_code=404, detail="No projects found")
+
+        # Exposer le curseur de la page suivante (absent s'il n'y a plus de résultats)
+        if with_meta:
+            # Le document supplémentaire lu par le contrôleur indique s'il existe une page suivante
+            projects, has_next, cursor_next = split_page(projects, size, sort)
+        else:
+            cursor_next = next_cursor(projects, size, sort)
+        if cursor_next:
+            response.headers["X-Next-Cursor"] = cursor_next
 
     # Retourner les projets sous forme de liste de dictionnaires
-    return [
-        {
-            "id": str(project["_id"]),  # Conversion de l'ObjectId en chaîne de caractères
-            "name": project["name"],
-            "head": project.get("head", ""),  # Récupérer le champ 'head' s'il est présent, sinon valeur par défaut
-            "description": project.get("description", ""),  # Récupérer la description ou une chaîne vide par défaut
-            "student_ids": [str(student_id) for student_id in project.get("student_ids", [])]
-            # Convertir les IDs des étudiants en chaînes
-        }
-        for project in projects
-    ]
+    items = [project_to_response(project, window is not None, selected) for project in projects]
+    model = item_model(selected, window is not None, ProjectResponse, ProjectExpandedResponse, ProjectPartialResponse)
+    if with_meta:
+        # Métadonnées de pagination : la page est renvoyée dans `items`
+        page_data = {"items": items, "total": total, "has_next": has_next, "next_cursor": cursor_next}
+        return list_response(page_data, response, model)
+    return list_response(items, response, model)
+
+
+# Route pour exporter tous les projets
+@router.get("/export")
+async def export_projects(format: str = "ndjson", gzip: bool = False, Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route exporte tous les projets en une seule réponse diffusée au fil de l'eau (`StreamingResponse`).
+    Elle est protégée par JWT.
+    - `format` : "ndjson" (par défaut) ou "csv".
+    - `gzip` : Compresse la réponse en gzip (`Content-Encoding: gzip`).
+    Les documents sont lus par paquets depuis un curseur MongoDB : la mémoire reste constante quelle que
+    soit la taille de la collection (voir `app/export.py`).
+    Le budget de la route ne couvre que sa préparation : la diffusion du corps n'a volontairement pas de délai.
+    """
+    Authorize.jwt_required()  # Vérifie que l'utilisateur est authentifié via JWT
+
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format (expected one of: {})".format(", ".join(EXPORT_FORMATS)))
 
+    return StreamingResponse(
+        export_collection("projects", format, gzip),
+        media_type=EXPORT_FORMATS[format],
+        headers=export_headers("projects", format, gzip),
+    )
 
 # Route pour récupérer un projet par ID
-@router.get("/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: str):
+@router.get("/{project_id}", response_model=Union[ProjectExpandedResponse, ProjectResponse, ProjectPartialResponse],
+            response_model_exclude_unset=True)
+async def get_project(project_id: str, response: Response, expand: Optional[str] = None, expand_page: int = 1,
+                      expand_size: int = EXPAND_MAX_ITEMS, fields: str = None,
+                      if_none_match: Optional[str] = Header(None)):
     """
     Cette route permet de récupérer un projet spécifique par son identifiant `project_id`.
 
     - `project_id` : L'identifiant du projet à récupérer.
+    - `expand` : `students` pour inclure le résumé des étudiants inscrits (optionnel).
+    - `expand_page` / `expand_size` : Pagination de la liste développée (taille plafonnée à `EXPAND_MAX_ITEMS`).
+    - `fields` : Champs à renvoyer, séparés par des virgules (par exemple `name,head`) ; seuls `id` et ces champs
+      sont lus en base (optionnel).
+    - `if_none_match` : ETag d'une lecture précédente ; si le projet n'a pas changé, la route répond 304 sans corps.
+      Les vues développées n'ont pas d'ETag : elles dépendent aussi des étudiants joints.
     """
 
+    # Vérifier les paramètres de développement
+    try:
+        window = parse_expand(expand, "students", expand_page, expand_size)
+        selected = parse_fields(fields, PROJECT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     # Récupérer le projet par son identifiant via le contrôleur
-    project = await project_controller.get_project_by_id(project_id)
+    project = await project_controller.get_project_by_id(project_id, window, selected)
 
     # Si le projet n'est pas trouvé, lever une exception 404
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    if window is None:
+        # Projet inchangé depuis la dernière lecture du client : 304, sans sérialisation
+        etag = make_etag(project)
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
     # Retourner le projet sous forme de dictionnaire
-    return {
-        "id": str(project["_id"]),  # Conversion de l'ObjectId en chaîne de caractères
-        "name": project["name"],
-        "head": project.get("head", ""),  # Récupérer 'head' s'il est présent
-        "description": project.get("description", ""),  # Récupérer la description ou une chaîne vide par défaut
-        "student_ids": [str(student_id) for student_id in project.get("student_ids", [])]
-        # Convertir les IDs des étudiants en chaînes
-    }
+    return project_to_response(project, window is not None, selected)
 
 
 # Route pour créer un nouveau projet
 @router.post("/", response_model=ProjectResponse)
-async def create_project(project: ProjectCreate, Authorize: AuthJWT = Depends()):
+async def create_project(project: ProjectCreate, response: Response, Authorize: AuthJWT = Depends(CachedAuthJWT)):
     """
     Cette route permet de créer un nouveau projet. Elle est protégée par JWT,
     ce qui signifie que l'utilisateur doit être authentifié.
@@ -91,19 +197,34 @@ async def create_project(project: ProjectCreate, Authorize: AuthJWT = Depends())
     created_project = await project_controller.create_project(project_data)
 
     # Retourner les informations du projet créé
-    return {
-        "id": str(created_project["_id"]),  # Conversion de l'ObjectId en chaîne de caractères
-        "name": created_project["name"],
-        "head": created_project.get("head", ""),  # Assurer que 'head' est présent ou retourner une chaîne vide
-        "description": created_project.get("description", ""),  # Récupérer la description ou une chaîne vide par défaut
-        "student_ids": [str(student_id) for student_id in created_project.get("student_ids", [])]
-        # Convertir les IDs des étudiants en chaînes
-    }
+    response.headers["ETag"] = make_etag(created_project)
+    return project_to_response(created_project)
+
+
+# Route pour importer des projets en masse
+@router.post("/bulk", response_model=BulkImportResponse)
+@deadline(BULK_DEADLINE_SECONDS)
+async def import_projects(request: Request, Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route permet d'importer des projets en masse. Elle est protégée par JWT.
+    Le corps est un tableau JSON ou du NDJSON (`Content-Type: application/x-ndjson`), chaque ligne suivant
+    le schéma `ProjectCreate`. Les lignes invalides sont renvoyées dans `errors` sans interrompre l'importation.
+    """
+    Authorize.jwt_required()  # Vérifie que l'utilisateur est authentifié via JWT
+
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        # Corps vide, JSON invalide ou trop de lignes
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await project_controller.import_projects(rows)
 
 
 # Route pour mettre à jour un projet
 @router.put("/{project_id}", response_model=ProjectResponse)
-async def update_project(project_id: str, project: ProjectUpdate, Authorize: AuthJWT = Depends()):
+async def update_project(project_id: str, project: ProjectUpdate, response: Response, Authorize: AuthJWT = Depends(CachedAuthJWT),
+                         if_match: Optional[str] = Header(None)):
     """
     Cette route permet de mettre à jour un projet existant par son identifiant `project_id`.
     Elle est protégée par JWT pour vérifier que l'utilisateur est authentifié.
@@ -111,6 +232,8 @@ async def update_project(project_id: str, project: ProjectUpdate, Authorize: Aut
     - `project_id` : L'identifiant du projet à mettre à jour.
     - `project` : Les champs à mettre à jour dans le projet (en excluant ceux qui ne sont pas envoyés).
     - `Authorize` : Dépendance pour la vérification du JWT (authentification).
+    - `if_match` : ETag d'une lecture précédente ; si le projet a été modifié entre-temps, la route répond 412
+      (concurrence optimiste).
     """
 
     # Vérifie que l'utilisateur est authentifié via JWT
@@ -120,39 +243,42 @@ async def update_project(project_id: str, project: ProjectUpdate, Authorize: Aut
     update_data = project.dict(exclude_unset=True)
 
     # Mettre à jour le projet dans la base de données via le contrôleur
-    updated_project = await project_controller.update_project(project_id, update_data)
+    try:
+        updated_project = await project_controller.update_project(
+            project_id, update_data, expected_version(if_match, project_id)
+        )
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Project has been modified")
 
     # Si le projet n'est pas trouvé, lever une exception 404
     if not updated_project:
         raise HTTPException(status_code=404, detail="Project not found")
 
     # Retourner les informations du projet mis à jour
-    return {
-        "id": str(updated_project["_id"]),  # Conversion de l'ObjectId en chaîne de caractères
-        "name": updated_project["name"],
-        "head": updated_project.get("head", ""),  # Assurer que 'head' est présent ou retourner une chaîne vide
-        "description": updated_project.get("description", ""),  # Récupérer la description ou une chaîne vide par défaut
-        "student_ids": [str(student_id) for student_id in updated_project.get("student_ids", [])]
-        # Convertir les IDs des étudiants en chaînes
-    }
+    response.headers["ETag"] = make_etag(updated_project)
+    return project_to_response(updated_project)
 
 
 # Route pour supprimer un projet
 @router.delete("/{project_id}")
-async def delete_project(project_id: str, Authorize: AuthJWT = Depends()):
+async def delete_project(project_id: str, Authorize: AuthJWT = Depends(CachedAuthJWT), if_match: Optional[str] = Header(None)):
     """
     Cette route permet de supprimer un projet par son identifiant `project_id`.
     Elle est protégée par JWT pour s'assurer que l'utilisateur est authentifié.
 
     - `project_id` : L'identifiant du projet à supprimer.
     - `Authorize` : Dépendance pour la vérification du JWT (authentification).
+    - `if_match` : ETag d'une lecture précédente ; si le projet a été modifié entre-temps, la route répond 412.
     """
 
     # Vérifie que l'utilisateur est authentifié via JWT
     Authorize.jwt_required()
 
     # Supprimer le projet dans la base de données via le contrôleur
-    deleted = await project_controller.delete_project(project_id)
+    try:
+        deleted = await project_controller.delete_project(project_id, expected_version(if_match, project_id))
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Project has been modified")
 
     # Si le projet n'est pas trouvé, lever une exception 404
     if not deleted:
@@ -160,3 +286,81 @@ async def delete_project(project_id: str, Authorize: AuthJWT = Depends()):
 
     # Retourner un message confirmant la suppression réussie
     return {"message": "Project deleted successfully"}
+
+
+# Route pour inscrire plusieurs étudiants à un projet
+@router.post("/{project_id}/students", response_model=EnrollmentResponse)
+async def enroll_students(project_id: str, enrollment: EnrollmentRequest, Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route inscrit une liste d'étudiants à un projet. Elle est protégée par JWT.
+    Les deux côtés de la relation (`student_ids` du projet et `project_ids` des étudiants) sont mis à jour
+    ensemble ; les identifiants d'étudiants introuvables sont ignorés et renvoyés dans `missing`.
+
+    - `project_id` : L'identifiant du projet.
+    - `enrollment` : La liste des identifiants des étudiants à inscrire.
+    - `Authorize` : Dépendance pour la vérification du JWT (authentification).
+    """
+
+    # Vérifie que l'utilisateur est authentifié via JWT
+    Authorize.jwt_required()
+
+    try:
+        result = await enrollment_controller.enroll_students(project_id, enrollment.student_ids)
+    except ValueError as e:
+        # Trop d'étudiants dans une seule requête
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Si le projet n'est pas trouvé, lever une exception 404
+    if result is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return result
+
+
+# Route pour inscrire un étudiant à un projet
+@router.post("/{project_id}/students/{student_id}", response_model=EnrollmentResponse)
+async def enroll_student(project_id: str, student_id: str, Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route inscrit un étudiant à un projet. Elle est protégée par JWT.
+
+    - `project_id` : L'identifiant du projet.
+    - `student_id` : L'identifiant de l'étudiant à inscrire.
+    - `Authorize` : Dépendance pour la vérification du JWT (authentification).
+    """
+
+    # Vérifie que l'utilisateur est authentifié via JWT
+    Authorize.jwt_required()
+
+    result = await enrollment_controller.enroll_students(project_id, [student_id])
+
+    # Si le projet ou l'étudiant n'est pas trouvé, lever une exception 404
+    if result is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if result["missing"]:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    return result
+
+
+# Route pour désinscrire un étudiant d'un projet
+@router.delete("/{project_id}/students/{student_id}")
+async def unenroll_student(project_id: str, student_id: str, Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route retire un étudiant d'un projet, des deux côtés de la relation. Elle est protégée par JWT.
+
+    - `project_id` : L'identifiant du projet.
+    - `student_id` : L'identifiant de l'étudiant à désinscrire.
+    - `Authorize` : Dépendance pour la vérification du JWT (authentification).
+    """
+
+    # Vérifie que l'utilisateur est authentifié via JWT
+    Authorize.jwt_required()
+
+    removed = await enrollment_controller.unenroll_student(project_id, student_id)
+
+    # Si l'étudiant n'était pas inscrit à ce projet, lever une exception 404
+    if not removed:
+        raise HTTPException(status_code=404, detail="Enrollment not found")
+
+    # Retourner un message confirmant la désinscription
+    return {"message": "Student unenrolled successfully"}
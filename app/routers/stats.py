@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends
+from fastapi_jwt_auth import AuthJWT
+from ..deadlines import BULK_DEADLINE_SECONDS, DeadlineRoute, deadline
+from ..schemas import ProjectStats, StudentStats
+from ..stats import get_stats, refresh_stats
+from ..tokens import CachedAuthJWT
+
+# Créer un routeur FastAPI pour les statistiques agrégées (routes bornées par un budget de temps, voir app/deadlines.py)
+router = APIRouter(route_class=DeadlineRoute)
+
+
+# Route pour les statistiques des étudiants
+@router.get("/students", response_model=StudentStats)
+async def student_stats():
+    """
+    Cette route retourne le nombre d'étudiants, par cours et par filière, et le nombre d'étudiants
+    sans projet. Les compteurs sont lus dans la collection de synthèse (voir `app/stats.py`) :
+    la réponse ne parcourt pas la collection des étudiants.
+    """
+    return await get_stats("students")
+
+
+# Route pour les statistiques des projets
+@router.get("/projects", response_model=ProjectStats)
+async def project_stats():
+    """
+    Cette route retourne le nombre de projets et leur répartition par nombre d'étudiants inscrits,
+    lus dans la collection de synthèse.
+    """
+    return await get_stats("projects")
+
+
+# Route pour reconstruire les statistiques
+@router.post("/refresh")
+@deadline(BULK_DEADLINE_SECONDS)
+async def refresh(Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route reconstruit immédiatement les compteurs à partir des collections (agrégation `$facet`),
+    sans attendre la reconstruction périodique. Elle est protégée par JWT.
+    """
+    Authorize.jwt_required()  # Vérifie que l'utilisateur est authentifié via JWT
+
+    return {collection: await refresh_stats(collection) for collection in ("students", "projects")}
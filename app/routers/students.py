@@ -1,66 +1,163 @@
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Union
 from fastapi_jwt_auth import AuthJWT
+from ..tokens import CachedAuthJWT
 from ..database import db
-from ..schemas import StudentCreate, StudentResponse, StudentUpdate
+from ..schemas import (BulkImportResponse, StudentCreate, StudentResponse, StudentUpdate, StudentExpandedResponse,
+                       StudentPartialResponse, StudentPage)
 from ..controllers import student_controller
-
-router = APIRouter()  # Crée un routeur FastAPI pour regrouper les routes liées aux étudiants
+from ..pagination import next_cursor, split_page
+from ..batch import parse_ids
+from ..bulk import parse_rows
+from ..export import EXPORT_FORMATS, export_collection, export_headers
+from ..expand import parse_expand, EXPAND_MAX_ITEMS
+from ..fields import parse_fields, STUDENT_FIELDS
+from ..serialization import item_model, list_response, student_to_response
+from ..versioning import VersionConflict, etag_matches, expected_version, make_etag
+from ..deadlines import BULK_DEADLINE_SECONDS, DeadlineRoute, deadline
+
+router = APIRouter(route_class=DeadlineRoute)  # Crée un routeur FastAPI pour regrouper les routes liées aux étudiants
+# Chaque route est exécutée dans un budget de temps transmis à MongoDB (voir app/deadlines.py)
 
 # Route pour récupérer tous les étudiants avec pagination et recherche optionnelle
-@router.get("/", response_model=List[StudentResponse])
-async def get_students(page: int = 1, size: int = 10, name: str = None, s_id: str = None):
+@router.get("/", response_model=Union[List[Union[StudentExpandedResponse, StudentResponse, StudentPartialResponse]], StudentPage],
+            response_model_exclude_unset=True)
+async def get_students(response: Response, page: int = 1, size: int = 10, name: str = None, s_id: str = None,
+                       cursor: str = None, sort: str = "_id", search: str = "prefix", ids: str = None,
+                       expand: str = None, expand_page: int = 1, expand_size: int = EXPAND_MAX_ITEMS,
+                       fields: str = None, with_meta: bool = False):
     """
     Cette route permet de récupérer une liste d'étudiants avec pagination et recherche optionnelle
     par nom ou identifiant.
+    La pagination par curseur est activée en passant `cursor` (valeur de l'en-tête `X-Next-Cursor`
+    de la page précédente) ; `page` reste supporté pour la compatibilité.
+    `search` choisit le mode de recherche sur le nom : `prefix` (par défaut), `text` ou `contains`.
+    Avec `ids=a,b,c`, la route effectue une lecture groupée : les étudiants sont renvoyés dans l'ordre
+    demandé et les identifiants introuvables sont listés dans l'en-tête `X-Missing-Ids`.
+    Avec `expand=projects`, chaque étudiant de la page inclut le résumé de ses projets, obtenu par une seule
+    agrégation `$lookup` ; `expand_page`/`expand_size` paginent la liste développée (plafonnée à `EXPAND_MAX_ITEMS`).
+    Avec `fields=name,email`, seuls `id` et les champs demandés sont lus en base et renvoyés.
+    Avec `with_meta=true`, la réponse est un objet `{items, total, has_next, next_cursor}` et une page vide
+    est renvoyée sans erreur 404.
     """
-    students = await student_controller.get_all_students(page, size, name, s_id)  # Récupérer les étudiants depuis le contrôleur
-    if not students:
-        # Si aucun étudiant n'est trouvé, lever une erreur HTTP 404
-        raise HTTPException(status_code=404, detail="No students found")
+    try:
+        window = parse_expand(expand, "projects", expand_page, expand_size)
+        selected = parse_fields(fields, STUDENT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if ids is not None:
+        # Lecture groupée : une seule requête `$in` pour tous les identifiants demandés
+        if window is not None:
+            raise HTTPException(status_code=400, detail="expand is not supported with ids")
+        try:
+            students, missing = await student_controller.get_students_by_ids(parse_ids(ids), selected)
+        except ValueError as e:
+            # Trop d'identifiants demandés
+            raise HTTPException(status_code=400, detail=str(e))
+        headers = {"X-Missing-Ids": ",".join(missing)} if missing else {}
+        if not students and not with_meta:
+            raise HTTPException(status_code=404, detail="No students found", headers=headers)
+        response.headers.update(headers)
+        total, has_next, cursor_next = len(students), False, None
+    else:
+        try:
+            # Récupérer les étudiants depuis le contrôleur
+            students = await student_controller.get_all_students(page, size, name, s_id, cursor, sort, search,
+                                                                 window, selected, with_meta)
+            # Total (estimé ou mis en cache) pour les métadonnées de pagination
+            total = await student_controller.count_students(name, s_id, search) if with_meta else None
+        except ValueError as e:
+            # Curseur, champ de tri ou mode de recherche invalide
+            raise HTTPException(status_code=400, detail=str(e))
+        if not students and not with_meta:
+            # Si aucun étudiant n'est trouvé, lever une erreur HTTP 404
+            # (avec `with_meta`, une page vide est renvoyée telle quelle)
+            raise HTTPException(status_code=404, detail="No students found")
+
+        # Exposer le curseur de la page suivante (absent s'il n'y a plus de résultats)
+        if with_meta:
+            # Le document supplémentaire lu par le contrôleur indique s'il existe une page suivante
+            students, has_next, cursor_next = split_page(students, size, sort)
+        else:
+            cursor_next = next_cursor(students, size, sort)
+        if cursor_next:
+            response.headers["X-Next-Cursor"] = cursor_next
 
     # Retourner la liste d'étudiants avec les champs formatés correctement
-    return [
-        {
-            "id": str(student["_id"]),  # Convertir l'ObjectId en chaîne de caractères
-            "name": student.get("name", ""),  # Assurer que 'name' est présent
-            "email": student.get("email", ""),  # Assurer que 'email' est présent ou mettre une valeur par défaut
-            "course": student.get("course", ""),  # Assurer que 'course' est présent
-            "branch": student.get("branch", ""),  # Assurer que 'branch' est présent
-            # Convertir 'project_ids' en liste de chaînes si ce n'est pas déjà le cas
-            "project_ids": [str(pid) for pid in student.get("project_ids", []) if isinstance(pid, ObjectId)]
-        }
-        for student in students  # Boucle sur chaque étudiant dans la liste récupérée
-    ]
+    items = [student_to_response(student, window is not None, selected) for student in students]
+    model = item_model(selected, window is not None, StudentResponse, StudentExpandedResponse, StudentPartialResponse)
+    if with_meta:
+        # Métadonnées de pagination : la page est renvoyée dans `items`
+        page_data = {"items": items, "total": total, "has_next": has_next, "next_cursor": cursor_next}
+        return list_response(page_data, response, model)
+    return list_response(items, response, model)
+
+
+# Route pour exporter tous les étudiants
+@router.get("/export")
+async def export_students(format: str = "ndjson", gzip: bool = False, Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route exporte tous les étudiants en une seule réponse diffusée au fil de l'eau (`StreamingResponse`).
+    Elle est protégée par JWT.
+    - `format` : "ndjson" (par défaut) ou "csv".
+    - `gzip` : Compresse la réponse en gzip (`Content-Encoding: gzip`).
+    Les documents sont lus par paquets depuis un curseur MongoDB : la mémoire reste constante quelle que
+    soit la taille de la collection (voir `app/export.py`).
+    Le budget de la route ne couvre que sa préparation : la diffusion du corps n'a volontairement pas de délai.
+    """
+    Authorize.jwt_required()  # Vérifie que l'utilisateur est authentifié via JWT
+
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format (expected one of: {})".format(", ".join(EXPORT_FORMATS)))
+
+    return StreamingResponse(
+        export_collection("students", format, gzip),
+        media_type=EXPORT_FORMATS[format],
+        headers=export_headers("students", format, gzip),
+    )
 
 # Route pour récupérer un étudiant par ID
-@router.get("/{student_id}", response_model=StudentResponse)
-async def get_student(student_id: str):
+@router.get("/{student_id}", response_model=Union[StudentExpandedResponse, StudentResponse, StudentPartialResponse],
+            response_model_exclude_unset=True)
+async def get_student(student_id: str, response: Response, expand: str = None, expand_page: int = 1,
+                      expand_size: int = EXPAND_MAX_ITEMS, fields: str = None, if_none_match: str = Header(None)):
     """
     Cette route permet de récupérer un étudiant spécifique par son identifiant MongoDB.
+    Avec `expand=projects`, la réponse inclut le résumé des projets de l'étudiant (paginé par
+    `expand_page`/`expand_size`), obtenu par une seule agrégation `$lookup`.
+    Avec `fields=name,email`, seuls `id` et les champs demandés sont renvoyés.
+    La réponse porte un en-tête `ETag` ; si `If-None-Match` contient cet ETag, la route répond 304 sans corps.
+    Les vues développées n'ont pas d'ETag : elles dépendent aussi des projets joints.
     """
-    student = await student_controller.get_student_by_id(student_id)  # Récupérer l'étudiant par son ID
+    try:
+        window = parse_expand(expand, "projects", expand_page, expand_size)
+        selected = parse_fields(fields, STUDENT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    student = await student_controller.get_student_by_id(student_id, window, selected)  # Récupérer l'étudiant par son ID
     if not student:
         # Si l'étudiant n'est pas trouvé, lever une erreur HTTP 404
         raise HTTPException(status_code=404, detail="Student not found")
 
+    if window is None:
+        # Document inchangé depuis la dernière lecture du client : 304, sans sérialisation
+        etag = make_etag(student)
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
     # Retourner les informations de l'étudiant trouvé
-    return {
-        "id": str(student["_id"]),  # Convertir l'ObjectId en chaîne de caractères
-        "name": student.get("name", ""),  # Assurer que 'name' est présent
-        "email": student.get("email", ""),  # Assurer que 'email' est présent ou mettre une valeur par défaut
-        "course": student.get("course", ""),  # Assurer que 'course' est présent
-        "branch": student.get("branch", ""),  # Assurer que 'branch' est présent
-        # Convertir 'project_ids' en liste de chaînes si ce n'est pas déjà le cas
-        "project_ids": [str(pid) for pid in student.get("project_ids", []) if isinstance(pid, ObjectId)]
-    }
+    return student_to_response(student, window is not None, selected)
 
 from bson import ObjectId
 
 # Route pour créer un nouvel étudiant
 @router.post("/", response_model=StudentResponse)
-async def create_student(student: StudentCreate, Authorize: AuthJWT = Depends()):
+async def create_student(student: StudentCreate, response: Response, Authorize: AuthJWT = Depends(CachedAuthJWT)):
     """
     Cette route permet de créer un nouvel étudiant. Elle est protégée par JWT.
     """
@@ -83,50 +180,70 @@ async def create_student(student: StudentCreate, Authorize: AuthJWT = Depends())
     created_student = await student_controller.create_student(student_data)
 
     # Retourner les informations de l'étudiant créé
-    return {
-        "id": str(created_student["_id"]),  # Convertir l'ObjectId en chaîne de caractères
-        "name": created_student["name"],
-        "email": created_student.get("email", ""),  # Assurer que 'email' est présent
-        "course": created_student.get("course", ""),  # Assurer que 'course' est présent
-        "branch": created_student.get("branch", ""),  # Assurer que 'branch' est présent
-        # Convertir 'project_ids' en liste de chaînes si ce n'est pas déjà le cas
-        "project_ids": [str(pid) for pid in created_student.get("project_ids", []) if isinstance(pid, ObjectId)]
-    }
+    response.headers["ETag"] = make_etag(created_student)
+    return student_to_response(created_student)
+
+
+# Route pour importer des étudiants en masse
+@router.post("/bulk", response_model=BulkImportResponse)
+@deadline(BULK_DEADLINE_SECONDS)
+async def import_students(request: Request, Authorize: AuthJWT = Depends(CachedAuthJWT)):
+    """
+    Cette route permet d'importer des étudiants en masse. Elle est protégée par JWT.
+    Le corps est un tableau JSON ou du NDJSON (`Content-Type: application/x-ndjson`), chaque ligne suivant
+    le schéma `StudentCreate`. Les lignes invalides sont renvoyées dans `errors` sans interrompre l'importation.
+    """
+    Authorize.jwt_required()  # Vérifie que l'utilisateur est authentifié via JWT
+
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        # Corps vide, JSON invalide ou trop de lignes
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await student_controller.import_students(rows)
 
 
 # Route pour mettre à jour un étudiant
 @router.put("/{student_id}", response_model=StudentResponse)
-async def update_student(student_id: str, student: StudentUpdate, Authorize: AuthJWT = Depends()):
+async def update_student(student_id: str, student: StudentUpdate, response: Response, Authorize: AuthJWT = Depends(CachedAuthJWT),
+                         if_match: str = Header(None)):
     """
     Cette route permet de mettre à jour les informations d'un étudiant. Elle est protégée par JWT.
+    Avec `If-Match` (ETag d'une lecture précédente), la mise à jour n'est appliquée que si l'étudiant n'a pas
+    été modifié entre-temps ; sinon la route répond 412.
     """
     Authorize.jwt_required()  # Vérifie que l'utilisateur est authentifié via JWT
     update_data = student.dict(exclude_unset=True)  # Convertir l'objet Pydantic en dictionnaire, excluant les champs non envoyés
-    updated_student = await student_controller.update_student(student_id, update_data)  # Mettre à jour l'étudiant dans la base de données
+    try:
+        # Mettre à jour l'étudiant dans la base de données
+        updated_student = await student_controller.update_student(
+            student_id, update_data, expected_version(if_match, student_id)
+        )
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Student has been modified")
 
     if not updated_student:
         # Si l'étudiant n'est pas trouvé, lever une erreur HTTP 404
         raise HTTPException(status_code=404, detail="Student not found")
 
     # Retourner les informations de l'étudiant mis à jour
-    return {
-        "id": str(updated_student["_id"]),  # Convertir l'ObjectId en chaîne de caractères
-        "name": updated_student["name"],
-        "email": updated_student.get("email", ""),  # Assurer que 'email' est présent
-        "course": updated_student.get("course", ""),  # Assurer que 'course' est présent
-        "branch": updated_student.get("branch", ""),  # Assurer que 'branch' est présent
-        # Convertir 'project_ids' en liste de chaînes si ce n'est pas déjà le cas
-        "project_ids": [str(pid) for pid in updated_student.get("project_ids", []) if isinstance(pid, ObjectId)]
-    }
+    response.headers["ETag"] = make_etag(updated_student)
+    return student_to_response(updated_student)
 
 # Route pour supprimer un étudiant
 @router.delete("/{student_id}")
-async def delete_student(student_id: str, Authorize: AuthJWT = Depends()):
+async def delete_student(student_id: str, Authorize: AuthJWT = Depends(CachedAuthJWT), if_match: str = Header(None)):
     """
     Cette route permet de supprimer un étudiant. Elle est protégée par JWT.
+    Avec `If-Match`, la suppression n'est appliquée que si l'étudiant n'a pas été modifié entre-temps (sinon 412).
     """
     Authorize.jwt_required()  # Vérifie que l'utilisateur est authentifié via JWT
-    deleted = await student_controller.delete_student(student_id)  # Supprimer l'étudiant dans la base de données
+    try:
+        # Supprimer l'étudiant dans la base de données
+        deleted = await student_controller.delete_student(student_id, expected_version(if_match, student_id))
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Student has been modified")
 
     if not deleted:
         # Si l'étudiant n'est pas trouvé, lever une erreur HTTP 404
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
+from pymongo.errors import DuplicateKeyError
 from ..schemas import UserCreate, UserResponse
-from ..controllers import create_user, get_user_by_email
+from ..controllers.user_controller import create_user
 from fastapi_jwt_auth import AuthJWT
 
 # Initialisation du routeur FastAPI
@@ -12,20 +13,19 @@ router = APIRouter()
 async def signup(user: UserCreate):
     """
     Cette route permet à un nouvel utilisateur de s'inscrire en fournissant ses informations.
-    Elle vérifie si l'utilisateur existe déjà avant de créer un nouveau compte.
+    L'unicité de l'email et du nom d'utilisateur est garantie par les index uniques de la collection
+    "users" : l'insertion échoue directement si l'utilisateur existe déjà (un seul aller-retour).
 
     - `user` : Objet Pydantic `UserCreate` contenant les informations de l'utilisateur à créer.
     """
 
-    # Vérifier si l'utilisateur existe déjà en fonction de son email
-    existing_user = await get_user_by_email(user.email)
-    if existing_user:
-        # Si un utilisateur avec cet email existe déjà, lever une erreur HTTP 400
+    # Créer le nouvel utilisateur en passant les données au contrôleur
+    try:
+        new_user = await create_user(user.dict())  # Convertir l'objet Pydantic en dictionnaire avant de l'insérer
+    except DuplicateKeyError:
+        # Si un utilisateur avec cet email ou ce nom existe déjà, lever une erreur HTTP 400
         raise HTTPException(status_code=400, detail="User already exists")
 
-    # Si l'utilisateur n'existe pas, créer un nouvel utilisateur en passant les données au contrôleur
-    new_user = await create_user(user.dict())  # Convertir l'objet Pydantic en dictionnaire avant de l'insérer
-
     # Retourner les informations du nouvel utilisateur sans le mot de passe
     return {
         "id": str(new_user["_id"]),  # Convertir l'ObjectId en chaîne de caractères
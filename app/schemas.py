@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Union
 
 # Schéma pour la création d'un étudiant
 class StudentCreate(BaseModel):
@@ -52,6 +53,20 @@ class StudentResponse(BaseModel):
     class Config:
         from_attributes = True  # Permet d'utiliser des objets ORM avec ce modèle dans Pydantic v2
 
+# Schéma résumé d'un étudiant, utilisé dans les vues développées d'un projet
+class StudentSummary(BaseModel):
+    """
+    Ce schéma est utilisé pour les étudiants inclus dans un projet (`expand=students`).
+    - `id` : Identifiant unique de l'étudiant (ObjectId sous forme de chaîne).
+    - `name` : Le nom de l'étudiant.
+    - `course` : Le cours de l'étudiant.
+    - `branch` : La filière de l'étudiant.
+    """
+    id: str
+    name: str
+    course: Optional[str] = None
+    branch: Optional[str] = None
+
 # Schéma pour la création d'un projet
 class ProjectCreate(BaseModel):
     """
@@ -96,6 +111,111 @@ class ProjectResponse(BaseModel):
     class Config:
         from_attributes = True  # Permet d'utiliser des objets ORM avec ce modèle dans Pydantic v2
 
+# Schéma résumé d'un projet, utilisé dans les vues développées d'un étudiant
+class ProjectSummary(BaseModel):
+    """
+    Ce schéma est utilisé pour les projets inclus dans un étudiant (`expand=projects`).
+    - `id` : Identifiant unique du projet (ObjectId sous forme de chaîne).
+    - `name` : Le nom du projet.
+    - `head` : Le responsable du projet.
+    """
+    id: str
+    name: str
+    head: Optional[str] = None
+
+# Schéma pour la réponse développée d'un étudiant
+class StudentExpandedResponse(StudentResponse):
+    """
+    Ce schéma est utilisé lorsque l'étudiant est demandé avec `expand=projects`.
+    - `projects` : Les projets de l'étudiant (page demandée de la liste `project_ids`).
+    """
+    projects: List[ProjectSummary]
+
+# Schéma pour la réponse développée d'un projet
+class ProjectExpandedResponse(ProjectResponse):
+    """
+    Ce schéma est utilisé lorsque le projet est demandé avec `expand=students`.
+    - `students` : Les étudiants inscrits au projet (page demandée de la liste `student_ids`).
+    """
+    students: List[StudentSummary]
+
+# Schéma pour la réponse partielle d'un étudiant
+class StudentPartialResponse(BaseModel):
+    """
+    Ce schéma est utilisé lorsque l'étudiant est demandé avec `fields=...` : seuls `id` et les champs
+    demandés sont renvoyés (les autres sont absents de la réponse).
+    - `projects` : Présent uniquement avec `expand=projects`.
+    """
+    id: str
+    name: Optional[str]
+    email: Optional[EmailStr]
+    course: Optional[str]
+    branch: Optional[str]
+    project_ids: Optional[List[str]]
+    projects: Optional[List[ProjectSummary]]
+
+# Schéma pour la réponse partielle d'un projet
+class ProjectPartialResponse(BaseModel):
+    """
+    Ce schéma est utilisé lorsque le projet est demandé avec `fields=...` : seuls `id` et les champs
+    demandés sont renvoyés (les autres sont absents de la réponse).
+    - `students` : Présent uniquement avec `expand=students`.
+    """
+    id: str
+    name: Optional[str]
+    description: Optional[str]
+    head: Optional[str]
+    student_ids: Optional[List[str]]
+    students: Optional[List[StudentSummary]]
+
+# Schéma pour une page d'étudiants avec métadonnées de pagination
+class StudentPage(BaseModel):
+    """
+    Ce schéma est utilisé pour la liste des étudiants demandée avec `with_meta=true`.
+    - `items` : Les étudiants de la page.
+    - `total` : Le nombre total d'étudiants correspondant aux filtres (estimé ou mis en cache quelques secondes).
+    - `has_next` : Indique s'il existe une page suivante.
+    - `next_cursor` : Le curseur de la page suivante (`None` s'il n'y en a pas).
+    """
+    items: List[Union[StudentExpandedResponse, StudentResponse, StudentPartialResponse]]
+    total: int
+    has_next: bool
+    next_cursor: Optional[str]
+
+# Schéma pour une page de projets avec métadonnées de pagination
+class ProjectPage(BaseModel):
+    """
+    Ce schéma est utilisé pour la liste des projets demandée avec `with_meta=true`.
+    - `items` : Les projets de la page.
+    - `total` : Le nombre total de projets correspondant aux filtres (estimé ou mis en cache quelques secondes).
+    - `has_next` : Indique s'il existe une page suivante.
+    - `next_cursor` : Le curseur de la page suivante (`None` s'il n'y en a pas).
+    """
+    items: List[Union[ProjectExpandedResponse, ProjectResponse, ProjectPartialResponse]]
+    total: int
+    has_next: bool
+    next_cursor: Optional[str]
+
+# Schéma pour l'inscription groupée d'étudiants à un projet
+class EnrollmentRequest(BaseModel):
+    """
+    Ce schéma est utilisé pour inscrire plusieurs étudiants à un projet en une seule requête.
+    - `student_ids` : La liste des identifiants des étudiants à inscrire.
+    """
+    student_ids: List[str]
+
+# Schéma pour la réponse d'une inscription
+class EnrollmentResponse(BaseModel):
+    """
+    Ce schéma est utilisé pour la réponse d'une inscription à un projet.
+    - `project_id` : Identifiant du projet.
+    - `enrolled` : Les étudiants inscrits (ou déjà inscrits) au projet.
+    - `missing` : Les identifiants d'étudiants introuvables, ignorés.
+    """
+    project_id: str
+    enrolled: List[str]
+    missing: List[str]
+
 # Schéma pour la création d'un utilisateur
 class UserCreate(BaseModel):
     """
@@ -126,3 +246,70 @@ class UserResponse(BaseModel):
 
     class Config:
         from_attributes = True  # Permet d'utiliser des objets ORM avec ce modèle dans Pydantic v2
+
+# Schéma d'une erreur de ligne lors d'une importation groupée
+class BulkImportError(BaseModel):
+    """
+    Ce schéma décrit une ligne rejetée par une importation groupée.
+    - `index` : La position de la ligne dans le corps de la requête (à partir de 0).
+    - `errors` : Les erreurs de validation ou d'écriture de la ligne.
+    """
+    index: int
+    errors: List[dict]
+
+# Schéma pour la réponse d'une importation groupée
+class BulkImportResponse(BaseModel):
+    """
+    Ce schéma est utilisé pour la réponse de `POST /students/bulk` et `POST /projects/bulk`.
+    - `inserted` : Le nombre de documents insérés.
+    - `inserted_ids` : Les identifiants des documents insérés, dans l'ordre des lignes.
+    - `errors` : Les lignes rejetées ; les autres lignes sont insérées malgré ces erreurs.
+    """
+    inserted: int
+    inserted_ids: List[str]
+    errors: List[BulkImportError]
+
+# Schéma d'un compteur par valeur des statistiques
+class StatsGroup(BaseModel):
+    """
+    Ce schéma décrit le nombre de documents pour une valeur (un cours, une filière, une taille de projet).
+    - `value` : La valeur comptée.
+    - `count` : Le nombre de documents ayant cette valeur.
+    """
+    value: Optional[Union[int, str]]
+    count: int
+
+    class Config:
+        smart_union = True  # conserve le type de la valeur (0 reste un entier, "1" reste une chaîne)
+
+# Schéma pour les statistiques des étudiants
+class StudentStats(BaseModel):
+    """
+    Ce schéma est utilisé pour la réponse de `GET /stats/students`.
+    - `total` : Le nombre d'étudiants.
+    - `without_project` : Le nombre d'étudiants inscrits à aucun projet.
+    - `course` : Le nombre d'étudiants par cours (du plus grand au plus petit).
+    - `branch` : Le nombre d'étudiants par filière.
+    - `refreshed_at` : La date de la dernière reconstruction complète des compteurs.
+    - `stale` : Les compteurs modifiés par des inscriptions depuis `refreshed_at` (exacts après la reconstruction suivante).
+    """
+    total: int = 0
+    without_project: int = 0
+    course: List[StatsGroup] = []
+    branch: List[StatsGroup] = []
+    refreshed_at: Optional[datetime]
+    stale: List[str] = []
+
+# Schéma pour les statistiques des projets
+class ProjectStats(BaseModel):
+    """
+    Ce schéma est utilisé pour la réponse de `GET /stats/projects`.
+    - `total` : Le nombre de projets.
+    - `size` : Le nombre de projets par nombre d'étudiants inscrits (`value`).
+    - `refreshed_at` : La date de la dernière reconstruction complète des compteurs.
+    - `stale` : Les compteurs modifiés par des inscriptions depuis `refreshed_at` (exacts après la reconstruction suivante).
+    """
+    total: int = 0
+    size: List[StatsGroup] = []
+    refreshed_at: Optional[datetime]
+    stale: List[str] = []
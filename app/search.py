@@ -0,0 +1,98 @@
+import re
+import unicodedata
+from pymongo import UpdateOne
+
+# Champ contenant la version normalisée du nom (minuscules, sans accents)
+NAME_FIELD = "name_normalized"
+
+# Modes de recherche disponibles sur le nom :
+# - "prefix" : recherche par préfixe ancrée sur le champ normalisé (utilise l'index)
+# - "text" : recherche par mots via l'index texte de MongoDB
+# - "contains" : recherche d'une sous-chaîne (ancien comportement, ne peut pas utiliser l'index efficacement)
+SEARCH_MODES = ("prefix", "text", "contains")
+
+# Collections dont le nom est indexé pour la recherche
+SEARCH_COLLECTIONS = ("students", "projects")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Cette fonction normalise un nom pour la recherche : passage en minuscules et suppression des accents.
+    Par exemple, "Élodie" devient "elodie".
+    """
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def build_name_filter(name: str, mode: str = "prefix") -> dict:
+    """
+    Cette fonction construit le filtre MongoDB correspondant à une recherche par nom.
+
+    - `name` : Le texte recherché, tel que saisi par l'utilisateur.
+    - `mode` : Le mode de recherche, parmi `SEARCH_MODES`.
+
+    La saisie est échappée avant d'être utilisée dans une expression régulière : elle ne peut donc
+    plus injecter de motif coûteux. Une `ValueError` est levée si le mode est inconnu.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError("Invalid search mode")
+
+    if mode == "text":
+        return {"$text": {"$search": name}}
+
+    pattern = re.escape(normalize_name(name))
+
+    # Une regex ancrée (^) et sensible à la casse sur le champ normalisé est résolue par un parcours d'index borné
+    if mode == "prefix":
+        return {NAME_FIELD: {"$regex": "^" + pattern}}
+
+    return {NAME_FIELD: {"$regex": pattern}}
+
+
+def with_normalized_name(data: dict) -> dict:
+    """
+    Cette fonction ajoute (ou met à jour) le champ normalisé à partir du champ `name`, s'il est présent.
+    Elle est appelée par les contrôleurs avant chaque écriture.
+    """
+    if data.get("name") is not None:
+        data[NAME_FIELD] = normalize_name(data["name"])
+    return data
+
+
+async def backfill_normalized_names(db, collection: str, batch_size: int = 500) -> int:
+    """
+    Cette fonction renseigne le champ normalisé sur les documents existants qui ne l'ont pas encore.
+
+    - `collection` : Le nom de la collection à traiter.
+    - `batch_size` : Le nombre de mises à jour envoyées par `bulk_write`.
+
+    Retourne le nombre de documents mis à jour.
+    """
+    updated = 0
+    operations = []
+
+    # On ne lit que les documents à compléter, et uniquement les champs nécessaires
+    cursor = db[collection].find({NAME_FIELD: {"$exists": False}}, {"name": 1}).batch_size(batch_size)
+    async for document in cursor:
+        operations.append(
+            UpdateOne({"_id": document["_id"]}, {"$set": {NAME_FIELD: normalize_name(document.get("name", ""))}})
+        )
+        if len(operations) >= batch_size:
+            result = await db[collection].bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations = []
+
+    if operations:
+        result = await db[collection].bulk_write(operations, ordered=False)
+        updated += result.modified_count
+
+    return updated
+
+
+async def bootstrap_search(db):
+    """
+    Cette fonction prépare la recherche au démarrage de l'application : complétion du champ normalisé
+    sur les documents existants. Les index correspondants sont déclarés dans `app/indexes.py`.
+    """
+    for collection in SEARCH_COLLECTIONS:
+        await backfill_normalized_names(db, collection)
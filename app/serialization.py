@@ -0,0 +1,112 @@
+import os
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+# Classe de réponse par défaut de l'application : ORJSON si la bibliothèque `orjson` est installée
+# (sérialisation en C, plusieurs fois plus rapide que `json`), sinon la réponse JSON standard
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
+# Les routes de liste construisent elles-mêmes leur réponse (`list_response`) : FastAPI ne valide pas la liste
+# avec le `response_model` de la route, une union de tous les modes (`fields`, `expand`, `with_meta`) dont chaque
+# membre serait essayé à tour de rôle pour chaque ligne. Chaque ligne est validée avec le schéma concret de son
+# mode. Lorsque cette option est activée, cette validation est omise elle aussi : les dictionnaires sont déjà
+# construits par les fonctions ci-dessous, dans la forme exacte des schémas de réponse.
+SKIP_LIST_VALIDATION = os.getenv("SKIP_LIST_VALIDATION", "false").lower() in ("1", "true", "yes")
+
+
+# Conversion d'un étudiant MongoDB en réponse de l'API
+def student_to_response(student: dict, expanded: bool = False, fields: tuple = None) -> dict:
+    """
+    Cette fonction convertit un document étudiant en dictionnaire conforme à `StudentResponse`
+    (ou `StudentExpandedResponse` si `expanded` est vrai).
+    Si `fields` est fourni (voir `app/fields.py`), seuls `id` et ces champs sont renvoyés (`StudentPartialResponse`).
+    """
+    item = {
+        "id": str(student["_id"]),  # Convertir l'ObjectId en chaîne de caractères
+        "name": student.get("name", ""),
+        "email": student.get("email", ""),
+        "course": student.get("course", ""),
+        "branch": student.get("branch", ""),
+        # Convertir les ObjectId de 'project_ids' en chaînes
+        "project_ids": [str(pid) for pid in student.get("project_ids", []) if isinstance(pid, ObjectId)],
+    }
+    if fields is not None:
+        item = {"id": item["id"], **{field: item[field] for field in fields}}
+    if expanded:
+        item["projects"] = [project_summary(project) for project in student.get("projects", [])]
+    return item
+
+
+# Conversion d'un projet MongoDB en réponse de l'API
+def project_to_response(project: dict, expanded: bool = False, fields: tuple = None) -> dict:
+    """
+    Cette fonction convertit un document projet en dictionnaire conforme à `ProjectResponse`
+    (ou `ProjectExpandedResponse` si `expanded` est vrai).
+    Si `fields` est fourni (voir `app/fields.py`), seuls `id` et ces champs sont renvoyés (`ProjectPartialResponse`).
+    """
+    item = {
+        "id": str(project["_id"]),  # Convertir l'ObjectId en chaîne de caractères
+        "name": project.get("name", ""),
+        "description": project.get("description", ""),
+        "head": project.get("head", ""),
+        # Convertir les IDs des étudiants en chaînes
+        "student_ids": [str(student_id) for student_id in project.get("student_ids", [])],
+    }
+    if fields is not None:
+        item = {"id": item["id"], **{field: item[field] for field in fields}}
+    if expanded:
+        item["students"] = [student_summary(student) for student in project.get("students", [])]
+    return item
+
+
+def student_summary(student: dict) -> dict:
+    """
+    Convertit un étudiant joint par `$lookup` en résumé (`StudentSummary`).
+    """
+    return {
+        "id": str(student["_id"]),
+        "name": student.get("name", ""),
+        "course": student.get("course"),
+        "branch": student.get("branch"),
+    }
+
+
+def project_summary(project: dict) -> dict:
+    """
+    Convertit un projet joint par `$lookup` en résumé (`ProjectSummary`).
+    """
+    return {"id": str(project["_id"]), "name": project.get("name", ""), "head": project.get("head")}
+
+
+def item_model(fields: tuple, expanded: bool, full, expanded_model, partial):
+    """
+    Cette fonction choisit le schéma concret des lignes d'une liste selon le mode demandé :
+    `partial` avec `fields`, `expanded_model` avec `expand`, sinon `full`.
+    """
+    if fields is not None:
+        return partial
+    return expanded_model if expanded else full
+
+
+def list_response(items, response, model):
+    """
+    Cette fonction renvoie le résultat d'une route de liste.
+
+    - `items` : Les dictionnaires construits par `student_to_response` / `project_to_response`, ou la page
+      `{items, total, has_next, next_cursor}` avec `with_meta`.
+    - `response` : La réponse injectée par FastAPI, qui porte les en-têtes déjà positionnés (`X-Next-Cursor`...).
+    - `model` : Le schéma concret des lignes (voir `item_model`).
+
+    La réponse est construite directement avec `DefaultResponse` : FastAPI n'exécute ni la validation de l'union
+    `response_model` ni `jsonable_encoder` sur chaque ligne. Chaque ligne est validée par `model` (les champs
+    absents, par exemple avec `fields`, restent absents), sauf si `SKIP_LIST_VALIDATION` est activé.
+    """
+    if not SKIP_LIST_VALIDATION:
+        rows = items["items"] if isinstance(items, dict) else items
+        rows = [model.parse_obj(item).dict(exclude_unset=True) for item in rows]
+        items = dict(items, items=rows) if isinstance(items, dict) else rows
+    return DefaultResponse(content=items, headers=dict(response.headers))
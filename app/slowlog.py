@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from .cache import LRUCache
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+# Journal des opérations lentes
+# Chaque opération suivie (`track`) dont la durée dépasse `SLOW_QUERY_MS` est journalisée avec la collection,
+# la forme du filtre et de la modification (valeurs masquées), la pagination, la durée et un résumé de `explain`
+# (index utilisé, clés et documents examinés, documents renvoyés). `explain` est exécuté en tâche de fond,
+# après la réponse. Les contrôleurs suivent leurs lectures (listes, lectures par identifiant, `$lookup`,
+# comptages) comme leurs écritures.
+
+# Seuil de lenteur (en millisecondes) ; 0 désactive le journal
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+# Active ou désactive l'exécution de `explain` pour les opérations lentes
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+
+# Intervalle minimal entre deux `explain` d'une même forme de requête (en secondes) : lors d'un pic,
+# la même lecture lente n'est pas expliquée des centaines de fois
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", 60))
+
+# Formes de requête expliquées récemment
+_explained = LRUCache(max_entries=1000, ttl=SLOW_QUERY_EXPLAIN_INTERVAL)
+
+# Commandes acceptées par `explain` (une insertion n'a pas de plan) ; `explain` n'applique pas les écritures
+EXPLAINABLE_OPERATIONS = ("find", "aggregate", "count", "findAndModify", "update", "delete")
+
+# Arguments dont les valeurs sont masquées dans le journal : filtres, modifications et documents
+REDACTED_ARGUMENTS = ("filter", "query", "update", "updates", "deletes", "documents")
+
+# Journalisations en cours : une référence est conservée jusqu'à leur fin (sinon la tâche peut être détruite
+# avant d'avoir terminé)
+_reports = set()
+
+
+def redact(value):
+    """
+    Cette fonction remplace les valeurs d'un filtre par `?` en conservant sa forme (champs et opérateurs),
+    par exemple `{"name_normalized": {"$regex": "?"}}`. Une liste est réduite à son premier élément.
+    """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(value[0])] if value else []
+    return "?"
+
+
+def _redact_pipeline(pipeline: list) -> list:
+    """
+    Masque les valeurs des étapes `$match` d'une agrégation ; les autres étapes sont conservées.
+    """
+    return [{"$match": redact(stage["$match"])} if "$match" in stage else stage for stage in pipeline]
+
+
+def _shape(command: dict) -> dict:
+    """
+    Retourne la commande MongoDB avec ses valeurs de filtre et de modification masquées.
+    """
+    shape = dict(command)
+    for field in REDACTED_ARGUMENTS:
+        if field in shape:
+            shape[field] = redact(shape[field])
+    if "pipeline" in shape:
+        shape["pipeline"] = _redact_pipeline(shape["pipeline"])
+    return shape
+
+
+def _find_key(node, key: str):
+    """
+    Cherche récursivement la première valeur associée à `key` dans un résultat d'`explain`
+    (sa structure varie selon la commande et le moteur d'exécution).
+    """
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        node = list(node.values())
+    if isinstance(node, list):
+        for item in node:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+
+def _plan_stages(plan, stages: list, indexes: list):
+    """
+    Parcourt le plan gagnant et relève ses étapes (`IXSCAN`, `COLLSCAN`...) et les index utilisés.
+    """
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        if "indexName" in plan and plan["indexName"] not in indexes:
+            indexes.append(plan["indexName"])
+        plan = list(plan.values())
+    if isinstance(plan, list):
+        for item in plan:
+            _plan_stages(item, stages, indexes)
+
+
+def summarize_explain(explain: dict) -> dict:
+    """
+    Cette fonction résume le résultat d'un `explain` en mode `executionStats`.
+    """
+    stages, indexes = [], []
+    _plan_stages(_find_key(explain, "winningPlan"), stages, indexes)
+    stats = _find_key(explain, "executionStats") or {}
+    return {
+        "plan": ">".join(stages),
+        "indexes": indexes,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+    }
+
+
+async def _report(command: dict, duration: float):
+    """
+    Journalise une opération lente, avec le résumé de son `explain` si la forme n'a pas été expliquée récemment.
+    """
+    shape = json.dumps(_shape(command), default=str)
+    plan = None
+    if SLOW_QUERY_EXPLAIN and next(iter(command)) in EXPLAINABLE_OPERATIONS and _explained.get(shape) is None:
+        _explained.set(shape, True)
+        try:
+            plan = summarize_explain(await db.command({"explain": command, "verbosity": "executionStats"}))
+        except Exception as e:
+            plan = {"error": str(e)}
+    logger.warning("Slow query (%.1f ms): %s plan=%s", 1000 * duration, shape, json.dumps(plan))
+
+
+def _report_done(task: asyncio.Task):
+    """
+    Libère la référence d'une journalisation terminée et journalise son éventuelle erreur.
+    """
+    _reports.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Slow query report failed", exc_info=task.exception())
+
+
+@asynccontextmanager
+async def track(collection: str, operation: str, **arguments):
+    """
+    Ce gestionnaire de contexte mesure une opération et la journalise si elle dépasse `SLOW_QUERY_MS`.
+
+    - `collection` : Le nom de la collection.
+    - `operation` : La commande MongoDB équivalente (`find`, `aggregate`, `count`, `insert`, `findAndModify`
+      ou `update`).
+    - `arguments` : Les arguments de la commande (`filter`, `sort`, `skip`, `limit`, `pipeline`, `query`,
+      `update`, `updates`...), utilisés pour le journal et pour `explain`.
+
+    Exemple : `async with track("students", "find", filter=query, skip=skip, limit=limit): ...`
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        if SLOW_QUERY_MS > 0 and 1000 * duration >= SLOW_QUERY_MS:
+            command = {operation: collection, **arguments}
+            if operation == "aggregate":
+                command.setdefault("cursor", {})
+            task = asyncio.ensure_future(_report(command, duration))
+            _reports.add(task)
+            task.add_done_callback(_report_done)
@@ -0,0 +1,330 @@
+import asyncio
+import datetime
+import logging
+import os
+from pymongo import DeleteMany, UpdateOne
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+# Statistiques agrégées (`/stats`), lues dans une collection de synthèse
+# Chaque compteur est un petit document de la collection `stats`, par exemple
+# `{"_id": "students:course:Informatique", "collection": "students", "kind": "course", "value": "Informatique", "count": 42}`.
+# - Les créations, suppressions, importations et changements de cours ou de filière modifient les compteurs
+#   concernés. Les incréments sont cumulés en mémoire par le worker et écrits ensemble (un `bulk_write` de `$inc`)
+#   toutes les `STATS_FLUSH_SECONDS` secondes, avant chaque lecture de `/stats` et à l'arrêt : les routes
+#   d'écriture n'attendent aucun aller-retour supplémentaire. Les incréments d'un worker arrêté brutalement
+#   sont perdus jusqu'à la reconstruction suivante.
+# - Les inscriptions (étudiants sans projet, taille des projets) ne sont pas comptées au fil de l'eau : elles
+#   marquent ces compteurs comme périmés (`stale` dans la réponse) jusqu'à la reconstruction suivante.
+# - Une reconstruction périodique (`$facet` + `$group` sur les collections) corrige les écarts. Elle n'écrase pas
+#   les compteurs : elle leur ajoute (`$inc`) la différence entre l'agrégation et les valeurs lues juste avant,
+#   si bien qu'un incrément écrit pendant l'agrégation n'est pas perdu. Seuls les incréments d'écritures
+#   antérieures à l'agrégation, encore en attente dans un autre worker, sont comptés deux fois, jusqu'à la
+#   reconstruction suivante.
+# La lecture ne parcourt que les compteurs d'une collection (préfixe de `_id`, index `_id`) : elle ne dépend pas
+# du nombre d'étudiants ou de projets.
+
+# Nom de la collection de synthèse
+STATS_COLLECTION = "stats"
+
+# Intervalle entre deux reconstructions (en secondes) ; 0 désactive la reconstruction périodique
+STATS_REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", 300))
+
+# Intervalle d'écriture des incréments en attente (en secondes) ; 0 désactive l'écriture périodique
+# (les incréments sont alors écrits avant chaque lecture de `/stats`, chaque reconstruction et à l'arrêt)
+STATS_FLUSH_SECONDS = float(os.getenv("STATS_FLUSH_SECONDS", 1))
+
+# Compteurs calculés pour chaque collection
+STUDENTS_PIPELINE = [
+    {"$facet": {
+        "total": [{"$count": "count"}],
+        "without_project": [
+            {"$match": {"$or": [{"project_ids": {"$exists": False}}, {"project_ids": {"$size": 0}}]}},
+            {"$count": "count"},
+        ],
+        "course": [{"$group": {"_id": "$course", "count": {"$sum": 1}}}],
+        "branch": [{"$group": {"_id": "$branch", "count": {"$sum": 1}}}],
+    }},
+]
+PROJECTS_PIPELINE = [
+    {"$facet": {
+        "total": [{"$count": "count"}],
+        "size": [{"$group": {"_id": {"$size": {"$ifNull": ["$student_ids", []]}}, "count": {"$sum": 1}}}],
+    }},
+]
+PIPELINES = {"students": STUDENTS_PIPELINE, "projects": PROJECTS_PIPELINE}
+
+# Compteurs globaux de chaque collection (les autres compteurs ont un document par valeur)
+GLOBAL_KINDS = {"students": ("total", "without_project"), "projects": ("total",)}
+
+# Champs des documents dont dépendent les compteurs (projection des suppressions, détection des changements)
+COUNTED_FIELDS = {"students": ("course", "branch", "project_ids"), "projects": ("student_ids",)}
+
+# Compteurs modifiés par les inscriptions, qui ne sont exacts qu'après une reconstruction
+ENROLLMENT_KINDS = {"students": ("without_project",), "projects": ("size",)}
+
+# Incréments en attente de ce worker : identifiant du compteur -> [compteur, incrément]
+_pending = {}
+
+# Compteurs marqués périmés par ce worker depuis la dernière écriture : (collection, kind) -> date
+_stale = {}
+
+# Une écriture des incréments et une reconstruction ne s'exécutent pas en même temps dans un worker
+_lock = asyncio.Lock()
+
+
+def _counter(collection: str, kind: str, value=None) -> dict:
+    """
+    Construit le document d'un compteur (sans sa valeur).
+    """
+    if kind in GLOBAL_KINDS[collection]:
+        counter_id = "{}:{}".format(collection, kind)
+    else:
+        counter_id = "{}:{}:{}".format(collection, kind, value)
+    return {"_id": counter_id, "collection": collection, "kind": kind, "value": value}
+
+
+def _document_counters(collection: str, document: dict) -> list:
+    """
+    Renvoie les compteurs auxquels contribue un document.
+    """
+    counters = [_counter(collection, "total")]
+    if collection == "students":
+        counters.append(_counter(collection, "course", document.get("course")))
+        counters.append(_counter(collection, "branch", document.get("branch")))
+        if not document.get("project_ids"):
+            counters.append(_counter(collection, "without_project"))
+    else:
+        counters.append(_counter(collection, "size", len(document.get("student_ids") or [])))
+    return counters
+
+
+def record_documents(collection: str, documents: list, delta: int = 1):
+    """
+    Cette fonction met à jour les compteurs après l'insertion (`delta=1`) ou la suppression (`delta=-1`)
+    de documents. Les incréments sont cumulés en mémoire, sans accès à la base (voir `flush_stats`).
+
+    - `collection` : Le nom de la collection ("students" ou "projects").
+    - `documents` : Les documents insérés ou supprimés (seuls les champs de `COUNTED_FIELDS` sont nécessaires).
+    """
+    for document in documents:
+        for counter in _document_counters(collection, document):
+            _pending.setdefault(counter["_id"], [counter, 0])[1] += delta
+
+
+def record_change(collection: str, before: dict, after: dict):
+    """
+    Cette fonction met à jour les compteurs après la modification d'un document (changement de cours...) :
+    le document quitte les compteurs de `before` et rejoint ceux de `after`.
+    """
+    record_documents(collection, [before], delta=-1)
+    record_documents(collection, [after])
+
+
+def mark_stale(collection: str):
+    """
+    Cette fonction signale une inscription ou une désinscription : les compteurs `ENROLLMENT_KINDS` de la collection
+    sont marqués périmés jusqu'à la prochaine reconstruction (le marquage est écrit avec les incréments).
+    """
+    now = datetime.datetime.utcnow()
+    for kind in ENROLLMENT_KINDS[collection]:
+        _stale.setdefault((collection, kind), now)
+
+
+def _counter_fields(counter: dict) -> dict:
+    """
+    Champs d'un compteur créé par une écriture `upsert`.
+    """
+    return {"collection": counter["collection"], "kind": counter["kind"], "value": counter["value"]}
+
+
+async def _flush():
+    """
+    Écrit les incréments en attente et les marquages en un seul `bulk_write`.
+    Une erreur est journalisée sans être propagée : la prochaine reconstruction corrigera les compteurs.
+    """
+    pending, stale = list(_pending.values()), list(_stale.items())
+    _pending.clear()
+    _stale.clear()
+
+    operations = [
+        UpdateOne({"_id": counter["_id"]}, {"$inc": {"count": count}, "$setOnInsert": _counter_fields(counter)}, upsert=True)
+        for counter, count in pending if count
+    ]
+    # La date du marquage est conservée sur le compteur `total` de la collection (`$min` garde la plus ancienne)
+    for (collection, kind), since in stale:
+        counter = _counter(collection, "total")
+        operations.append(UpdateOne({"_id": counter["_id"]}, {
+            "$min": {"stale.{}".format(kind): since},
+            "$setOnInsert": dict(_counter_fields(counter), count=0),
+        }, upsert=True))
+    if not operations:
+        return
+    try:
+        await db[STATS_COLLECTION].bulk_write(operations, ordered=False)
+    except Exception:
+        logger.exception("Stats update failed")
+
+
+async def flush_stats():
+    """
+    Cette fonction écrit les incréments en attente de ce worker.
+    """
+    async with _lock:
+        await _flush()
+
+
+async def _aggregate(collection: str) -> dict:
+    """
+    Calcule les compteurs d'une collection avec une agrégation `$facet` (un seul parcours de la collection).
+    """
+    return (await db[collection].aggregate(PIPELINES[collection]).to_list(1))[0]
+
+
+async def refresh_stats(collection: str) -> datetime.datetime:
+    """
+    Cette fonction reconstruit les compteurs d'une collection avec une agrégation `$facet`
+    (un seul parcours de la collection), puis corrige ses compteurs dans la collection de synthèse.
+
+    Les valeurs actuelles sont lues avant l'agrégation, et chaque compteur reçoit `$inc` de l'écart entre les deux :
+    un incrément écrit entre la lecture et la correction est conservé, au lieu d'être écrasé.
+    Les compteurs devenus nuls (un cours qui n'a plus d'étudiants) sont supprimés, et les marquages périmés
+    antérieurs à la reconstruction sont retirés.
+    """
+    async with _lock:
+        await _flush()
+        started = datetime.datetime.utcnow()
+        current = {
+            counter["_id"]: counter.get("count", 0)
+            for counter in await db[STATS_COLLECTION].find(
+                {"_id": {"$regex": "^{}:".format(collection)}}, {"count": 1}
+            ).to_list(None)
+        }
+        results = await _aggregate(collection)
+        refreshed_at = datetime.datetime.utcnow()
+        await db[STATS_COLLECTION].bulk_write(
+            _reconcile(collection, results, current, started, refreshed_at), ordered=True
+        )
+    return refreshed_at
+
+
+def _reconcile(collection: str, results: dict, current: dict, started, refreshed_at) -> list:
+    """
+    Construit les écritures qui amènent les compteurs `current` aux valeurs de l'agrégation `results`.
+    """
+
+    counters = []
+    for kind, groups in results.items():
+        for group in groups:
+            # Les facettes `$count` n'ont pas de groupe ; les facettes `$group` en ont un par valeur
+            counter = _counter(collection, kind, group.get("_id"))
+            counters.append(dict(counter, count=group["count"]))
+    # Les compteurs globaux existent même à zéro (`$count` ne renvoie rien sur un ensemble vide)
+    for kind in GLOBAL_KINDS[collection]:
+        if not any(counter["kind"] == kind for counter in counters):
+            counters.append(dict(_counter(collection, kind), count=0))
+
+    operations = []
+    for counter in counters:
+        operations.append(UpdateOne({"_id": counter["_id"]}, {
+            "$inc": {"count": counter["count"] - current.pop(counter["_id"], 0)},
+            "$set": dict(_counter_fields(counter), refreshed_at=refreshed_at),
+        }, upsert=True))
+    # Compteurs absents de l'agrégation : ramenés à zéro, puis supprimés s'ils n'ont pas été incrémentés entre-temps
+    for counter_id, count in current.items():
+        if count:
+            operations.append(UpdateOne({"_id": counter_id}, {"$inc": {"count": -count}}))
+    operations.append(DeleteMany({"collection": collection, "count": 0, "kind": {"$nin": list(GLOBAL_KINDS[collection])}}))
+    total_id = _counter(collection, "total")["_id"]
+    for kind in ENROLLMENT_KINDS[collection]:
+        field = "stale.{}".format(kind)
+        operations.append(UpdateOne({"_id": total_id, field: {"$lte": started}}, {"$unset": {field: ""}}))
+    return operations
+
+
+async def get_stats(collection: str) -> dict:
+    """
+    Cette fonction lit les compteurs d'une collection dans la collection de synthèse, après avoir écrit
+    les incréments en attente de ce worker.
+    Retourne un dictionnaire `{kind: count}` pour les compteurs globaux et `{kind: [{value, count}]}`
+    pour les compteurs par valeur, la date de la dernière reconstruction et la liste des compteurs périmés
+    depuis (`stale`).
+    """
+    await flush_stats()
+    counters = await db[STATS_COLLECTION].find({"_id": {"$regex": "^{}:".format(collection)}}).to_list(None)
+
+    stats, stale = {"refreshed_at": None}, []
+    for counter in counters:
+        if counter.get("refreshed_at") and (stats["refreshed_at"] is None or counter["refreshed_at"] > stats["refreshed_at"]):
+            stats["refreshed_at"] = counter["refreshed_at"]
+        if counter.get("stale"):
+            stale = sorted(counter["stale"])
+        if counter["kind"] in GLOBAL_KINDS[collection]:
+            stats[counter["kind"]] = counter["count"]
+        elif counter["count"] > 0:
+            stats.setdefault(counter["kind"], []).append({"value": counter["value"], "count": counter["count"]})
+
+    for groups in stats.values():
+        if isinstance(groups, list):
+            groups.sort(key=lambda group: -group["count"])
+    stats["stale"] = stale
+    return stats
+
+
+async def _needs_refresh(collection: str) -> bool:
+    """
+    Indique si la dernière reconstruction date de plus de `STATS_REFRESH_SECONDS` secondes : lorsque plusieurs
+    workers tournent, seul le premier à se réveiller reconstruit les compteurs.
+    """
+    total = await db[STATS_COLLECTION].find_one({"_id": "{}:total".format(collection)}, {"refreshed_at": 1})
+    if total is None or total.get("refreshed_at") is None:
+        return True
+    age = datetime.datetime.utcnow() - total["refreshed_at"]
+    return age.total_seconds() >= STATS_REFRESH_SECONDS
+
+
+async def run_stats_refresh():
+    """
+    Reconstruit périodiquement les compteurs. Toute erreur est journalisée sans interrompre la boucle.
+    """
+    while True:
+        for collection in PIPELINES:
+            try:
+                if await _needs_refresh(collection):
+                    await refresh_stats(collection)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Stats refresh failed for %s", collection)
+        await asyncio.sleep(STATS_REFRESH_SECONDS)
+
+
+async def run_stats_flush():
+    """
+    Écrit périodiquement les incréments en attente.
+    """
+    while True:
+        await asyncio.sleep(STATS_FLUSH_SECONDS)
+        await flush_stats()
+
+
+def start_stats_flush():
+    """
+    Cette fonction lance l'écriture périodique des incréments en tâche de fond et renvoie la tâche.
+    Retourne `None` si l'écriture périodique est désactivée.
+    """
+    if STATS_FLUSH_SECONDS <= 0:
+        return None
+    return asyncio.create_task(run_stats_flush())
+
+
+def start_stats_refresh():
+    """
+    Cette fonction lance la reconstruction périodique en tâche de fond (au démarrage de l'application)
+    et renvoie la tâche, pour que l'appelant puisse l'annuler à l'arrêt.
+    Retourne `None` si la reconstruction périodique est désactivée.
+    """
+    if STATS_REFRESH_SECONDS <= 0:
+        return None
+    return asyncio.create_task(run_stats_refresh())
@@ -0,0 +1,118 @@
+import hashlib
+import heapq
+import os
+import threading
+import time
+from fastapi_jwt_auth import AuthJWT
+from .cache import LRUCache
+
+# Vérification des JWT mise en cache et liste des jetons révoqués
+# - La signature d'un jeton n'est vérifiée qu'une fois : les revendications vérifiées sont conservées, sous
+#   l'empreinte SHA-256 du jeton, jusqu'à son expiration (`exp`), au plus `JWT_CACHE_MAX_TTL_SECONDS`.
+# - Un jeton révoqué (`POST /auth/logout`) est ajouté à la liste des révocations par son identifiant (`jti`)
+#   jusqu'à son expiration ; la bibliothèque consulte cette liste à chaque vérification (lecture d'un dictionnaire),
+#   que les revendications viennent du cache ou non.
+# Le cache et la liste sont propres à chaque worker.
+
+# Nombre maximal de jetons vérifiés conservés
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", 10000))
+
+# Durée maximale de conservation d'un jeton vérifié (en secondes), même si son expiration est plus lointaine
+JWT_CACHE_MAX_TTL_SECONDS = float(os.getenv("JWT_CACHE_MAX_TTL_SECONDS", 300))
+
+# Durée de révocation d'un jeton sans date d'expiration (en secondes)
+JWT_DENYLIST_DEFAULT_TTL_SECONDS = float(os.getenv("JWT_DENYLIST_DEFAULT_TTL_SECONDS", 86400))
+
+# Revendications des jetons déjà vérifiés (un cache par worker)
+verified_tokens = LRUCache(max_entries=JWT_CACHE_MAX_ENTRIES, ttl=JWT_CACHE_MAX_TTL_SECONDS)
+
+
+def token_key(encoded_token: str, issuer: str = None) -> str:
+    """
+    Cette fonction construit la clé de cache d'un jeton : son empreinte SHA-256 (le jeton lui-même n'est pas conservé
+    comme clé) et l'émetteur attendu.
+    """
+    return "{}:{}".format(issuer or "", hashlib.sha256(encoded_token.encode()).hexdigest())
+
+
+# Dépendance d'authentification avec vérification mise en cache
+class CachedAuthJWT(AuthJWT):
+    """
+    Remplace `AuthJWT` dans les routes (`Authorize: AuthJWT = Depends(CachedAuthJWT)`) : le décodage et la
+    vérification de la signature sont évités pour un jeton déjà vérifié. Les contrôles qui suivent la vérification
+    (type de jeton, révocation) restent effectués à chaque requête par la bibliothèque.
+    """
+
+    def _verified_token(self, encoded_token: str, issuer: str = None) -> dict:
+        key = token_key(encoded_token, issuer)
+        claims = verified_tokens.get(key)
+        if claims is not None:
+            return claims
+
+        claims = super()._verified_token(encoded_token, issuer)
+
+        # Le jeton est conservé jusqu'à son expiration (les revendications sont partagées : ne pas les modifier)
+        ttl = JWT_CACHE_MAX_TTL_SECONDS
+        if "exp" in claims:
+            ttl = min(ttl, claims["exp"] - time.time())
+        if ttl > 0:
+            verified_tokens.set(key, claims, ttl)
+        return claims
+
+
+# Liste des jetons révoqués
+class TokenDenylist:
+    """
+    Identifiants (`jti`) des jetons révoqués, chacun jusqu'à l'expiration du jeton. La consultation est une lecture
+    de dictionnaire ; les entrées expirées sont retirées au fil des révocations, dans l'ordre de leur expiration (tas).
+    """
+
+    def __init__(self):
+        self._revoked = {}  # jti -> date d'expiration (horodatage Unix)
+        self._expirations = []  # tas de (date d'expiration, jti)
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, expires_at: float = None):
+        """
+        Révoque le jeton `jti` jusqu'à `expires_at` (par défaut `JWT_DENYLIST_DEFAULT_TTL_SECONDS` secondes).
+        """
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + JWT_DENYLIST_DEFAULT_TTL_SECONDS
+        with self._lock:
+            self._purge(now)
+            if expires_at > now:
+                self._revoked[jti] = expires_at
+                heapq.heappush(self._expirations, (expires_at, jti))
+
+    def is_revoked(self, jti: str) -> bool:
+        """
+        Indique si le jeton `jti` est révoqué.
+        """
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def _purge(self, now: float):
+        """
+        Retire les révocations des jetons déjà expirés (ils sont de toute façon refusés).
+        """
+        while self._expirations and self._expirations[0][0] <= now:
+            expires_at, jti = heapq.heappop(self._expirations)
+            if self._revoked.get(jti) == expires_at:
+                del self._revoked[jti]
+
+    def stats(self) -> dict:
+        """
+        Retourne le nombre de jetons révoqués conservés.
+        """
+        return {"revoked": len(self._revoked)}
+
+
+# Liste partagée par les routes de ce worker
+denylist = TokenDenylist()
+
+
+@AuthJWT.token_in_denylist_loader
+def check_if_token_in_denylist(decrypted_token: dict) -> bool:
+    # Appelée par la bibliothèque après chaque vérification de jeton (voir `authjwt_denylist_enabled`)
+    return denylist.is_revoked(decrypted_token["jti"])
@@ -0,0 +1,72 @@
+# Version des documents, ETag et requêtes conditionnelles
+# Chaque écriture d'un étudiant ou d'un projet incrémente le champ `_v` (`$inc`). L'ETag d'un document est
+# dérivé de son identifiant et de cette version : il se calcule sans sérialiser la réponse.
+# - `If-None-Match` sur un GET : si l'ETag n'a pas changé, la route répond 304 sans corps.
+# - `If-Match` sur un PUT/DELETE : l'écriture n'est appliquée que si la version n'a pas changé entre-temps
+#   (concurrence optimiste), sinon la route répond 412.
+# Les documents créés avant l'ajout du champ n'ont pas de `_v` : leur version vaut 0.
+
+# Nom du champ de version dans les documents MongoDB
+VERSION_FIELD = "_v"
+
+
+class VersionConflict(Exception):
+    """
+    Exception levée par les contrôleurs lorsque la version attendue (`If-Match`) ne correspond plus
+    à celle du document.
+    """
+
+
+def make_etag(document: dict) -> str:
+    """
+    Cette fonction construit l'ETag d'un document, par exemple `"65f0c...-3"`.
+    """
+    return '"{}-{}"'.format(document["_id"], document.get(VERSION_FIELD, 0))
+
+
+def _split_tags(header: str) -> list:
+    """
+    Découpe un en-tête `If-Match` / `If-None-Match` en ETags (le préfixe faible `W/` est ignoré).
+    """
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    Cette fonction indique si l'en-tête `If-None-Match` désigne l'ETag courant (ou `*`).
+    """
+    tags = _split_tags(header)
+    return "*" in tags or etag in tags
+
+
+def expected_version(header: str, document_id: str):
+    """
+    Cette fonction extrait de l'en-tête `If-Match` la version attendue du document `document_id`.
+
+    Retourne `None` si l'en-tête est absent ou vaut `*` (aucune condition sur la version).
+    Une `VersionConflict` est levée si aucun ETag de l'en-tête ne correspond à ce document.
+    """
+    if header is None:
+        return None
+    for tag in _split_tags(header):
+        if tag == "*":
+            return None
+        tagged_id, _, version = tag.strip('"').rpartition("-")
+        if tagged_id == document_id and version.isdigit():
+            return int(version)
+    raise VersionConflict()
+
+
+def version_filter(version: int) -> dict:
+    """
+    Cette fonction construit la condition MongoDB sur la version attendue.
+    La version 0 correspond aux documents sans champ `_v` (`None` couvre les champs absents).
+    """
+    return {VERSION_FIELD: version if version else None}
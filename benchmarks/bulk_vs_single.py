@@ -0,0 +1,89 @@
+"""
+Débit de création des étudiants : une requête par étudiant contre une importation en masse.
+
+Le script crée `--rows` étudiants de quatre façons et affiche le débit (lignes par seconde) :
+- `single` : un `POST /students/` par étudiant, l'un après l'autre (parcours d'intégration d'origine) ;
+- `single x N` : les mêmes requêtes, `--concurrency` à la fois ;
+- `bulk ndjson` : un seul `POST /students/bulk` en NDJSON ;
+- `bulk json` : un seul `POST /students/bulk` avec un tableau JSON.
+
+Exemple : `python benchmarks/bulk_vs_single.py --rows 2000`
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from common import api_client, auth_headers, print_table, use_mock_database
+
+
+def make_rows(count: int) -> list:
+    return [
+        {"name": "Student {}".format(i), "email": "student{}@example.com".format(i), "course": "Info", "branch": "A"}
+        for i in range(count)
+    ]
+
+
+async def single(client, headers, rows, concurrency: int = 1):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(row):
+        async with semaphore:
+            response = await client.post("/students/", headers=headers, json=row)
+            response.raise_for_status()
+
+    await asyncio.gather(*(create(row) for row in rows))
+
+
+async def bulk(client, headers, rows, ndjson: bool):
+    if ndjson:
+        body = "\n".join(json.dumps(row) for row in rows)
+        headers = dict(headers, **{"Content-Type": "application/x-ndjson"})
+    else:
+        body = json.dumps(rows)
+        headers = dict(headers, **{"Content-Type": "application/json"})
+    response = await client.post("/students/bulk", headers=headers, content=body)
+    response.raise_for_status()
+    assert response.json()["inserted"] == len(rows), response.json()
+
+
+async def measure(run, rows) -> float:
+    """
+    Exécute `run(client, headers, rows)` sur une base vide et renvoie la durée (en secondes).
+    """
+    use_mock_database()
+    headers = auth_headers()
+    async with api_client() as client:
+        started = time.perf_counter()
+        await run(client, headers, rows)
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="nombre d'étudiants créés")
+    parser.add_argument("--concurrency", type=int, default=16, help="requêtes simultanées du mode `single x N`")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    modes = [
+        ("single", lambda client, headers, rows: single(client, headers, rows)),
+        ("single x {}".format(args.concurrency), lambda client, headers, rows: single(client, headers, rows, args.concurrency)),
+        ("bulk ndjson", lambda client, headers, rows: bulk(client, headers, rows, ndjson=True)),
+        ("bulk json", lambda client, headers, rows: bulk(client, headers, rows, ndjson=False)),
+    ]
+    results = []
+    for name, run in modes:
+        duration = asyncio.run(measure(run, rows))
+        results.append((name, duration))
+
+    baseline = results[0][1]
+    print("Création de {} étudiants".format(args.rows))
+    print_table(["mode", "seconds", "rows/s", "speedup"], [
+        [name, "{:.2f}".format(duration), "{:.0f}".format(args.rows / duration), "{:.1f}x".format(baseline / duration)]
+        for name, duration in results
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import statistics
+import sys
+
+# Outils communs aux benchmarks
+# Les benchmarks s'exécutent depuis la racine du dépôt (`python benchmarks/login_storm.py`), sans serveur :
+# l'application est appelée en mémoire (`httpx.AsyncClient`) et MongoDB est remplacé par `mongomock-motor`.
+# Les chiffres mesurent donc le coût de l'application (boucle d'événements, validation, sérialisation),
+# pas celui du réseau ni du moteur de stockage.
+
+# Les benchmarks mesurent l'application seule : ni limitation du débit, ni reconstruction des statistiques,
+# ni journal des lectures lentes
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("STATS_REFRESH_SECONDS", "0")
+os.environ.setdefault("SLOW_QUERY_MS", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi_jwt_auth import AuthJWT
+from mongomock_motor import AsyncMongoMockClient
+
+import main
+from app import database
+
+
+def use_mock_database():
+    """
+    Remplace le client MongoDB partagé par un client en mémoire vide.
+    """
+    database.client = AsyncMongoMockClient()
+    return database.client
+
+
+def api_client() -> httpx.AsyncClient:
+    """
+    Client HTTP asynchrone qui appelle l'application en mémoire.
+    """
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+
+def auth_headers(subject: str = "bench") -> dict:
+    """
+    En-têtes d'un utilisateur authentifié.
+    """
+    return {"Authorization": "Bearer {}".format(AuthJWT().create_access_token(subject=subject))}
+
+
+def percentile(values: list, percent: float) -> float:
+    """
+    Retourne le centile `percent` (0-100) d'une liste de mesures.
+    """
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(percent) - 1]
+
+
+def print_table(headers: list, rows: list):
+    """
+    Affiche les résultats sous forme de tableau aligné.
+    """
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print("  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)))
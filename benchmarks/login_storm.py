@@ -0,0 +1,95 @@
+"""
+Latence des lectures pendant une rafale de connexions (`POST /auth/login`).
+
+Pendant que `--logins` connexions sont envoyées simultanément, `--readers` clients lisent `GET /students/`
+en boucle ; le script affiche les centiles p50/p99 de ces lectures pour trois configurations :
+- `inline` : bcrypt vérifié dans la boucle d'événements (comportement d'origine) ;
+- `unbounded` : bcrypt dans un pool de threads sans plafond utile (`--logins` threads) ;
+- `capped` : bcrypt dans le pool borné par `PASSWORD_HASH_CONCURRENCY` (comportement actuel).
+
+Exemple : `python benchmarks/login_storm.py --logins 50 --readers 8`
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import api_client, percentile, print_table, use_mock_database
+from passlib.hash import bcrypt
+
+from app.controllers import user_controller
+from app.routers import auth
+
+
+async def inline_verify(plain_password: str, hashed_password: str) -> bool:
+    # Vérification synchrone dans la boucle d'événements, comme avant le pool de threads
+    return user_controller.verify_password(plain_password, hashed_password)
+
+
+async def seed(rounds: int):
+    client = use_mock_database()
+    db = client[user_controller.db.name]
+    await db["users"].insert_one({"username": "storm", "hashed_password": bcrypt.using(rounds=rounds).hash("secret")})
+    await db["students"].insert_many([
+        {"name": "student {}".format(i), "email": "s{}@example.com".format(i), "course": "Info", "branch": "A"}
+        for i in range(50)
+    ])
+
+
+async def run(mode: str, args) -> list:
+    """
+    Lance la rafale de connexions et renvoie les latences des lectures (en millisecondes).
+    """
+    await seed(args.rounds)
+    if mode == "inline":
+        auth.verify_password_async = inline_verify
+    else:
+        auth.verify_password_async = user_controller.verify_password_async
+        workers = args.logins if mode == "unbounded" else user_controller.PASSWORD_HASH_CONCURRENCY
+        user_controller.password_executor = ThreadPoolExecutor(max_workers=workers)
+
+    latencies = []
+    storm_done = asyncio.Event()
+
+    async def reader(client):
+        while not storm_done.is_set():
+            started = time.perf_counter()
+            response = await client.get("/students/", params={"size": 10})
+            latencies.append(1000 * (time.perf_counter() - started))
+            response.raise_for_status()
+            await asyncio.sleep(0.005)
+
+    async def login(client):
+        response = await client.post("/auth/login", json={"username": "storm", "password": "secret"})
+        response.raise_for_status()
+
+    async with api_client() as client:
+        readers = [asyncio.create_task(reader(client)) for _ in range(args.readers)]
+        await asyncio.sleep(0.05)
+        await asyncio.gather(*(login(client) for _ in range(args.logins)))
+        storm_done.set()
+        await asyncio.gather(*readers)
+
+    user_controller.password_executor.shutdown(wait=False)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50, help="connexions simultanées de la rafale")
+    parser.add_argument("--readers", type=int, default=8, help="clients qui lisent pendant la rafale")
+    parser.add_argument("--rounds", type=int, default=10, help="coût bcrypt du mot de passe de test")
+    args = parser.parse_args()
+
+    rows = []
+    for mode in ("inline", "unbounded", "capped"):
+        latencies = asyncio.run(run(mode, args))
+        rows.append([mode, len(latencies), "{:.1f}".format(percentile(latencies, 50)),
+                     "{:.1f}".format(percentile(latencies, 99)), "{:.1f}".format(max(latencies))])
+    print("Lectures GET /students/ pendant {} connexions (PASSWORD_HASH_CONCURRENCY={})".format(
+        args.logins, user_controller.PASSWORD_HASH_CONCURRENCY))
+    print_table(["mode", "reads", "p50 ms", "p99 ms", "max ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
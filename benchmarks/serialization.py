@@ -0,0 +1,127 @@
+"""
+Coût de sérialisation d'une page de liste, pour 1 000 lignes.
+
+Le script mesure, sur `--rows` documents étudiants (1 000 par défaut), la transformation des documents
+MongoDB en corps de réponse de `GET /students/` :
+- `before` : dictionnaires construits dans la route, validés par `response_model`, puis `json` standard
+  (chemin d'origine) ;
+- `union` : `student_to_response`, validation par l'union `response_model` de la route, puis `DefaultResponse`
+  (ORJSON) ;
+- `validated` : `list_response`, chemin par défaut : validation par le schéma concret du mode (`StudentResponse`),
+  puis `DefaultResponse` ;
+- `skip validation` : `list_response` avec `SKIP_LIST_VALIDATION=true`.
+
+La lecture MongoDB n'est pas comprise : seuls la conversion, la validation et l'encodage sont mesurés.
+
+Exemple : `python benchmarks/serialization.py --rows 1000 --repeat 50`
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bson import ObjectId
+from common import percentile, print_table
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+import main
+from app import serialization
+from app.schemas import StudentResponse
+from app.serialization import DefaultResponse, list_response, student_to_response
+
+
+def make_documents(count: int) -> list:
+    return [
+        {
+            "_id": ObjectId(), "name": "Student {}".format(i), "name_normalized": "student {}".format(i),
+            "email": "student{}@example.com".format(i), "course": "Informatique", "branch": "A", "_v": 1,
+            "project_ids": [ObjectId() for _ in range(i % 4)],
+        }
+        for i in range(count)
+    ]
+
+
+def list_route():
+    return next(route for route in main.app.routes
+                if getattr(route, "path", None) == "/students/" and "GET" in route.methods)
+
+
+async def validate(route, items):
+    # Même appel que FastAPI lorsqu'une route renvoie une liste de dictionnaires
+    return await serialize_response(field=route.secure_cloned_response_field, response_content=items,
+                                    exclude_unset=route.response_model_exclude_unset)
+
+
+async def before(route, documents):
+    items = [
+        {
+            "id": str(student["_id"]),
+            "name": student.get("name", ""),
+            "email": student.get("email", ""),
+            "course": student.get("course", ""),
+            "branch": student.get("branch", ""),
+            "project_ids": [str(pid) for pid in student.get("project_ids", []) if isinstance(pid, ObjectId)],
+        }
+        for student in documents
+    ]
+    return JSONResponse(content=await validate(route, items)).body
+
+
+async def union(route, documents):
+    items = [student_to_response(student) for student in documents]
+    return DefaultResponse(content=await validate(route, items)).body
+
+
+class InjectedResponse:
+    # En-têtes de la réponse injectée par FastAPI (aucun ici)
+    headers = {}
+
+
+async def validated(route, documents):
+    items = [student_to_response(student) for student in documents]
+    return list_response(items, InjectedResponse(), StudentResponse).body
+
+
+async def skip_validation(route, documents):
+    serialization.SKIP_LIST_VALIDATION = True
+    try:
+        return await validated(route, documents)
+    finally:
+        serialization.SKIP_LIST_VALIDATION = False
+
+
+async def measure(serialize, route, documents, repeat: int) -> list:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await serialize(route, documents)
+        durations.append(1000 * (time.perf_counter() - started))
+    return durations
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="nombre de lignes par page")
+    parser.add_argument("--repeat", type=int, default=50, help="nombre de mesures par mode")
+    args = parser.parse_args()
+
+    route = list_route()
+    documents = make_documents(args.rows)
+    modes = [("before", before), ("union", union), ("validated", validated), ("skip validation", skip_validation)]
+
+    rows = []
+    baseline = None
+    for name, serialize in modes:
+        durations = asyncio.run(measure(serialize, route, documents, args.repeat))
+        per_thousand = statistics.median(durations) * 1000 / args.rows
+        baseline = baseline or per_thousand
+        rows.append([name, "{:.2f}".format(per_thousand), "{:.2f}".format(percentile(durations, 99) * 1000 / args.rows),
+                     "{:.1f}x".format(baseline / per_thousand)])
+    print("Sérialisation de {} lignes, {} mesures par mode (DefaultResponse = {})".format(
+        args.rows, args.repeat, DefaultResponse.__name__))
+    print_table(["mode", "median ms/1000", "p99 ms/1000", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    run()
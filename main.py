@@ -1,10 +1,65 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi_jwt_auth.exceptions import AuthJWTException
 from app.routers import students, projects
-from app.database import db
+from app.database import db, connect, close
 from app.routers import students, projects, auth  # Importer le routeur d'authentification
+from app.routers import events, internal, stats
+from app.search import bootstrap_search
+from app.indexes import manage_indexes
+from app.serialization import DefaultResponse
+from app.events import change_feed, install_shutdown_handlers
+from app.metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from app.health import check_readiness
+from app.profiling import DEBUG_TIMING_ENABLED, ProfilingMiddleware
+from app.ratelimit import RATE_LIMIT_ENABLED, AdmissionMiddleware
+from app.stats import flush_stats, start_stats_flush, start_stats_refresh
+
+
+# Cycle de vie de l'application (démarrage / arrêt)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Au démarrage :
+    - le client MongoDB est créé avec les réglages du pool (voir `app/database.py`) ;
+    - les index déclarés dans `app/indexes.py` sont appliqués (ou seulement vérifiés si `INDEX_MODE=check`) ;
+      le démarrage échoue si les index uniques des utilisateurs sont absents, quel que soit le mode ;
+    - le champ de nom normalisé utilisé par la recherche est complété sur les documents existants ;
+    - la surveillance des changements (change stream partagé par les clients de `/events`) est lancée, et les
+      flux `/events` seront fermés dès la réception de SIGTERM/SIGINT : uvicorn attend la fin des connexions
+      ouvertes avant d'exécuter l'arrêt ci-dessous, ce qu'un flux SSE ne ferait jamais de lui-même ;
+    - l'écriture périodique des incréments et la reconstruction périodique des compteurs de `/stats` sont lancées.
+    À l'arrêt, la surveillance des changements et les tâches de fond sont annulées, les incréments de `/stats`
+    encore en attente sont écrits, puis le client est fermé et les connexions du pool sont libérées.
+    """
+    connect()
+    index_check = await manage_indexes(db)
+    await bootstrap_search(db)
+    change_feed.start()
+    install_shutdown_handlers(change_feed)
+    stats_flush = start_stats_flush()
+    stats_refresh = start_stats_refresh()
+
+    yield
+
+    await change_feed.stop()
+    if stats_refresh is not None:
+        stats_refresh.cancel()
+    if stats_flush is not None:
+        stats_flush.cancel()
+    await flush_stats()
+
+    # À l'arrêt, on abandonne une éventuelle vérification des index encore en cours
+    if index_check is not None:
+        index_check.cancel()
+    close()
+
 
 # Création de l'instance FastAPI
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=DefaultResponse,  # ORJSON si disponible (voir app/serialization.py)
     title="API Etude Project",
     description="API pour gérer les étudiants et projets.",
     version="1.0.0",
@@ -14,6 +69,26 @@ app = FastAPI(
     },
 )
 
+# Contrôle d'admission et limitation du débit par client (voir app/ratelimit.py)
+# Ajouté en premier, il s'exécute après les middlewares de mesure : les réponses 429 et 503 sont aussi mesurées.
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+# Mesure de la durée des requêtes par route et par code de statut (voir app/metrics.py)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# En-tête `Server-Timing` (temps MongoDB / temps applicatif) pour les requêtes portant `X-Debug-Timing`
+# Désactivé par défaut (`DEBUG_TIMING_ENABLED=true` pour l'activer) : il est accessible à tout client
+if DEBUG_TIMING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+
+# Erreurs d'authentification (jeton absent, invalide, expiré ou révoqué) : réponse avec le code de la bibliothèque
+@app.exception_handler(AuthJWTException)
+async def authjwt_exception_handler(request, exc: AuthJWTException):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.message})
+
 
 # Inclure les routes
 # Inclure les routeurs pour les différentes sections de l'API
@@ -33,6 +108,21 @@ app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 # Ce routeur gère les routes liées à l'authentification (connexion, déconnexion, gestion des tokens JWT).
 # Le préfixe "/auth" est appliqué à toutes les routes de ce routeur, et un tag "Auth" est utilisé pour la documentation.
 
+app.include_router(events.router, prefix="/events", tags=["Events"])
+
+# Ce routeur diffuse en direct les changements des étudiants et des projets (Server-Sent Events).
+
+app.include_router(stats.router, prefix="/stats", tags=["Stats"])
+
+# Ce routeur retourne les statistiques agrégées (étudiants par cours et filière, taille des projets),
+# lues dans une collection de synthèse tenue à jour par les écritures et reconstruite périodiquement.
+
+if internal.INTERNAL_ENDPOINTS_ENABLED:
+    app.include_router(internal.router, prefix="/internal", tags=["Internal"])
+
+# Ce routeur expose l'état interne du worker (pool, cache, jetons, admission) : il n'est monté que si
+# `INTERNAL_ENDPOINTS_ENABLED` est activé (voir app/routers/internal.py).
+
 # Route de base
 @app.get("/")
 async def root():
@@ -42,19 +132,49 @@ async def root():
     """
     return {"message": "Bienvenue sur la plate-forme Etude & Projet"}
 
+# Route d'exposition des métriques au format Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Cette route retourne les métriques de ce worker au format texte de Prometheus :
+    durée des requêtes HTTP par route et statut, requêtes en cours, durée des commandes MongoDB,
+    temps d'attente et connexions du pool.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Sonde de vie
+@app.get("/healthz")
+async def healthz():
+    """
+    Cette route indique que le processus répond. Elle n'effectue aucune entrée/sortie :
+    l'orchestrateur peut l'appeler aussi souvent qu'il le souhaite.
+    """
+    return {"status": "ok"}
+
+# Sonde de disponibilité
+@app.get("/readyz")
+async def readyz():
+    """
+    Cette route indique si ce worker peut recevoir du trafic : MongoDB répond à un `ping`
+    (mis en cache quelques secondes, borné par un délai) et le pool de connexions n'est pas saturé.
+    Elle retourne 200 si le worker est disponible, 503 sinon (voir `app/health.py`).
+    """
+    readiness = await check_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
 # Route de test pour vérifier la connexion MongoDB
 @app.get("/test-mongo")
 async def test_mongo():
     """
     Cette route permet de tester la connexion avec MongoDB.
-    Elle compte le nombre de documents dans la collection 'students' pour vérifier si la base de données est bien connectée.
-    En cas de succès, elle retourne un message confirmant la connexion et le nombre d'étudiants dans la base de données.
+    Le nombre d'étudiants est lu dans les métadonnées de la collection (`estimated_document_count`),
+    sans parcourir la collection. Pour les sondes de l'orchestrateur, utiliser `/healthz` et `/readyz`.
     En cas d'échec (par exemple, si MongoDB n'est pas accessible), elle retourne une erreur.
     """
     try:
-        # Tester la connexion à MongoDB en comptant les documents dans la collection 'students'
+        # Tester la connexion à MongoDB en lisant le nombre estimé de documents de la collection 'students'
 
-        students_count = await db["students"].count_documents({})
+        students_count = await db["students"].estimated_document_count()
         return {"message": "MongoDB is connected", "students_count": students_count}
     except Exception as e:
 
@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+# Les tests s'exécutent sans serveur MongoDB (client `mongomock-motor`) et sans limitation du débit
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("STATS_REFRESH_SECONDS", "0")
+
+import mongomock.aggregate
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from fastapi_jwt_auth import AuthJWT
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import OperationFailure
+
+import main
+from app import database, stats
+from app.controllers.enrollment_controller import ILLEGAL_OPERATION
+from app.cache import cache
+from app.counting import count_cache
+from app.tokens import verified_tokens
+
+
+# `mongomock` ne sait pas évaluer `$convert` : on ajoute la conversion vers `objectId` utilisée par `app/expand.py`
+_handle_type_convertion_operator = mongomock.aggregate._Parser._handle_type_convertion_operator
+
+
+def _convert_to_object_id(parser, operator, values):
+    if operator != "$convert" or values.get("to") != "objectId":
+        return _handle_type_convertion_operator(parser, operator, values)
+    value = parser.parse(values["input"])
+    if value is None:
+        return parser.parse(values["onNull"]) if "onNull" in values else None
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return parser.parse(values["onError"]) if "onError" in values else None
+
+
+mongomock.aggregate._Parser._handle_type_convertion_operator = _convert_to_object_id
+
+
+class StandaloneSession:
+    """
+    Session d'un serveur autonome : les transactions sont refusées (`mongomock` n'a pas de sessions).
+    """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def with_transaction(self, callback):
+        raise OperationFailure("Transaction numbers are only allowed on a replica set member or mongos",
+                               code=ILLEGAL_OPERATION)
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """
+    Remplace le client MongoDB partagé par un client en mémoire, vide pour chaque test.
+    Le client se comporte comme un serveur autonome (sans transactions).
+    """
+    client = AsyncMongoMockClient()
+
+    async def start_session():
+        return StandaloneSession()
+
+    client.start_session = start_session
+    monkeypatch.setattr(database, "client", client)
+    asyncio.run(cache.clear())
+    count_cache.clear()
+    verified_tokens.clear()
+    stats._pending.clear()
+    stats._stale.clear()
+    return client
+
+
+@pytest.fixture
+def api(mongo):
+    """
+    Client HTTP de l'application (le cycle de vie n'est pas exécuté : pas de tâches de fond).
+    """
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def auth_headers():
+    """
+    En-têtes d'un utilisateur authentifié.
+    """
+    token = AuthJWT().create_access_token(subject="tester")
+    return {"Authorization": "Bearer {}".format(token)}
@@ -0,0 +1,96 @@
+import asyncio
+
+from app.cache import MemoryCacheBackend, NullCacheBackend
+
+
+def test_set_is_skipped_when_key_was_invalidated_during_read():
+    async def scenario():
+        cache = MemoryCacheBackend(max_entries=10, ttl=60)
+        generation = await cache.generation("students:1")
+        # Une écriture invalide la clé pendant la lecture
+        await cache.delete("students:1")
+        await cache.set("students:1", {"name": "stale"}, generation)
+        assert await cache.get("students:1") is None
+
+        generation = await cache.generation("students:1")
+        await cache.set("students:1", {"name": "fresh"}, generation)
+        assert await cache.get("students:1") == {"name": "fresh"}
+
+    asyncio.run(scenario())
+
+
+def test_forgotten_generations_never_allow_a_stale_set():
+    async def scenario():
+        cache = MemoryCacheBackend(max_entries=2, ttl=60)
+        generation = await cache.generation("students:1")
+        await cache.delete("students:1")
+        # Les invalidations suivantes font oublier celle de `students:1`
+        for key in ("students:2", "students:3", "students:4"):
+            await cache.delete(key)
+        await cache.set("students:1", {"name": "stale"}, generation)
+        assert await cache.get("students:1") is None
+
+    asyncio.run(scenario())
+
+
+def test_null_backend_accepts_generations():
+    async def scenario():
+        cache = NullCacheBackend()
+        await cache.set("students:1", {}, await cache.generation("students:1"))
+        assert await cache.get("students:1") is None
+
+    asyncio.run(scenario())
+
+
+def test_read_racing_an_update_does_not_cache_the_old_document(api, auth_headers, monkeypatch):
+    from app.controllers import student_controller
+
+    created = api.post("/students/", headers=auth_headers,
+                       json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"}).json()
+    student_id = created["id"]
+
+    # La lecture par identifiant renvoie le document d'avant la modification, qui se termine pendant la lecture
+    original_do = student_controller.single_flight.do
+
+    async def slow_read(key, fn):
+        document = await original_do(key, fn)
+        if key.startswith("students:"):
+            await student_controller.update_student(student_id, {"course": "Maths"})
+        return document
+
+    with monkeypatch.context() as patch:
+        patch.setattr(student_controller.single_flight, "do", slow_read)
+        assert api.get("/students/{}".format(student_id)).json()["course"] == "Info"
+
+    assert api.get("/students/{}".format(student_id)).json()["course"] == "Maths"
+
+
+def test_batch_read_racing_an_update_does_not_cache_the_old_document(api, auth_headers, monkeypatch):
+    from app import batch, database
+    from app.controllers import student_controller
+
+    created = api.post("/students/", headers=auth_headers,
+                       json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"}).json()
+    student_id = created["id"]
+
+    # La requête `$in` renvoie le document d'avant la modification, qui se termine pendant la lecture
+    class RacingCollection:
+        def __init__(self, collection):
+            self.collection = collection
+
+        async def find(self, query, projection=None):
+            documents = await self.collection.find(query, projection).to_list(None)
+            await student_controller.update_student(student_id, {"course": "Maths"})
+            for document in documents:
+                yield document
+
+    class RacingDatabase:
+        def __getitem__(self, name):
+            return RacingCollection(database.db[name])
+
+    with monkeypatch.context() as patch:
+        patch.setattr(batch, "db", RacingDatabase())
+        assert api.get("/students/", params={"ids": student_id}).json()[0]["course"] == "Info"
+
+    assert api.get("/students/", params={"ids": student_id}).json()[0]["course"] == "Maths"
+    assert api.get("/students/{}".format(student_id)).json()["course"] == "Maths"
@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+
+import main
+from app import database
+from app.coalescing import SingleFlight, query_key
+from app.controllers import student_controller
+
+
+class SlowCursor:
+    """
+    Curseur dont la lecture dure assez longtemps pour que les requêtes simultanées se recouvrent.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, name):
+        method = getattr(self.cursor, name)
+        return lambda *args, **kwargs: SlowCursor(method(*args, **kwargs))
+
+    async def to_list(self, length):
+        await asyncio.sleep(0.05)
+        return await self.cursor.to_list(length)
+
+
+class CountingCollection:
+    def __init__(self, collection, reads):
+        self.collection = collection
+        self.reads = reads
+
+    def find(self, *args, **kwargs):
+        self.reads.append("find")
+        return SlowCursor(self.collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        self.reads.append("find_one")
+        await asyncio.sleep(0.05)
+        return await self.collection.find_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+class CountingDatabase:
+    def __init__(self):
+        self.reads = []
+
+    def __getitem__(self, name):
+        return CountingCollection(database.db[name], self.reads)
+
+
+def _concurrent_gets(path: str, count: int, params: dict = None) -> list:
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get(path, params=params) for _ in range(count)))
+
+    return asyncio.run(run())
+
+
+def test_identical_list_reads_hit_the_database_once(api, auth_headers, monkeypatch):
+    api.post("/students/", headers=auth_headers,
+             json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"})
+    counting = CountingDatabase()
+    monkeypatch.setattr(student_controller, "db", counting)
+    before = student_controller.single_flight.stats()
+
+    responses = _concurrent_gets("/students/", 5, {"size": 10})
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.text for response in responses}) == 1
+    assert counting.reads == ["find"]
+
+    after = student_controller.single_flight.stats()
+    assert after["calls"] - before["calls"] == 5
+    assert after["executed"] - before["executed"] == 1
+    assert after["deduplicated"] - before["deduplicated"] == 4
+    assert after["in_flight"] == 0
+
+
+def test_identical_reads_by_id_hit_the_database_once(api, auth_headers, monkeypatch):
+    student_id = api.post("/students/", headers=auth_headers,
+                          json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"}).json()["id"]
+    counting = CountingDatabase()
+    monkeypatch.setattr(student_controller, "db", counting)
+
+    responses = _concurrent_gets("/students/{}".format(student_id), 5)
+    assert [response.json()["name"] for response in responses] == ["Ada"] * 5
+    assert counting.reads == ["find_one"]
+
+
+def test_different_reads_are_not_merged(api, monkeypatch):
+    counting = CountingDatabase()
+    monkeypatch.setattr(student_controller, "db", counting)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await asyncio.gather(client.get("/students/", params={"size": 10}), client.get("/students/", params={"size": 20}))
+
+    asyncio.run(run())
+    assert counting.reads == ["find", "find"]
+
+
+def test_failed_read_is_shared_then_forgotten():
+    async def scenario():
+        flight = SingleFlight()
+        started = []
+
+        async def failing():
+            started.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+        assert [str(result) for result in results] == ["boom", "boom"]
+        assert started == [1]
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_query_key_ignores_dictionary_order():
+    assert query_key("students", "find", {"a": 1, "b": 2}, size=10) == query_key("students", "find", {"b": 2, "a": 1}, size=10)
+    assert query_key("students", "find", {"a": 1}, size=10) != query_key("students", "find", {"a": 1}, size=20)
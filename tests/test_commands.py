@@ -0,0 +1,149 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock.collection import Collection as MongoMockCollection
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app import database
+from app.indexes import INDEXES, ensure_required_indexes, manage_indexes
+from app.routers import user
+
+# Nombre de commandes MongoDB envoyées par requête
+# Avec `MONGO_TEST_URL`, les commandes sont observées sur un vrai serveur par un `CommandListener` pymongo
+# (base `test_commands`, supprimée à la fin). Sinon, le client en mémoire n'émettant pas d'événements,
+# les méthodes de collection de `mongomock` alimentent le même listener (une méthode = une commande).
+
+MONGO_TEST_URL = os.getenv("MONGO_TEST_URL")
+
+# Méthodes de collection de `mongomock` et commande MongoDB correspondante
+MOCK_COMMANDS = {
+    "insert_one": "insert", "insert_many": "insert", "find": "find", "find_one": "find",
+    "find_one_and_update": "findAndModify", "find_one_and_delete": "findAndModify",
+    "find_one_and_replace": "findAndModify", "update_one": "update", "update_many": "update",
+    "delete_one": "delete", "delete_many": "delete", "aggregate": "aggregate",
+    "count_documents": "aggregate", "bulk_write": "bulkWrite", "create_indexes": "createIndexes",
+    "index_information": "listIndexes",
+}
+
+# Commandes du driver qui ne correspondent pas à une opération de l'application
+IGNORED_COMMANDS = {"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Enregistre les commandes envoyées à MongoDB : `(commande, collection)`.
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            self.commands.append((event.command_name, event.command.get(event.command_name)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def on(self, collection: str) -> list:
+        return [name for name, target in self.commands if target == collection]
+
+
+def _count_mock_commands(monkeypatch, counter: CommandCounter):
+    """
+    Fait émettre un événement par appel de méthode de collection `mongomock` (les appels imbriqués,
+    par exemple `find` dans `find_one`, ne sont pas comptés).
+    """
+    depth = [0]
+
+    def counted(method, command_name):
+        def wrapper(self, *args, **kwargs):
+            if depth[0] == 0:
+                counter.started(SimpleNamespace(command_name=command_name, command={command_name: self.name}))
+            depth[0] += 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                depth[0] -= 1
+        return wrapper
+
+    for method_name, command_name in MOCK_COMMANDS.items():
+        monkeypatch.setattr(MongoMockCollection, method_name,
+                            counted(getattr(MongoMockCollection, method_name), command_name))
+
+
+@pytest.fixture
+def commands(monkeypatch, mongo):
+    counter = CommandCounter()
+    if MONGO_TEST_URL:
+        client = AsyncIOMotorClient(MONGO_TEST_URL, event_listeners=[counter])
+        monkeypatch.setattr(database, "client", client)
+        monkeypatch.setattr(database, "DB_NAME", "test_commands")
+        asyncio.run(client.drop_database("test_commands"))
+        asyncio.run(manage_indexes(database.db, "apply"))
+        counter.commands.clear()
+        yield counter
+        asyncio.run(client.drop_database("test_commands"))
+        client.close()
+    else:
+        asyncio.run(manage_indexes(database.db, "apply"))
+        _count_mock_commands(monkeypatch, counter)
+        yield counter
+
+
+def test_create_update_and_delete_student_use_one_command_each(api, auth_headers, commands):
+    response = api.post("/students/", headers=auth_headers,
+                        json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"})
+    assert response.status_code == 200
+    # Les compteurs de `/stats` sont mis à jour en mémoire : aucune autre commande, même sur `stats`
+    assert commands.commands == [("insert", "students")]
+
+    commands.commands.clear()
+    response = api.put("/students/{}".format(response.json()["id"]), headers=auth_headers, json={"course": "Maths"})
+    assert response.status_code == 200
+    assert response.json()["course"] == "Maths"
+    assert commands.commands == [("findAndModify", "students")]
+
+    commands.commands.clear()
+    response = api.delete("/students/{}".format(response.json()["id"]), headers=auth_headers)
+    assert response.status_code == 200
+    assert commands.commands == [("findAndModify", "students")]
+
+
+def test_create_and_update_project_use_one_command(api, auth_headers, commands):
+    response = api.post("/projects/", headers=auth_headers, json={"name": "Compilateur", "head": "Ada"})
+    assert response.status_code == 200
+    assert commands.commands == [("insert", "projects")]
+
+    commands.commands.clear()
+    response = api.put("/projects/{}".format(response.json()["id"]), headers=auth_headers, json={"head": "Grace"})
+    assert response.status_code == 200
+    assert commands.on("projects") == ["findAndModify"]
+
+
+def test_signup_uses_one_command_and_rejects_duplicates(commands):
+    app = FastAPI()
+    app.include_router(user.router)
+    api = TestClient(app)
+
+    payload = {"username": "ada", "email": "ada@example.com", "password": "secret"}
+    assert api.post("/signup", json=payload).status_code == 200
+    assert commands.commands == [("insert", "users")]
+
+    # Le doublon est refusé par l'index unique, sans lecture préalable
+    assert api.post("/signup", json=dict(payload, username="ada2")).status_code == 400
+
+
+def test_startup_fails_without_unique_user_indexes(mongo):
+    with pytest.raises(RuntimeError, match="users.email_unique"):
+        asyncio.run(manage_indexes(database.db, "off"))
+
+    asyncio.run(database.db["users"].create_indexes(INDEXES["users"]))
+    asyncio.run(ensure_required_indexes(database.db))
@@ -0,0 +1,63 @@
+import asyncio
+
+from bson import ObjectId
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import ExecutionTimeout, OperationFailure, WaitQueueTimeoutError
+
+import main
+from app.controllers import student_controller
+from app.deadlines import DEADLINE_RETRY_AFTER_SECONDS, DeadlineRoute, deadline
+
+
+def _app(endpoint) -> TestClient:
+    router = APIRouter(route_class=DeadlineRoute)
+    router.get("/slow")(endpoint)
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_route_over_its_budget_returns_504(api, monkeypatch):
+    route = next(route for route in main.app.routes if getattr(route, "path", None) == "/students/{student_id}"
+                 and "GET" in route.methods)
+    monkeypatch.setattr(route, "deadline", 0.05)
+
+    async def slow_read(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(student_controller, "get_student_by_id", slow_read)
+    response = api.get("/students/{}".format(ObjectId()))
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+
+
+def test_deadline_decorator_overrides_the_default_budget():
+    @deadline(0.05)
+    async def slow():
+        await asyncio.sleep(1)
+
+    assert _app(slow).get("/slow").status_code == 504
+
+
+def test_server_side_timeout_returns_504():
+    async def max_time_exceeded():
+        raise ExecutionTimeout("operation exceeded time limit", code=50)
+
+    assert _app(max_time_exceeded).get("/slow").status_code == 504
+
+
+def test_pool_wait_timeout_returns_503_with_retry_after():
+    async def pool_exhausted():
+        raise WaitQueueTimeoutError("timed out waiting for a connection")
+
+    response = _app(pool_exhausted).get("/slow")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == DEADLINE_RETRY_AFTER_SECONDS
+
+
+def test_other_database_errors_are_not_converted():
+    async def failed():
+        raise OperationFailure("duplicate key", code=11000)
+
+    assert _app(failed).get("/slow").status_code == 500
@@ -0,0 +1,21 @@
+def test_repeated_enrollment_keeps_etags(api, auth_headers):
+    student = api.post("/students/", headers=auth_headers,
+                       json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"}).json()
+    project = api.post("/projects/", headers=auth_headers, json={"name": "Compilateur", "head": "Ada"}).json()
+    enroll = lambda: api.post("/projects/{}/students".format(project["id"]), headers=auth_headers,
+                              json={"student_ids": [student["id"]]})
+
+    assert enroll().status_code == 200
+    project_etag = api.get("/projects/{}".format(project["id"])).headers["ETag"]
+    student_etag = api.get("/students/{}".format(student["id"])).headers["ETag"]
+
+    # Réinscrire les mêmes étudiants ne modifie aucun document : les versions restent identiques
+    assert enroll().status_code == 200
+    assert api.get("/projects/{}".format(project["id"])).headers["ETag"] == project_etag
+    assert api.get("/students/{}".format(student["id"])).headers["ETag"] == student_etag
+
+    # Une nouvelle inscription change bien la version du projet
+    other = api.post("/students/", headers=auth_headers,
+                     json={"name": "Grace", "email": "grace@example.com", "course": "Info", "branch": "A"}).json()
+    api.post("/projects/{}/students".format(project["id"]), headers=auth_headers, json={"student_ids": [other["id"]]})
+    assert api.get("/projects/{}".format(project["id"])).headers["ETag"] != project_etag
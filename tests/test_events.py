@@ -0,0 +1,100 @@
+import asyncio
+import signal
+
+import pytest
+
+from app.events import ChangeFeed, change_feed, event_stream, install_shutdown_handlers
+
+
+def test_close_streams_ends_open_streams():
+    async def scenario():
+        feed = ChangeFeed()
+        stream = event_stream(feed)
+        assert (await stream.__anext__()).startswith("retry:")
+
+        # Le client attend le prochain événement (ou le prochain heartbeat)
+        waiting = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        feed.close_streams()
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(waiting, 1)
+        assert feed.stats()["subscribers"] == 0
+
+        # Pendant l'arrêt, un nouveau flux se termine aussitôt
+        stream = event_stream(feed)
+        await stream.__anext__()
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(stream.__anext__(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_signal_closes_streams_and_calls_previous_handler():
+    received = []
+    previous = signal.signal(signal.SIGUSR1, lambda signum, frame: received.append(signum))
+
+    async def scenario():
+        feed = ChangeFeed()
+        install_shutdown_handlers(feed, (signal.SIGUSR1,))
+        signal.raise_signal(signal.SIGUSR1)
+        await asyncio.sleep(0.01)
+        assert feed.closing
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+    assert received == [signal.SIGUSR1]
+
+
+def test_events_route_refuses_new_streams_during_shutdown(api, monkeypatch):
+    monkeypatch.setattr(change_feed, "available", True)
+    monkeypatch.setattr(change_feed, "closing", True)
+    assert api.get("/events").status_code == 503
+
+
+def test_unexpected_change_shape_does_not_stop_the_watcher(monkeypatch):
+    from app import events
+
+    good = {"_id": {"_data": "2"}, "ns": {"coll": "students"}, "operationType": "insert", "documentKey": {"_id": 1}}
+    # Le premier flux contient un changement sans `ns` ; le second reprend après lui
+    streams = [[{"_id": {"_data": "1"}, "operationType": "insert"}], [good]]
+    resumed_after = []
+
+    class Stream:
+        def __init__(self, changes):
+            self.changes = changes
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def __aiter__(self):
+            for change in self.changes:
+                yield change
+            await asyncio.sleep(10)
+
+    class Database:
+        def watch(self, pipeline, start_after=None):
+            resumed_after.append(start_after)
+            return Stream(streams.pop(0))
+
+    monkeypatch.setattr(events, "db", Database())
+    monkeypatch.setattr(events, "EVENTS_RETRY_SECONDS", 0)
+
+    async def scenario():
+        feed = ChangeFeed()
+        queue = feed.subscribe()
+        task = asyncio.ensure_future(feed._run())
+        try:
+            event = await asyncio.wait_for(queue.get(), 1)
+            assert feed.available
+        finally:
+            task.cancel()
+        return event
+
+    event = asyncio.run(scenario())
+    assert event.id == "2"
+    assert resumed_after == [None, {"_data": "1"}]
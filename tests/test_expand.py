@@ -0,0 +1,32 @@
+from app.expand import LOOKUP_IDS_FIELD, lookup_stages
+
+
+def _student(api, auth_headers, name):
+    return api.post("/students/", headers=auth_headers,
+                    json={"name": name, "email": "{}@example.com".format(name.lower()), "course": "Info",
+                          "branch": "A"}).json()
+
+
+def test_lookup_joins_on_id_equality():
+    stages = lookup_stages("students", "student_ids", "students", {"name": 1}, (0, 10))
+    lookup = next(stage["$lookup"] for stage in stages if "$lookup" in stage)
+    assert lookup["localField"] == LOOKUP_IDS_FIELD
+    assert lookup["foreignField"] == "_id"
+    assert "pipeline" not in lookup
+
+
+def test_expand_returns_projected_window(api, auth_headers):
+    students = [_student(api, auth_headers, name) for name in ("Ada", "Grace", "Alan")]
+    project = api.post("/projects/", headers=auth_headers, json={"name": "Compilateur", "head": "Ada"}).json()
+    response = api.post("/projects/{}/students".format(project["id"]), headers=auth_headers,
+                        json={"student_ids": [student["id"] for student in students]})
+    assert response.status_code == 200
+
+    expanded = api.get("/projects/{}".format(project["id"]), params={"expand": "students", "expand_size": 2}).json()
+    assert LOOKUP_IDS_FIELD not in expanded
+    assert sorted(student["name"] for student in expanded["students"]) == ["Ada", "Grace"]
+    # Seuls les champs du résumé sont renvoyés
+    assert set(expanded["students"][0]) <= {"id", "name", "course", "branch"}
+
+    page = api.get("/students/", params={"expand": "projects", "fields": "name"}).json()
+    assert all(student["projects"][0]["name"] == "Compilateur" for student in page)
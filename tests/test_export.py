@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize("collection", ["students", "projects"])
+def test_export_requires_a_token(api, collection):
+    response = api.get("/{}/export".format(collection))
+    assert response.status_code == 401
+
+
+def test_export_streams_the_collection(api, auth_headers):
+    api.post("/students/", headers=auth_headers,
+             json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"})
+
+    response = api.get("/students/export", headers=auth_headers)
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["email"] for record in records] == ["ada@example.com"]
+
+    response = api.get("/students/export", headers=auth_headers, params={"format": "csv", "gzip": "true"})
+    assert response.headers["content-encoding"] == "gzip"
+    # httpx décompresse la réponse
+    assert response.text.splitlines()[0] == "id,name,email,course,branch,project_ids"
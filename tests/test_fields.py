@@ -0,0 +1,67 @@
+import pytest
+
+from app.fields import STUDENT_FIELDS, build_projection, parse_fields
+
+
+@pytest.fixture
+def student(api, auth_headers):
+    return api.post("/students/", headers=auth_headers,
+                    json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"}).json()
+
+
+def test_parse_fields():
+    assert parse_fields(None, STUDENT_FIELDS) is None
+    assert parse_fields("name, email,name,id", STUDENT_FIELDS) == ("name", "email")
+    with pytest.raises(ValueError):
+        parse_fields("name,password", STUDENT_FIELDS)
+
+
+def test_build_projection_keeps_required_fields():
+    assert build_projection(None) is None
+    assert build_projection(("name",), "name_normalized", "_id") == {"name": 1, "name_normalized": 1}
+    # Une projection vide renverrait le document complet
+    assert build_projection((), "_id") == {"_id": 1}
+
+
+def test_list_returns_only_requested_fields(api, student):
+    response = api.get("/students/", params={"fields": "name,email"})
+    assert response.status_code == 200
+    assert response.json() == [{"id": student["id"], "name": "Ada", "email": "ada@example.com"}]
+
+    # Le champ de tri est lu pour le curseur, mais n'est pas renvoyé
+    response = api.get("/students/", params={"fields": "course", "sort": "name"})
+    assert response.json() == [{"id": student["id"], "course": "Info"}]
+
+
+def test_by_id_and_batch_return_only_requested_fields(api, student):
+    response = api.get("/students/{}".format(student["id"]), params={"fields": "branch"})
+    assert response.status_code == 200
+    assert response.json() == {"id": student["id"], "branch": "A"}
+
+    response = api.get("/students/", params={"ids": student["id"], "fields": "name"})
+    assert response.json() == [{"id": student["id"], "name": "Ada"}]
+
+
+def test_fields_with_meta_and_expand(api, auth_headers, student):
+    response = api.get("/students/", params={"fields": "name", "with_meta": "true"})
+    assert response.json()["items"] == [{"id": student["id"], "name": "Ada"}]
+
+    response = api.get("/students/", params={"fields": "name", "expand": "projects"})
+    assert response.json() == [{"id": student["id"], "name": "Ada", "projects": []}]
+
+
+def test_projects_return_only_requested_fields(api, auth_headers):
+    project = api.post("/projects/", headers=auth_headers, json={"name": "Compilateur", "head": "Ada"}).json()
+    response = api.get("/projects/", params={"fields": "head"})
+    assert response.json() == [{"id": project["id"], "head": "Ada"}]
+
+
+@pytest.mark.parametrize("path", ["/students/", "/projects/"])
+def test_unknown_fields_are_rejected(api, path):
+    response = api.get(path, params={"fields": "name,password"})
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+
+def test_unknown_fields_are_rejected_by_id(api, student):
+    assert api.get("/students/{}".format(student["id"]), params={"fields": "secret"}).status_code == 400
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app import health
+
+
+class PingDatabase:
+    """
+    Base dont le `ping` réussit, échoue ou ne répond pas, selon `behaviour`.
+    """
+
+    def __init__(self, behaviour: str = "ok"):
+        self.behaviour = behaviour
+        self.pings = 0
+
+    async def command(self, name):
+        self.pings += 1
+        if self.behaviour == "error":
+            raise ConnectionError("connection refused")
+        if self.behaviour == "hang":
+            await asyncio.sleep(10)
+        return {"ok": 1}
+
+
+def _pool(checked_out: int, max_pool_size: int = 10):
+    return lambda: {"checked_out": checked_out, "max_pool_size": max_pool_size}
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """
+    Réinitialise le `ping` mis en cache et renvoie une fonction qui configure la base et le pool.
+    """
+    monkeypatch.setattr(health, "_last_ping", None)
+
+    def configure(behaviour: str = "ok", checked_out: int = 0) -> PingDatabase:
+        database = PingDatabase(behaviour)
+        monkeypatch.setattr(health, "db", database)
+        monkeypatch.setattr(health, "get_pool_stats", _pool(checked_out))
+        return database
+
+    return configure
+
+
+def test_ready_when_ping_succeeds_and_pool_is_free(api, probes):
+    probes("ok", checked_out=2)
+    response = api.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert response.json()["pool"]["usage"] == 0.2
+
+
+def test_not_ready_when_ping_fails(api, probes):
+    probes("error")
+    response = api.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["database"]["ok"] is False
+    assert response.json()["database"]["error"] == "connection refused"
+    assert api.get("/healthz").status_code == 200
+
+
+def test_not_ready_when_ping_times_out(api, probes, monkeypatch):
+    probes("hang")
+    monkeypatch.setattr(health, "READY_PING_TIMEOUT_SECONDS", 0.05)
+    response = api.get("/readyz")
+    assert response.status_code == 503
+    assert "timed out" in response.json()["database"]["error"]
+    assert api.get("/healthz").status_code == 200
+
+
+def test_not_ready_when_pool_is_saturated(api, probes):
+    probes("ok", checked_out=9)
+    response = api.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["database"]["ok"] is True
+    assert response.json()["pool"]["ok"] is False
+    assert api.get("/healthz").json() == {"status": "ok"}
+
+
+def test_ping_result_is_reused(api, probes):
+    database = probes("ok")
+    for _ in range(3):
+        assert api.get("/readyz").status_code == 200
+    assert database.pings == 1
@@ -0,0 +1,22 @@
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import internal
+
+
+def test_internal_endpoints_are_off_by_default(api):
+    assert os.getenv("INTERNAL_ENDPOINTS_ENABLED") is None
+    assert internal.INTERNAL_ENDPOINTS_ENABLED is False
+    for path in ("pool", "cache", "coalescing", "events", "auth", "admission"):
+        assert api.get("/internal/{}".format(path)).status_code == 404
+
+
+def test_internal_endpoints_when_enabled():
+    app = FastAPI()
+    app.include_router(internal.router, prefix="/internal")
+    client = TestClient(app)
+
+    assert client.get("/internal/pool").json()["pid"] == os.getpid()
+    assert "denylist" in client.get("/internal/auth").json()
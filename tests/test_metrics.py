@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from app.database import command_stats
+from app.metrics import REGISTRY, Histogram
+
+
+def _sample(text: str, series: str) -> float:
+    """
+    Renvoie la valeur d'une série de l'exposition Prometheus (0 si elle est absente).
+    """
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_request_duration_is_labelled_by_route_template_and_status(api):
+    by_id = 'http_request_duration_seconds_count{method="GET",route="/students/{student_id}",status="404"}'
+    unmatched = 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}'
+    health = 'http_request_duration_seconds_count{method="GET",route="/healthz",status="200"}'
+    before = api.get("/metrics").text
+
+    # Deux identifiants différents : une seule série, étiquetée par le modèle de chemin
+    api.get("/students/{}".format(ObjectId()))
+    api.get("/students/{}".format(ObjectId()))
+    api.get("/no-such-route")
+    api.get("/healthz")
+
+    after = api.get("/metrics")
+    assert after.headers["content-type"].startswith("text/plain")
+    assert _sample(after.text, by_id) - _sample(before, by_id) == 2
+    assert _sample(after.text, unmatched) - _sample(before, unmatched) == 1
+    assert _sample(after.text, health) - _sample(before, health) == 1
+    assert "/students/6" not in after.text
+    assert 'http_requests_in_flight{method="GET"}' in after.text
+
+
+def test_mongodb_commands_are_labelled_by_command_and_outcome(api):
+    series = 'mongodb_command_duration_seconds_count{command="find",outcome="failed"}'
+    before = _sample(api.get("/metrics").text, series)
+    command_stats.failed(SimpleNamespace(command_name="find", duration_micros=1500))
+    assert _sample(api.get("/metrics").text, series) - before == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_duration_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    try:
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(("/x",), value)
+        lines = histogram.render()
+    finally:
+        REGISTRY.remove(histogram)
+    assert 'test_duration_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{route="/x",le="1.0"} 2' in lines
+    assert 'test_duration_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 'test_duration_seconds_count{route="/x"} 3' in lines
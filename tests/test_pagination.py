@@ -0,0 +1,37 @@
+from app.pagination import decode_cursor, encode_cursor, sort_spec
+
+
+def _pages(api, headers, **params):
+    """
+    Parcourt toutes les pages (pagination par curseur) et renvoie les noms dans l'ordre reçu.
+    """
+    names, cursor = [], ""
+    while True:
+        response = api.get("/students/", params=dict(params, cursor=cursor))
+        if response.status_code == 404:
+            return names
+        names.extend(student["name"] for student in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return names
+
+
+def test_sort_by_name_uses_normalized_name():
+    assert sort_spec("name") == [("name_normalized", 1), ("_id", 1)]
+    cursor = encode_cursor({"_id": "64b000000000000000000001", "name": "Élodie", "name_normalized": "elodie"}, "name")
+    assert decode_cursor(cursor, "name")["$or"][0] == {"name_normalized": {"$gt": "elodie"}}
+
+
+def test_null_cursor_value_continues_with_remaining_documents():
+    cursor = encode_cursor({"_id": "64b000000000000000000001"}, "name")
+    query = decode_cursor(cursor, "name")
+    assert {"name_normalized": {"$ne": None}} in query["$or"]
+
+
+def test_name_pagination_ignores_case_and_accents(api, auth_headers):
+    for name in ("emma", "Élodie", "Eliza", "Zoé", "adam"):
+        response = api.post("/students/", headers=auth_headers,
+                            json={"name": name, "email": "x@example.com", "course": "Info", "branch": "A"})
+        assert response.status_code == 200
+
+    assert _pages(api, auth_headers, sort="name", size=2) == ["adam", "Eliza", "Élodie", "emma", "Zoé"]
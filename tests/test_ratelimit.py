@@ -0,0 +1,100 @@
+import asyncio
+import ipaddress
+import os
+import subprocess
+import sys
+
+import httpx
+from fastapi import FastAPI
+from fastapi_jwt_auth import AuthJWT
+
+from app import ratelimit
+from app.ratelimit import AdmissionMiddleware, MemoryRateLimitBackend, client_key
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items():
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    @app.post("/auth/login")
+    async def login():
+        return {"ok": True}
+
+    app.add_middleware(AdmissionMiddleware, backend=MemoryRateLimitBackend(max_clients=100))
+    return app
+
+
+def _client(app, address: str = "203.0.113.7") -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=app, client=(address, 1234))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def _scope(address: str, headers: dict = None) -> dict:
+    return {
+        "client": (address, 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+
+
+def test_rate_limiting_is_off_by_default():
+    # `tests/conftest.py` désactive la limitation : la valeur par défaut est lue dans un autre processus
+    env = {name: value for name, value in os.environ.items() if name != "RATE_LIMIT_ENABLED"}
+    output = subprocess.run([sys.executable, "-c", "from app.ratelimit import RATE_LIMIT_ENABLED; print(RATE_LIMIT_ENABLED)"],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "False"
+
+
+def test_client_over_its_rate_gets_429_with_retry_after(monkeypatch):
+    monkeypatch.setitem(ratelimit.RATE_LIMITS, "login", (0.5, 2))
+
+    async def run():
+        async with _client(_app()) as client:
+            return [await client.post("/auth/login") for _ in range(3)]
+
+    first, second, third = asyncio.run(run())
+    assert first.status_code == second.status_code == 200
+    assert third.status_code == 429
+    assert third.json() == {"detail": "Rate limit exceeded"}
+    # Un jeton toutes les deux secondes
+    assert third.headers["Retry-After"] == "2"
+
+
+def test_saturated_worker_gets_503_with_retry_after(monkeypatch):
+    monkeypatch.setitem(ratelimit.CONCURRENCY_LIMITS, "read", 1)
+    monkeypatch.setattr(ratelimit, "ADMISSION_WAIT_SECONDS", 0.05)
+
+    async def run():
+        async with _client(_app()) as client:
+            return await asyncio.gather(client.get("/items"), client.get("/items"))
+
+    responses = sorted(asyncio.run(run()), key=lambda response: response.status_code)
+    assert [response.status_code for response in responses] == [200, 503]
+    rejected = responses[1]
+    assert rejected.json() == {"detail": "Server busy"}
+    assert rejected.headers["Retry-After"] == "1"
+
+
+def test_forwarded_address_is_ignored_without_trusted_proxies():
+    scope = _scope("198.51.100.1", {"X-Forwarded-For": "203.0.113.7"})
+    assert client_key(scope) == "ip:198.51.100.1"
+
+
+def test_forwarded_address_is_used_from_a_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_TRUSTED_PROXIES", (ipaddress.ip_network("10.0.0.0/8"),))
+
+    # Les adresses à gauche de celle du client sont fournies par le client : elles sont ignorées
+    scope = _scope("10.0.0.2", {"X-Forwarded-For": "192.0.2.99, 203.0.113.7, 10.0.0.1"})
+    assert client_key(scope) == "ip:203.0.113.7"
+    # Un client direct ne peut pas choisir son adresse
+    scope = _scope("198.51.100.1", {"X-Forwarded-For": "203.0.113.7"})
+    assert client_key(scope) == "ip:198.51.100.1"
+
+
+def test_authenticated_clients_are_keyed_by_subject():
+    token = AuthJWT().create_access_token(subject="tester")
+    scope = _scope("198.51.100.1", {"Authorization": "Bearer {}".format(token)})
+    assert client_key(scope) == "sub:tester"
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app import database
+from app.search import backfill_normalized_names, build_name_filter, normalize_name
+
+
+def _create(api, auth_headers, name: str) -> dict:
+    response = api.post("/students/", headers=auth_headers,
+                        json={"name": name, "email": "s{}@example.com".format(abs(hash(name))), "course": "Info", "branch": "A"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def _names(api, name: str, search: str) -> list:
+    response = api.get("/students/", params={"name": name, "search": search, "size": 50})
+    return [] if response.status_code == 404 else sorted(student["name"] for student in response.json())
+
+
+def test_normalize_name_removes_accents_and_case():
+    assert normalize_name("Élodie") == "elodie"
+    assert normalize_name("JOSÉ Núñez") == "jose nunez"
+
+
+def test_regex_metacharacters_are_escaped():
+    assert build_name_filter("a.*(b", "prefix") == {"name_normalized": {"$regex": r"^a\.\*\(b"}}
+    assert build_name_filter("a+", "contains") == {"name_normalized": {"$regex": r"a\+"}}
+    with pytest.raises(ValueError):
+        build_name_filter("ada", "regex")
+
+
+def test_prefix_search_is_accent_and_case_insensitive(api, auth_headers):
+    for name in ("Élodie Martin", "elodie Durand", "Mélodie Petit"):
+        _create(api, auth_headers, name)
+
+    assert _names(api, "ELO", "prefix") == ["elodie Durand", "Élodie Martin"]
+    # Le préfixe est ancré : « Mélodie » ne commence pas par « elo »
+    assert _names(api, "élo", "prefix") == ["elodie Durand", "Élodie Martin"]
+
+
+def test_contains_search_matches_inside_the_name(api, auth_headers):
+    for name in ("Élodie Martin", "Mélodie Petit", "Ada Lovelace"):
+        _create(api, auth_headers, name)
+
+    assert _names(api, "lodie", "contains") == ["Mélodie Petit", "Élodie Martin"]
+
+
+def test_metacharacters_are_matched_literally(api, auth_headers):
+    for name in ("A.B Conseil", "AXB Conseil", "C++ Club"):
+        _create(api, auth_headers, name)
+
+    # Sans échappement, `.` accepterait n'importe quel caractère et `+` lèverait une erreur de motif
+    assert _names(api, "a.b", "prefix") == ["A.B Conseil"]
+    assert _names(api, "c++", "contains") == ["C++ Club"]
+    assert _names(api, ".*", "contains") == []
+
+
+def test_invalid_search_mode_returns_400(api):
+    assert api.get("/students/", params={"name": "ada", "search": "regex"}).status_code == 400
+
+
+def test_backfill_normalizes_existing_documents(mongo):
+    asyncio.run(database.db["students"].insert_one({"name": "Zoé"}))
+    assert asyncio.run(backfill_normalized_names(database.db, "students")) == 1
+    assert asyncio.run(database.db["students"].find_one({}))["name_normalized"] == "zoe"
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from app import slowlog
+from app.controllers import student_controller
+from app.slowlog import track
+
+STUDENT = {"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"}
+
+
+def test_slow_write_is_logged_with_redacted_values(mongo, monkeypatch, caplog):
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_MS", 1e-9)
+
+    async def scenario():
+        async with track("students", "findAndModify", query={"email": "ada@example.com"},
+                         update={"$set": {"course": "Maths"}}):
+            pass
+        # La journalisation est une tâche référencée jusqu'à sa fin
+        assert len(slowlog._reports) == 1
+        await asyncio.gather(*slowlog._reports)
+        assert not slowlog._reports
+
+    with caplog.at_level(logging.WARNING, logger="app.slowlog"):
+        asyncio.run(scenario())
+    message = caplog.records[-1].getMessage()
+    assert message.startswith("Slow query")
+    assert '"findAndModify": "students"' in message
+    assert '"update": {"$set": {"course": "?"}}' in message
+    assert "Maths" not in message and "ada@example.com" not in message
+
+
+def test_inserts_are_not_explained(mongo, monkeypatch, caplog):
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_MS", 1e-9)
+
+    async def scenario():
+        async with track("students", "insert"):
+            pass
+        await asyncio.gather(*slowlog._reports)
+
+    with caplog.at_level(logging.WARNING, logger="app.slowlog"):
+        asyncio.run(scenario())
+    assert caplog.records[-1].getMessage().endswith("plan=null")
+
+
+def test_controller_reads_and_writes_are_tracked(api, auth_headers, monkeypatch):
+    operations = []
+
+    @asynccontextmanager
+    async def recording_track(collection, operation, **arguments):
+        operations.append((collection, operation))
+        yield
+
+    monkeypatch.setattr(student_controller, "track", recording_track)
+    student_id = api.post("/students/", headers=auth_headers, json=STUDENT).json()["id"]
+    api.get("/students/{}".format(student_id))
+    api.get("/students/{}".format(student_id), params={"expand": "projects"})
+    api.put("/students/{}".format(student_id), headers=auth_headers, json={"course": "Maths"})
+    api.delete("/students/{}".format(student_id), headers=auth_headers)
+
+    assert operations == [
+        ("students", "insert"),
+        ("students", "find"),
+        ("students", "aggregate"),
+        ("students", "findAndModify"),
+        ("students", "findAndModify"),
+    ]
+
+
+def test_debug_timing_is_off_by_default(api):
+    response = api.get("/healthz", headers={"X-Debug-Timing": "1"})
+    assert "Server-Timing" not in response.headers
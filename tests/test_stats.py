@@ -0,0 +1,95 @@
+import asyncio
+
+from app import database, stats
+
+
+def _student(api, auth_headers, name: str, course: str) -> dict:
+    response = api.post("/students/", headers=auth_headers,
+                        json={"name": name, "email": "{}@example.com".format(name.lower()), "course": course, "branch": "A"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_stats_follow_creates_updates_and_deletes(api, auth_headers):
+    ada = _student(api, auth_headers, "Ada", "Info")
+    grace = _student(api, auth_headers, "Grace", "Maths")
+    api.delete("/students/{}".format(grace["id"]), headers=auth_headers)
+
+    response = api.get("/stats/students")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 1
+    assert body["without_project"] == 1
+    assert body["course"] == [{"value": "Info", "count": 1}]
+
+    # Le changement de cours retire l'étudiant de son ancien cours
+    api.put("/students/{}".format(ada["id"]), headers=auth_headers, json={"course": "Physique"})
+    body = api.get("/stats/students").json()
+    assert body["course"] == [{"value": "Physique", "count": 1}]
+    assert body["branch"] == [{"value": "A", "count": 1}]
+
+
+def test_writes_do_not_touch_the_stats_collection_until_flushed(api, auth_headers, mongo):
+    _student(api, auth_headers, "Ada", "Info")
+    assert asyncio.run(database.db[stats.STATS_COLLECTION].count_documents({})) == 0
+
+    asyncio.run(stats.flush_stats())
+    total = asyncio.run(database.db[stats.STATS_COLLECTION].find_one({"_id": "students:total"}))
+    assert total["count"] == 1
+
+
+def test_enrollment_marks_counters_stale_until_refresh(api, auth_headers):
+    ada = _student(api, auth_headers, "Ada", "Info")
+    project = api.post("/projects/", headers=auth_headers, json={"name": "Compilateur", "head": "Ada"}).json()
+    response = api.post("/projects/{}/students".format(project["id"]), headers=auth_headers,
+                        json={"student_ids": [ada["id"]]})
+    assert response.status_code == 200
+
+    students = api.get("/stats/students").json()
+    assert students["stale"] == ["without_project"]
+    assert students["without_project"] == 1
+    assert api.get("/stats/projects").json()["stale"] == ["size"]
+
+    assert api.post("/stats/refresh", headers=auth_headers).status_code == 200
+    students = api.get("/stats/students").json()
+    assert students["stale"] == []
+    assert students["without_project"] == 0
+    projects = api.get("/stats/projects").json()
+    assert projects["stale"] == []
+    assert projects["size"] == [{"value": 1, "count": 1}]
+
+
+def test_refresh_keeps_increments_written_during_the_aggregation(api, auth_headers, monkeypatch):
+    _student(api, auth_headers, "Ada", "Info")
+    aggregate = stats._aggregate
+
+    async def aggregate_then_insert(collection):
+        results = await aggregate(collection)
+        # Un autre worker crée un étudiant et écrit son incrément pendant la reconstruction
+        grace = {"name": "Grace", "course": "Maths", "branch": "A", "project_ids": []}
+        await database.db["students"].insert_one(grace)
+        stats.record_documents("students", [grace])
+        await stats._flush()
+        return results
+
+    monkeypatch.setattr(stats, "_aggregate", aggregate_then_insert)
+    asyncio.run(stats.refresh_stats("students"))
+    monkeypatch.setattr(stats, "_aggregate", aggregate)
+
+    body = api.get("/stats/students").json()
+    assert body["total"] == 2
+    assert body["course"] == [{"value": "Info", "count": 1}, {"value": "Maths", "count": 1}]
+
+
+def test_refresh_corrects_drifted_counters(api, auth_headers):
+    _student(api, auth_headers, "Ada", "Info")
+    # Incréments perdus (worker arrêté brutalement) ou comptés deux fois
+    stats.record_documents("students", [{"course": "Ancien", "branch": "A", "project_ids": []}])
+    asyncio.run(stats.flush_stats())
+    assert api.get("/stats/students").json()["total"] == 2
+
+    asyncio.run(stats.refresh_stats("students"))
+    body = api.get("/stats/students").json()
+    assert body["total"] == 1
+    assert body["course"] == [{"value": "Info", "count": 1}]
+    assert asyncio.run(database.db[stats.STATS_COLLECTION].find_one({"_id": "students:course:Ancien"})) is None
@@ -0,0 +1,40 @@
+import time
+
+from app.tokens import TokenDenylist, verified_tokens
+
+STUDENT = {"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"}
+
+
+def test_revoked_token_is_rejected_even_when_cached(api, auth_headers):
+    # La première requête met en cache la vérification du jeton
+    assert api.post("/students/", headers=auth_headers, json=STUDENT).status_code == 200
+    assert verified_tokens.stats()["entries"] == 1
+
+    assert api.post("/auth/logout", headers=auth_headers).status_code == 200
+
+    response = api.post("/students/", headers=auth_headers, json=STUDENT)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked"}
+    assert api.post("/auth/logout", headers=auth_headers).status_code == 401
+
+
+def test_other_tokens_stay_valid_after_logout(api, auth_headers):
+    from fastapi_jwt_auth import AuthJWT
+    other = {"Authorization": "Bearer {}".format(AuthJWT().create_access_token(subject="other"))}
+
+    assert api.post("/auth/logout", headers=auth_headers).status_code == 200
+    assert api.post("/students/", headers=other, json=STUDENT).status_code == 200
+
+
+def test_invalid_token_is_rejected(api):
+    response = api.post("/students/", headers={"Authorization": "Bearer not-a-token"}, json=STUDENT)
+    assert response.status_code == 422
+
+
+def test_denylist_forgets_expired_tokens():
+    denylist = TokenDenylist()
+    denylist.revoke("expired", time.time() - 1)
+    denylist.revoke("active", time.time() + 60)
+    assert not denylist.is_revoked("expired")
+    assert denylist.is_revoked("active")
+    assert denylist.stats() == {"revoked": 1}
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app import database
+from app.versioning import VersionConflict, etag_matches, expected_version
+
+
+def _etag(document_id: str, version: int) -> str:
+    return '"{}-{}"'.format(document_id, version)
+
+
+def _version(collection: str, document_id: str):
+    document = asyncio.run(database.db[collection].find_one({"_id": ObjectId(document_id)}))
+    return document.get("_v")
+
+
+@pytest.fixture
+def student(api, auth_headers):
+    response = api.post("/students/", headers=auth_headers,
+                        json={"name": "Ada", "email": "ada@example.com", "course": "Info", "branch": "A"})
+    return response.json()["id"], response.headers["ETag"]
+
+
+def test_etag_helpers():
+    assert etag_matches('W/"a-1", "b-2"', '"b-2"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-1"', '"a-2"')
+    assert expected_version('"a-3"', "a") == 3
+    assert expected_version("*", "a") is None
+    with pytest.raises(VersionConflict):
+        expected_version('"b-3"', "a")
+
+
+def test_if_none_match_returns_304(api, student):
+    student_id, etag = student
+    assert etag == _etag(student_id, 1)
+
+    response = api.get("/students/{}".format(student_id), headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    response = api.get("/students/{}".format(student_id), headers={"If-None-Match": _etag(student_id, 0)})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("update", [{"name": "Ada L."}, {"course": "Maths"}])
+def test_update_increments_the_version(api, auth_headers, student, update):
+    student_id, etag = student
+    response = api.put("/students/{}".format(student_id), headers={**auth_headers, "If-Match": etag}, json=update)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == _etag(student_id, 2)
+    assert _version("students", student_id) == 2
+
+    # L'ancien ETag ne correspond plus : la lecture conditionnelle renvoie le document
+    response = api.get("/students/{}".format(student_id), headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[next(iter(update))] == next(iter(update.values()))
+
+
+def test_stale_if_match_returns_412(api, auth_headers, student):
+    student_id, etag = student
+    api.put("/students/{}".format(student_id), headers=auth_headers, json={"name": "Ada L."})
+
+    response = api.put("/students/{}".format(student_id), headers={**auth_headers, "If-Match": etag},
+                       json={"name": "Ada B."})
+    assert response.status_code == 412
+    response = api.delete("/students/{}".format(student_id), headers={**auth_headers, "If-Match": etag})
+    assert response.status_code == 412
+    assert api.get("/students/{}".format(student_id)).json()["name"] == "Ada L."
+
+    response = api.delete("/students/{}".format(student_id), headers={**auth_headers, "If-Match": _etag(student_id, 2)})
+    assert response.status_code == 200
+
+
+def test_if_match_on_a_missing_document_returns_404(api, auth_headers):
+    student_id = str(ObjectId())
+    response = api.put("/students/{}".format(student_id), headers={**auth_headers, "If-Match": _etag(student_id, 1)},
+                       json={"name": "Ada"})
+    assert response.status_code == 404
+
+
+def test_project_versions(api, auth_headers, student):
+    student_id, _ = student
+    response = api.post("/projects/", headers=auth_headers, json={"name": "Compilateur", "head": "Ada"})
+    project_id, etag = response.json()["id"], response.headers["ETag"]
+
+    api.post("/projects/{}/students".format(project_id), headers=auth_headers, json={"student_ids": [student_id]})
+    assert _version("projects", project_id) == 2
+    assert _version("students", student_id) == 2
+    response = api.put("/projects/{}".format(project_id), headers={**auth_headers, "If-Match": etag}, json={"head": "Grace"})
+    assert response.status_code == 412
+
+
+def test_documents_without_version_match_version_0(api, auth_headers, mongo):
+    result = asyncio.run(database.db["students"].insert_one(
+        {"name": "Legacy", "email": "legacy@example.com", "course": "Info", "branch": "A", "project_ids": []}
+    ))
+    student_id = str(result.inserted_id)
+    assert api.get("/students/{}".format(student_id)).headers["ETag"] == _etag(student_id, 0)
+
+    response = api.put("/students/{}".format(student_id), headers={**auth_headers, "If-Match": _etag(student_id, 0)},
+                       json={"course": "Maths"})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == _etag(student_id, 1)
@@ -0,0 +1,91 @@
+import pytest
+
+from app import counting, database
+
+
+class CountingDatabase:
+    """
+    Base qui note les méthodes de comptage appelées.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __getitem__(self, name):
+        collection = database.db[name]
+        calls = self.calls
+
+        class Collection:
+            async def count_documents(self, query):
+                calls.append("count_documents")
+                return await collection.count_documents(query)
+
+            async def estimated_document_count(self):
+                calls.append("estimated_document_count")
+                return await collection.estimated_document_count()
+
+        return Collection()
+
+
+@pytest.fixture
+def students(api, auth_headers):
+    for name in ("Ada", "Alan", "Grace"):
+        api.post("/students/", headers=auth_headers,
+                 json={"name": name, "email": "{}@example.com".format(name.lower()), "course": "Info", "branch": "A"})
+
+
+def test_unfiltered_total_uses_the_estimated_count(api, students, monkeypatch):
+    counting_db = CountingDatabase()
+    monkeypatch.setattr(counting, "db", counting_db)
+
+    page = api.get("/students/", params={"size": 2, "with_meta": "true"}).json()
+    assert [item["name"] for item in page["items"]] == ["Ada", "Alan"]
+    assert page["total"] == 3
+    assert page["has_next"] is True
+    assert page["next_cursor"]
+
+    page = api.get("/students/", params={"size": 2, "with_meta": "true", "cursor": page["next_cursor"]}).json()
+    assert [item["name"] for item in page["items"]] == ["Grace"]
+    assert page["total"] == 3
+    assert page["has_next"] is False
+    assert page["next_cursor"] is None
+    # Le second total est servi par le cache
+    assert counting_db.calls == ["estimated_document_count"]
+
+
+def test_filtered_total_counts_matching_documents(api, students, monkeypatch):
+    counting_db = CountingDatabase()
+    monkeypatch.setattr(counting, "db", counting_db)
+
+    page = api.get("/students/", params={"name": "a", "size": 2, "with_meta": "true"}).json()
+    assert [item["name"] for item in page["items"]] == ["Ada", "Alan"]
+    assert page["total"] == 2
+    # Une page pleine qui est aussi la dernière n'annonce pas de page suivante
+    assert page["has_next"] is False
+    assert page["next_cursor"] is None
+    assert counting_db.calls == ["count_documents"]
+
+
+def test_filtered_total_is_cached(api, auth_headers, students):
+    assert api.get("/students/", params={"name": "a", "with_meta": "true"}).json()["total"] == 2
+    api.post("/students/", headers=auth_headers,
+             json={"name": "Anita", "email": "anita@example.com", "course": "Info", "branch": "A"})
+    # Le total est réutilisé pendant `COUNT_TTL_SECONDS` : il peut être en retard sur les écritures
+    page = api.get("/students/", params={"name": "a", "with_meta": "true"}).json()
+    assert page["total"] == 2
+    assert len(page["items"]) == 3
+
+
+def test_empty_page_with_meta_is_not_a_404(api):
+    response = api.get("/students/", params={"name": "zzz", "with_meta": "true"})
+    assert response.status_code == 200
+    assert response.json() == {"items": [], "total": 0, "has_next": False, "next_cursor": None}
+    assert api.get("/students/", params={"name": "zzz"}).status_code == 404
+
+
+def test_projects_with_meta(api, auth_headers):
+    for name in ("Compilateur", "Noyau"):
+        api.post("/projects/", headers=auth_headers, json={"name": name, "head": "Ada"})
+    page = api.get("/projects/", params={"size": 1, "with_meta": "true"}).json()
+    assert page["total"] == 2
+    assert page["has_next"] is True